@@ -20,6 +20,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # 모듈 임포트
 from utils.kakao_parser import KakaoParser
 from utils.gpt_analyzer import GPTAnalyzer
+from utils.llm_cache import LLMCache
+from utils.llm_telemetry import LLMTelemetry
 
 # 페이지 설정
 st.set_page_config(
@@ -697,7 +699,7 @@ elif selected == "🤖 GPT 분석":
                     100,
                     min(2000, len(st.session_state.chat_data)),
                     500,
-                    help="더 많은 메시지를 분석할수록 정확하지만 시간이 오래 걸립니다."
+                    help="전체 기간과 참여자에 고르게 걸친 대표 메시지를 이 개수만큼 골라 분석합니다. 더 많은 메시지를 분석할수록 정확하지만 시간이 오래 걸립니다."
                 )
             with col2:
                 analysis_type = st.selectbox(
@@ -712,6 +714,18 @@ elif selected == "🤖 GPT 분석":
                     help="원하는 분석 유형을 선택하세요."
                 )
             
+            full_history = st.checkbox(
+                "전체 대화 기록 분석 (구간별 요약 후 종합)",
+                value=False,
+                help="최근 메시지 대신 전체 기록을 구간별로 요약한 뒤 종합 분석합니다. 처음에는 오래 걸리지만, 이후에는 새로 추가된 구간만 요약합니다."
+            )
+            
+            use_cache = st.checkbox(
+                "이전 분석 결과 재사용 (캐시)",
+                value=True,
+                help="같은 데이터와 분석 유형으로 이미 분석한 적이 있으면 API를 다시 호출하지 않고 저장된 결과를 사용합니다. 해제하면 새로 분석합니다."
+            )
+            
             # 분석 실행
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
@@ -719,13 +733,23 @@ elif selected == "🤖 GPT 분석":
                     try:
                         with st.spinner('🤖 GPT가 채팅을 분석하는 중... (1-3분 소요)'):
                             # GPT 분석기 초기화
-                            analyzer = GPTAnalyzer(api_key)
+                            analyzer = GPTAnalyzer(api_key, use_cache=use_cache)
                             
-                            # 데이터 샘플링 (최신 메시지 우선)
-                            sample_data = st.session_state.chat_data.tail(sample_size)
-                            
-                            # 분석 실행
-                            result = analyzer.analyze_chat(sample_data, analysis_type)
+                            if full_history:
+                                # 전체 기록을 구간별로 요약한 뒤 종합
+                                result = analyzer.analyze_chat(st.session_state.chat_data, analysis_type, full_history=True)
+                            else:
+                                # 기간/사용자별 대표 메시지 sample_size개를 골라 분석
+                                # (응답을 받는 대로 표시하고, 완료 후 구조화된 결과로 교체)
+                                stream_placeholder = st.empty()
+                                streamed_text = ""
+                                for delta in analyzer.analyze_chat_stream(
+                                    st.session_state.chat_data, analysis_type, sample_size=sample_size
+                                ):
+                                    streamed_text += delta
+                                    stream_placeholder.markdown(streamed_text + "▌")
+                                stream_placeholder.empty()
+                                result = analyzer.last_stream_result
                             
                             if result and not result.get('error', False):
                                 st.session_state.analysis_results = result
@@ -1337,6 +1361,67 @@ elif selected == "⚙️ 설정":
         - **성능 모니터링**: 실행 시간 측정
         """)
         
+        # GPT 응답 캐시 현황
+        st.markdown("**🗄️ GPT 응답 캐시**")
+        try:
+            llm_cache = LLMCache()
+            cache_stats = llm_cache.stats()
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("저장된 응답", f"{cache_stats['entries']:,}개")
+            with col2:
+                st.metric("적중률", f"{cache_stats['hit_rate'] * 100:.1f}%",
+                          help=f"적중 {cache_stats['hits']:,}회 / 미적중 {cache_stats['misses']:,}회")
+            with col3:
+                st.metric("캐시 용량", f"{cache_stats['size_bytes'] / 1024 / 1024:.1f}MB")
+            
+            if st.button("🗑️ GPT 응답 캐시 비우기"):
+                llm_cache.clear()
+                st.success("✅ GPT 응답 캐시를 비웠습니다.")
+        except Exception as e:
+            st.warning(f"⚠️ GPT 응답 캐시 정보를 불러올 수 없습니다: {str(e)}")
+        
+        # GPT API 호출 통계 (최근 7일)
+        st.markdown("**📈 GPT 호출 통계 (최근 7일)**")
+        try:
+            llm_telemetry = LLMTelemetry()
+            call_summary = llm_telemetry.summary(days=7)
+            totals = call_summary['totals']
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("API 호출", f"{totals['api_calls']:,}회",
+                          help=f"재시도 {totals['retries']:,}회 포함, 제외: 캐시 적중 {totals['cache_hits']:,}회, "
+                               f"동시 요청 병합 {totals['coalesced']:,}회")
+            with col2:
+                st.metric("응답 시간 (p50 / p95)",
+                          f"{totals['latency_p50_ms'] / 1000:.1f}s / {totals['latency_p95_ms'] / 1000:.1f}s")
+            with col3:
+                st.metric("토큰 (입력 / 출력)",
+                          f"{totals['prompt_tokens']:,} / {totals['completion_tokens']:,}")
+            with col4:
+                st.metric("추정 비용", f"${totals['cost_usd']:.3f}",
+                          help=f"오류 {totals['errors']:,}회: {totals['errors_by_class'] or '없음'}")
+            
+            if not call_summary['by_type'].empty:
+                st.dataframe(
+                    call_summary['by_type'].rename(columns={
+                        'analysis_type': '분석 유형', 'calls': '호출', 'cache_hits': '캐시 적중',
+                        'coalesced': '병합', 'errors': '오류',
+                        'prompt_tokens': '입력 토큰', 'completion_tokens': '출력 토큰', 'cost_usd': '비용($)',
+                        'latency_p50_ms': 'p50(ms)', 'latency_p95_ms': 'p95(ms)'
+                    }),
+                    use_container_width=True, hide_index=True
+                )
+                st.bar_chart(call_summary['daily'].set_index('date')[['prompt_tokens', 'completion_tokens']])
+            
+            if st.button("🗑️ GPT 호출 기록 삭제"):
+                llm_telemetry.clear()
+                st.success("✅ GPT 호출 기록을 삭제했습니다.")
+        except Exception as e:
+            st.warning(f"⚠️ GPT 호출 통계를 불러올 수 없습니다: {str(e)}")
+        
         debug_mode = st.checkbox("디버그 모드 활성화", value=False)
         cache_enabled = st.checkbox("데이터 캐싱 활성화", value=True)
         performance_monitoring = st.checkbox("성능 모니터링 활성화", value=False)
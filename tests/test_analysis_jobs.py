@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from utils.analysis_worker import run_job
+from utils.database_manager import DatabaseManager
+from utils.gpt_analyzer import GPTAnalyzer
+from tests.test_ingest import make_chat
+
+
+class SlowAnalyzer:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def analyze_chat(self, data, analysis_type, full_history=False):
+        time.sleep(self.seconds)
+        return {"summary": f"{len(data)}개 메시지 분석"}
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / "jobs.db"))
+    room_id = db_manager.get_or_create_chat_room(["사용자0", "사용자1", "사용자2"])
+    db_manager.save_messages(room_id, None, None, make_chat(0, 100))
+    db_manager.enqueue_analysis_jobs([room_id], ["기본 분석"])
+    return db_manager
+
+
+def job_state(db_manager, job_id):
+    return db_manager.get_connection().execute(
+        'SELECT state, worker FROM analysis_jobs WHERE id = ?', (job_id,)
+    ).fetchone()
+
+
+def test_heartbeat_keeps_long_job_from_being_reclaimed(db_manager):
+    job = db_manager.claim_analysis_job("worker-a", lease_seconds=0.3)
+    claimed = []
+
+    def other_worker():
+        time.sleep(0.6)  # 처음 할당 시간이 지난 뒤
+        claimed.append(DatabaseManager(db_manager.db_path).claim_analysis_job("worker-b", lease_seconds=0.3))
+
+    thread = threading.Thread(target=other_worker)
+    thread.start()
+    result_id = run_job(db_manager, SlowAnalyzer(1.0), job, "worker-a", lease_seconds=0.3)
+    thread.join()
+
+    assert claimed == [None]
+    assert result_id is not None
+    assert job_state(db_manager, job['id']) == ("done", "worker-a")
+
+
+def test_complete_and_fail_are_ignored_after_lease_is_lost(db_manager):
+    job = db_manager.claim_analysis_job("worker-a", lease_seconds=0.1)
+    time.sleep(0.2)
+
+    # 만료만 되고 아직 아무도 가져가지 않은 경우에도 할당을 잃은 것으로 처리
+    assert db_manager.extend_analysis_job_lease(job['id'], "worker-a") is False
+    assert db_manager.complete_analysis_job(job['id'], "worker-a", {"summary": "늦은 결과"}) is None
+
+    reclaimed = db_manager.claim_analysis_job("worker-b")
+    assert reclaimed['id'] == job['id']
+    assert db_manager.fail_analysis_job(job['id'], "worker-a", "늦은 오류") is False
+    assert job_state(db_manager, job['id']) == ("running", "worker-b")
+
+
+def test_incremental_job_includes_late_message_from_same_minute(db_manager, monkeypatch):
+    analyzer = GPTAnalyzer("sk-test", cache_path=None)
+    prompts = []
+
+    def fake_completion(messages, **kwargs):
+        prompts.append(messages[-1]['content'])
+        return "분석 결과"
+
+    monkeypatch.setattr(analyzer, '_chat_completion', fake_completion)
+    first = db_manager.claim_analysis_job("worker-a")
+    room_id = first['room_id']
+    assert run_job(db_manager, analyzer, first, "worker-a") is not None
+
+    # 이미 분석한 마지막 메시지와 같은 분에 보낸 메시지가 나중 업로드로 추가됨
+    late = make_chat(99, 1).assign(message="늦게 올라온 메시지")
+    db_manager.save_messages(room_id, None, None, late)
+    db_manager.enqueue_analysis_jobs([room_id], ["기본 분석"], incremental=True)
+
+    second = db_manager.claim_analysis_job("worker-a")
+    result_id = run_job(db_manager, analyzer, second, "worker-a")
+
+    assert result_id is not None
+    assert "늦게 올라온 메시지" in prompts[-1]
+    latest = db_manager.get_latest_analysis(room_id, "기본 분석")
+    assert latest['id'] == result_id
+    assert latest['last_message_id'] == db_manager.get_connection().execute(
+        'SELECT MAX(id) FROM chat_messages WHERE room_id = ?', (room_id,)
+    ).fetchone()[0]
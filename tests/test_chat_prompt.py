@@ -0,0 +1,42 @@
+import pandas as pd
+
+from tests.test_incremental import analyzer  # noqa: F401 (픽스처)
+
+
+def make_chat(periods):
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=periods, freq='min'),
+        'user': [f"사용자{i % 3}" for i in range(periods)],
+        'message': [f"{i}번째 메시지" for i in range(periods)],
+    })
+
+
+def transcript_lines(prompt):
+    return sum(1 for line in prompt.splitlines() if "번째 메시지" in line)
+
+
+def test_sample_size_reaches_prompt(analyzer):
+    data = make_chat(3000)
+
+    analyzer.analyze_chat(data, "종합 분석")
+    default_prompt = analyzer.prompts[-1]
+    analyzer.analyze_chat(data, "종합 분석", sample_size=2000)
+    large_prompt = analyzer.prompts[-1]
+
+    assert "총 메시지 수: 500개" in default_prompt
+    assert "총 메시지 수: 2,000개" in large_prompt
+    # 고른 메시지 2,000개가 모두 대화록에 담김 (기본 설정은 토큰 예산만큼만)
+    assert transcript_lines(large_prompt) == 2000
+    assert transcript_lines(default_prompt) < 500
+
+
+def test_stream_uses_sample_size(analyzer, monkeypatch):
+    def fake_stream(messages, *args, **kwargs):
+        analyzer.prompts.append(messages[-1]['content'])
+        yield "갱신된 분석"
+
+    monkeypatch.setattr(analyzer, '_chat_completion_stream', fake_stream)
+
+    list(analyzer.analyze_chat_stream(make_chat(3000), "종합 분석", sample_size=1500))
+
+    assert "총 메시지 수: 1,500개" in analyzer.prompts[-1]
@@ -0,0 +1,62 @@
+import hashlib
+
+from utils.database_manager import DatabaseManager
+from tests.test_ingest import make_chat
+
+
+def make_legacy(db_manager, file_id, content):
+    """업그레이드 전 형식(접두사 없는 MD5, 지문 없음)으로 되돌림"""
+    conn = db_manager.get_connection()
+    conn.execute(
+        'UPDATE chat_files SET file_hash = ?, file_mtime = NULL, partial_hash = NULL WHERE id = ?',
+        (hashlib.md5(content).hexdigest(), file_id)
+    )
+    conn.commit()
+
+
+def file_count(db_manager, room_id):
+    cursor = db_manager.get_connection().cursor()
+    cursor.execute('SELECT COUNT(*) FROM chat_files')
+    rows = cursor.fetchone()[0]
+    cursor.execute('SELECT file_count FROM room_summary WHERE room_id = ?', (room_id,))
+    return rows, cursor.fetchone()[0]
+
+
+def test_reupload_matches_legacy_md5_row(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / "files.db"))
+    content = "카카오톡 대화 내보내기".encode('utf-8') * 100
+    chat = make_chat(0, 10)
+
+    file_id, room_id, _ = db_manager.save_chat_file_complete(None, "chat.txt", chat, file_bytes=content)
+    make_legacy(db_manager, file_id, content)
+
+    same_id, _, _ = db_manager.save_chat_file_complete(None, "chat.txt", chat, file_bytes=content)
+    assert same_id == file_id
+    assert file_count(db_manager, room_id) == (1, 1)
+
+    # 찾은 행은 새 해시로 바뀌어 다음부터는 바로 조회됨
+    cursor = db_manager.get_connection().cursor()
+    cursor.execute('SELECT file_hash FROM chat_files WHERE id = ?', (file_id,))
+    assert cursor.fetchone()[0] == db_manager.create_file_hash(None, "chat.txt", content)
+
+
+def test_migration_rehashes_legacy_rows_with_existing_file(tmp_path):
+    db_path = str(tmp_path / "files.db")
+    chat_path = tmp_path / "chat.txt"
+    chat_path.write_bytes("카카오톡 대화 내보내기".encode('utf-8') * 100)
+
+    db_manager = DatabaseManager(db_path)
+    file_id, room_id, _ = db_manager.save_chat_file_complete(str(chat_path), "chat.txt", make_chat(0, 10))
+    new_hash = db_manager.create_file_hash(str(chat_path), "chat.txt")
+    make_legacy(db_manager, file_id, chat_path.read_bytes())
+
+    conn = db_manager.get_connection()
+    conn.execute('PRAGMA user_version = 11')
+    conn.commit()
+    DatabaseManager(db_path)
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT file_hash, partial_hash FROM chat_files WHERE id = ?', (file_id,))
+    file_hash, partial_hash = cursor.fetchone()
+    assert file_hash == new_hash
+    assert partial_hash is not None
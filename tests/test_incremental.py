@@ -0,0 +1,52 @@
+import pytest
+
+from utils.database_manager import DatabaseManager
+from utils.gpt_analyzer import GPTAnalyzer
+from tests.test_ingest import make_chat
+
+
+@pytest.fixture
+def room(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / "chat.db"))
+    room_id = db_manager.get_or_create_chat_room(["사용자0", "사용자1", "사용자2"])
+    db_manager.save_messages(room_id, None, None, make_chat(0, 100))
+    return db_manager, room_id
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    analyzer = GPTAnalyzer("sk-test", cache_path=None)
+    analyzer.prompts = []
+
+    def fake_completion(messages, **kwargs):
+        analyzer.prompts.append(messages[-1]['content'])
+        return "갱신된 분석"
+
+    monkeypatch.setattr(analyzer, '_chat_completion', fake_completion)
+    return analyzer
+
+
+def analyze(analyzer, db_manager, room_id, **kwargs):
+    data = db_manager.load_room_messages(room_id)
+    previous = {"id": 1, "summary": "이전 분석", "last_message_ts": int(data['datetime'].iloc[89].value // 10**9)}
+    result = analyzer.analyze_chat_incremental(data, "종합 분석", previous, **kwargs)
+    assert result["incremental"]["new_messages"] == 10
+    return analyzer.prompts[-1]
+
+
+def test_incremental_prompt_uses_room_statistics(room, analyzer):
+    db_manager, room_id = room
+    prompt = analyze(analyzer, db_manager, room_id, room_stats=db_manager.get_room_user_statistics(room_id))
+
+    assert "분석 개요 (채팅방 전체 기준)" in prompt
+    assert "총 메시지 수: 100개" in prompt
+    assert "참여자 수: 3명" in prompt
+    assert "분석 기간: 2024-01-01 ~ 2024-01-01" in prompt
+
+
+def test_incremental_prompt_labels_delta_statistics(room, analyzer):
+    db_manager, room_id = room
+    prompt = analyze(analyzer, db_manager, room_id)
+
+    assert "분석 개요 (이전 분석 이후 새 대화 기준)" in prompt
+    assert "총 메시지 수: 10개" in prompt
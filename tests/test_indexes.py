@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from utils.database_manager import DatabaseManager
+
+# 인덱스를 사용해야 하는 주요 조회 (이름, SQL, 예시 파라미터)
+HOT_QUERIES = [
+    ('room_range', '''
+        SELECT id, ts, user_id, message, message_length FROM chat_messages
+        WHERE room_id = ? AND ts >= ? AND ts <= ? AND (ts > ? OR (ts = ? AND id > ?))
+        ORDER BY ts, id LIMIT ?
+    ''', (1, 0, 0, 0, 0, 0, 1)),
+    ('session_legacy', '''
+        SELECT cm.datetime, cu.name, cm.message, cm.message_length FROM chat_messages cm
+        LEFT JOIN chat_users cu ON cu.id = cm.user_id
+        WHERE cm.session_id = ? ORDER BY cm.datetime
+    ''', (1,)),
+    ('room_messages', 'SELECT COUNT(*), MIN(datetime), MAX(datetime) FROM chat_messages WHERE room_id = ?', (1,)),
+    ('room_participants', 'SELECT COUNT(*) FROM chat_users WHERE room_id = ?', (1,)),
+    ('room_users', 'SELECT id, name FROM chat_users WHERE room_id = ? ORDER BY id', (1,)),
+    ('user_messages', 'SELECT COUNT(*) FROM chat_messages WHERE user_id = ?', (1,)),
+    ('file_messages', 'SELECT COUNT(*) FROM chat_messages WHERE file_id = ?', (1,)),
+    ('message_hash', 'SELECT id FROM chat_messages WHERE message_hash = ?', ('',)),
+    ('delete_room_messages', 'DELETE FROM chat_messages WHERE room_id = ?', (1,)),
+    ('delete_session_messages', 'DELETE FROM chat_messages WHERE session_id = ?', (1,)),
+    ('room_files', 'SELECT id FROM chat_files WHERE room_id = ?', (1,)),
+    ('room_sessions', 'SELECT id FROM analysis_sessions WHERE room_id = ?', (1,)),
+]
+
+# 정렬까지 인덱스 순서로 처리해야 하는 조회 (임시 B-tree 정렬 금지)
+ORDERED_QUERIES = {'room_range', 'session_legacy'}
+
+
+@pytest.fixture(scope="module")
+def db_manager(tmp_path_factory):
+    db_manager = DatabaseManager(str(tmp_path_factory.mktemp("db") / "indexes.db"))
+    chat_data = pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=500, freq='10min'),
+        'user': [f"사용자{i % 5}" for i in range(500)],
+        'message': [f"메시지 {i}" for i in range(500)],
+    })
+    db_manager.save_chat_file_complete('/nonexistent/chat.txt', 'chat.txt', chat_data)
+    yield db_manager
+    db_manager.close()
+
+
+@pytest.mark.parametrize("name, sql, params", HOT_QUERIES, ids=[query[0] for query in HOT_QUERIES])
+def test_hot_query_uses_index(db_manager, name, sql, params):
+    cursor = db_manager.get_connection().cursor()
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    details = [row[3] for row in cursor.fetchall()]
+
+    assert any('USING INDEX' in d or 'USING COVERING INDEX' in d or 'USING INTEGER PRIMARY KEY' in d
+               for d in details), details
+    assert not any(d.startswith('SCAN') and 'INDEX' not in d for d in details), details
+    if name in ORDERED_QUERIES:
+        assert not any('TEMP B-TREE' in d for d in details), details
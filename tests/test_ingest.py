@@ -0,0 +1,76 @@
+import threading
+
+import pandas as pd
+
+from utils.database_manager import DatabaseManager
+
+
+def make_chat(start, periods):
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=start + periods, freq='min')[start:],
+        'user': [f"사용자{i % 3}" for i in range(start, start + periods)],
+        'message': [f"메시지 {i}" for i in range(start, start + periods)],
+    })
+
+
+def test_overlapping_concurrent_ingest_stores_each_message_once(tmp_path):
+    db_path = str(tmp_path / "ingest.db")
+    db_manager = DatabaseManager(db_path)
+    room_id = db_manager.get_or_create_chat_room(["사용자0", "사용자1", "사용자2"])
+
+    # 겹치는 두 내보내기 파일을 여러 스레드(각자 다른 연결)에서 동시에 저장
+    chats = [make_chat(0, 3000), make_chat(1000, 3000)] * 2
+    errors, saved = [], []
+    barrier = threading.Barrier(len(chats))
+
+    def ingest(chat):
+        try:
+            barrier.wait()
+            saved.append(DatabaseManager(db_path).save_messages(room_id, None, None, chat))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=ingest, args=(chat,)) for chat in chats]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sum(saved) == 4000
+
+    conn = db_manager.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM chat_messages WHERE room_id = ?', (room_id,)).fetchone()[0] == 4000
+    assert conn.execute('SELECT message_count FROM room_summary WHERE room_id = ?', (room_id,)).fetchone()[0] == 4000
+
+
+def test_room_list_reads_participants_from_summary(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / "rooms.db"))
+    room_id = db_manager.get_or_create_chat_room(["사용자0", "사용자1", "사용자2"])
+    empty_room_id = db_manager.get_or_create_chat_room(["다른 사용자"])
+    db_manager.save_messages(room_id, None, None, make_chat(0, 10))
+
+    # 나중 업로드에서 처음 등장한 참여자도 목록에 추가됨
+    later = make_chat(10, 1).assign(user="새 참여자")
+    db_manager.save_messages(room_id, None, None, later)
+
+    statements = []
+    db_manager.get_connection().set_trace_callback(statements.append)
+    rooms = db_manager.get_all_rooms().set_index('id')
+    db_manager.get_connection().set_trace_callback(None)
+
+    assert rooms.loc[room_id, 'participants_list'] == ["사용자0", "사용자1", "사용자2", "새 참여자"]
+    assert rooms.loc[empty_room_id, 'participants_list'] == ["다른 사용자"]
+    assert not [s for s in statements if 'chat_users' in s]
+
+
+def test_getting_connection_keeps_open_transaction(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / "pool.db"))
+    conn = db_manager.get_connection()
+    conn.execute("INSERT INTO chat_rooms (room_name, room_hash, participants) VALUES ('방', 'hash', '[]')")
+
+    # 같은 스레드에서 연결을 다시 얻어도 커밋 전 작업이 사라지지 않음
+    assert db_manager.get_connection() is conn
+    assert conn.in_transaction
+    conn.commit()
+    assert conn.execute('SELECT COUNT(*) FROM chat_rooms').fetchone()[0] == 1
@@ -0,0 +1,31 @@
+from utils.llm_cache import LLMCache
+
+
+def test_evicts_least_recently_used_entries_over_limit(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_entries=10, evict_interval=1)
+    for i in range(20):
+        cache.set(f"key{i}", "model", f"응답 {i}")
+
+    stats = cache.stats()
+    assert stats['entries'] <= 10
+    assert stats['evictions'] >= 10
+    assert cache.get("key19") == "응답 19"
+    assert cache.get("key0") is None
+
+
+def test_eviction_runs_every_interval(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_entries=10, evict_interval=5)
+    for i in range(15):
+        cache.set(f"key{i}", "model", f"응답 {i}")
+
+    # 11번째 저장에서 목표치(9개)까지 줄고, 다음 정리 전까지는 한도를 넘어도 그대로 둠
+    assert cache.stats()['entries'] == 13
+
+
+def test_expired_entries_are_removed(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"), ttl_seconds=-1, evict_interval=1)
+    cache.set("old", "model", "만료된 응답")
+    cache.set("new", "model", "새 응답")
+
+    assert cache.get("new") is None
+    assert cache.stats()['evictions'] >= 1
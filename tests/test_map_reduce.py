@@ -0,0 +1,29 @@
+import pandas as pd
+
+from utils.gpt_analyzer import GPTAnalyzer
+from tests.test_upstream_guard import analyzer, stub  # noqa: F401 (픽스처)
+
+
+def make_days(days, per_day=40):
+    """하루 한 번씩 대화가 이어지는 채팅 (하루 약 900토큰)"""
+    return pd.DataFrame([
+        (pd.Timestamp('2024-01-01') + pd.Timedelta(days=day, minutes=i), f"사용자{i % 3}",
+         f"{day}일차 {i}번째 메시지입니다 오늘은 이런저런 이야기를 나눴어요")
+        for day in range(days) for i in range(per_day)
+    ], columns=['datetime', 'user', 'message'])
+
+
+def test_rerun_summarizes_only_new_chunks(stub, analyzer, tmp_path):
+    analyzer = GPTAnalyzer("sk-test", cache_path=str(tmp_path / "llm.db"), base_url=analyzer.base_url,
+                           coalesce=False, max_retries=2)
+
+    first = analyzer.analyze_chat(make_days(10), "종합 분석", full_history=True)["map_reduce"]
+    assert first["chunks"] == 5
+    assert (first["summarized"], first["cached"]) == (5, 0)
+    assert stub.requests == 6  # 구간 요약 5 + 최종 분석 1
+
+    # 새 날짜의 대화가 추가되면 기존 구간은 그대로이고 새 구간만 요약
+    second = analyzer.analyze_chat(make_days(11), "종합 분석", full_history=True)["map_reduce"]
+    assert second["chunks"] == 6
+    assert (second["summarized"], second["cached"]) == (1, 5)
+    assert stub.requests == 8
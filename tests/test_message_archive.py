@@ -0,0 +1,50 @@
+import pytest
+
+from utils.database_manager import DatabaseManager
+from tests.test_ingest import make_chat
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / "archive.db"), archive_dir=str(tmp_path / "archive"))
+    room_id = db_manager.get_or_create_chat_room(["사용자0", "사용자1", "사용자2"])
+    db_manager.save_messages(room_id, None, None, make_chat(0, 50))
+    return db_manager, room_id
+
+
+def messages(db_manager, room_id):
+    return db_manager.load_room_messages(room_id)['message'].tolist()
+
+
+def test_saved_messages_are_read_from_archive(db_manager, monkeypatch):
+    db_manager, room_id = db_manager
+    monkeypatch.setattr(db_manager, 'iter_room_messages', None)  # SQLite 조회 금지
+
+    assert db_manager.is_archive_current(room_id)
+    assert messages(db_manager, room_id) == [f"메시지 {i}" for i in range(50)]
+
+
+def test_failed_append_falls_back_to_sqlite_until_rebuilt(db_manager, monkeypatch):
+    db_manager, room_id = db_manager
+
+    def fail(room_id, chat_data):
+        raise OSError("디스크 공간 부족")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db_manager.archive, 'append', fail)
+        assert db_manager.save_messages(room_id, None, None, make_chat(50, 10)) == 10
+
+    # 아카이브에 없는 메시지도 SQLite에서 조회
+    assert not db_manager.is_archive_current(room_id)
+    assert messages(db_manager, room_id) == [f"메시지 {i}" for i in range(60)]
+
+    # 이후 저장이 성공해도 빠진 메시지가 있으므로 계속 SQLite 사용
+    db_manager.save_messages(room_id, None, None, make_chat(60, 10))
+    assert not db_manager.is_archive_current(room_id)
+    assert messages(db_manager, room_id) == [f"메시지 {i}" for i in range(70)]
+
+    # 재구성하면 다시 아카이브에서 조회
+    assert db_manager.archive_room(room_id) == 70
+    assert db_manager.is_archive_current(room_id)
+    monkeypatch.setattr(db_manager, 'iter_room_messages', None)
+    assert messages(db_manager, room_id) == [f"메시지 {i}" for i in range(70)]
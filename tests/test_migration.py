@@ -0,0 +1,204 @@
+import json
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from utils.database_manager import ConnectionPool, DatabaseManager
+
+# 스키마 버전 관리 이전(user_version 0)의 테이블 구조
+BASELINE_SCHEMA = '''
+CREATE TABLE chat_rooms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_name TEXT NOT NULL,
+    room_hash TEXT UNIQUE,
+    participants TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE chat_files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_id INTEGER,
+    file_name TEXT NOT NULL,
+    file_path TEXT,
+    file_hash TEXT UNIQUE,
+    file_size INTEGER,
+    message_count INTEGER,
+    start_date TEXT,
+    end_date TEXT,
+    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (room_id) REFERENCES chat_rooms (id)
+);
+CREATE TABLE analysis_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_name TEXT NOT NULL,
+    room_id INTEGER,
+    file_ids TEXT,
+    file_name TEXT,
+    total_messages INTEGER,
+    participants_count INTEGER,
+    start_date TEXT,
+    end_date TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    description TEXT,
+    FOREIGN KEY (room_id) REFERENCES chat_rooms (id)
+);
+CREATE TABLE chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_id INTEGER,
+    file_id INTEGER,
+    session_id INTEGER,
+    datetime TEXT,
+    user TEXT,
+    message TEXT,
+    message_length INTEGER,
+    message_hash TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (room_id) REFERENCES chat_rooms (id),
+    FOREIGN KEY (file_id) REFERENCES chat_files (id),
+    FOREIGN KEY (session_id) REFERENCES analysis_sessions (id)
+);
+CREATE TABLE gpt_analysis_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER,
+    analysis_type TEXT,
+    target_user TEXT,
+    summary TEXT,
+    keywords TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (session_id) REFERENCES analysis_sessions (id)
+);
+CREATE TABLE user_statistics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER,
+    user TEXT,
+    message_count INTEGER,
+    avg_message_length REAL,
+    most_active_hour INTEGER,
+    first_message TEXT,
+    last_message TEXT,
+    FOREIGN KEY (session_id) REFERENCES analysis_sessions (id)
+);
+CREATE TABLE time_statistics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER,
+    hour INTEGER,
+    message_count INTEGER,
+    FOREIGN KEY (session_id) REFERENCES analysis_sessions (id)
+);
+CREATE TABLE analysis_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_name TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    analysis_mode TEXT,
+    target_user TEXT,
+    prompt TEXT,
+    result_summary TEXT,
+    keywords TEXT,
+    insights TEXT,
+    recommendations TEXT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+'''
+
+
+def message(i):
+    """i번째 메시지 (10번째부터는 사용자A만 말함)"""
+    user = "사용자B" if i < 10 and i % 2 else "사용자A"
+    return (pd.Timestamp('2024-01-01') + pd.Timedelta(minutes=i)).isoformat(), user, f"메시지 {i}"
+
+
+def add_session(conn, name, file_name, indices):
+    """구버전 save_analysis_session: 세션 정보와 세션 전용 메시지 사본 저장"""
+    rows = [message(i) for i in indices]
+    session_id = conn.execute('''
+        INSERT INTO analysis_sessions
+        (session_name, file_name, total_messages, participants_count, start_date, end_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (name, file_name, len(rows), len({r[1] for r in rows}), rows[0][0], rows[-1][0])).lastrowid
+    conn.executemany(
+        'INSERT INTO chat_messages (session_id, datetime, user, message, message_length) VALUES (?, ?, ?, ?, ?)',
+        [(session_id, dt, user, text, len(text)) for dt, user, text in rows]
+    )
+    return session_id
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    db_path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(BASELINE_SCHEMA)
+
+    # 구버전 save_chat_file_complete: 채팅방 + 파일 + 세션 사본 + 채팅방 메시지
+    room_id = conn.execute(
+        "INSERT INTO chat_rooms (room_name, room_hash, participants) VALUES ('사용자A, 사용자B', 'hash', ?)",
+        (json.dumps(["사용자A", "사용자B"], ensure_ascii=False),)
+    ).lastrowid
+    file_id = conn.execute(
+        "INSERT INTO chat_files (room_id, file_name, file_hash, file_size) VALUES (?, 'chat.txt', 'md5', 100)",
+        (room_id,)
+    ).lastrowid
+    upload_session = add_session(conn, "chat.txt 분석", "chat.txt", range(10))
+    conn.executemany('''
+        INSERT INTO chat_messages (room_id, file_id, session_id, datetime, user, message, message_length, message_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(room_id, file_id, upload_session, *message(i), len(message(i)[2]), f"h{i}") for i in range(10)])
+
+    # 파일 없이 저장된 세션: 같은 대화 전체, 일부만 겹치는 대화
+    standalone = add_session(conn, "직접 저장한 세션", "export.txt", range(10))
+    partial = add_session(conn, "일부 겹치는 세션", None, range(5, 15))
+    conn.commit()
+    conn.close()
+    return db_path, room_id, standalone, partial
+
+
+def test_standalone_sessions_keep_their_messages(baseline_db):
+    db_path, room_id, standalone, partial = baseline_db
+    db_manager = DatabaseManager(db_path)
+
+    assert len(db_manager.get_session_data(standalone)) == 10
+    assert db_manager.get_session_data(partial)['message'].tolist() == [f"메시지 {i}" for i in range(5, 15)]
+
+    # 일부만 겹치던 세션의 나머지 메시지도 새 채팅방이 아니라 같은 채팅방에 들어감
+    conn = db_manager.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM chat_rooms').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM chat_messages WHERE room_id = ?', (room_id,)).fetchone()[0] == 15
+    assert conn.execute('SELECT COUNT(*) FROM chat_messages').fetchone()[0] == 15
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == DatabaseManager.SCHEMA_VERSION
+
+
+def test_upgrade_vacuums_once(baseline_db, monkeypatch):
+    # 채팅방 메시지와 겹치는 세션 사본이 많아 중복 제거로 페이지가 비워지는 데이터베이스
+    conn = sqlite3.connect(baseline_db[0])
+    add_session(conn, "반복 저장한 세션", "chat.txt", list(range(10)) * 300)
+    conn.commit()
+    conn.close()
+
+    statements = []
+    create_connection = ConnectionPool._create_connection
+
+    def traced(self):
+        conn = create_connection(self)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(ConnectionPool, '_create_connection', traced)
+    db_manager = DatabaseManager(baseline_db[0])
+
+    assert [s for s in statements if s.strip().upper() == 'VACUUM'] == ['VACUUM']
+    conn = db_manager.get_connection()
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
+
+
+def test_new_database_uses_incremental_auto_vacuum(tmp_path):
+    conn = DatabaseManager(str(tmp_path / "new.db")).get_connection()
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+
+def test_upgrade_fills_room_participants(baseline_db):
+    db_path, room_id, _, _ = baseline_db
+    conn = DatabaseManager(db_path).get_connection()
+
+    participants = conn.execute('SELECT participants FROM room_summary WHERE room_id = ?', (room_id,)).fetchone()[0]
+    assert json.loads(participants) == ["사용자A", "사용자B"]
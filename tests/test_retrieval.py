@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from utils.database_manager import DatabaseManager
+from utils.gpt_analyzer import GPTAnalyzer
+
+
+def make_chat():
+    topics = ["등산 가자", "저녁 메뉴 정하자", "영화 예매했어", "회의 자료 공유"]
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=400, freq='min'),
+        'user': [f"사용자{i % 3}" for i in range(400)],
+        'message': [f"{topics[i % len(topics)]} {i}" for i in range(400)],
+    })
+
+
+@pytest.fixture
+def analyzer():
+    GPTAnalyzer._retrieval_cache.clear()
+    return GPTAnalyzer("sk-test", cache_path=None)
+
+
+def test_retrieves_from_persisted_room_index(tmp_path, analyzer, monkeypatch):
+    db_manager = DatabaseManager(str(tmp_path / "chat.db"), index_dir=str(tmp_path / "index"))
+    _, room_id, _ = db_manager.save_chat_file_complete(None, "chat.txt", make_chat(), file_bytes=b"chat")
+    data = db_manager.load_room_messages(room_id)
+    data = data[data['user'] == "사용자1"]
+
+    # 저장된 인덱스를 쓰면 메모리 인덱스를 만들지 않음
+    monkeypatch.setattr(analyzer, '_get_retrieval_index', lambda data: pytest.fail("메모리 인덱스 사용"))
+    relevant = analyzer.retrieve_relevant(data, "영화 예매", 10, room_id, db_manager)
+
+    assert len(relevant) == 10
+    assert relevant.isin(data.index).all()
+    assert data.loc[relevant, 'message'].str.startswith("영화 예매했어").all()
+
+
+def test_memory_index_is_cached_per_content(analyzer):
+    first = make_chat()
+    second = first.assign(message=first['message'] + " 추가")
+
+    for data in [first, second, first, second]:
+        relevant = analyzer.retrieve_relevant(data, "저녁 메뉴", 5)
+        assert data.loc[relevant, 'message'].str.startswith("저녁 메뉴").all()
+
+    # 번갈아 검색해도 두 데이터의 인덱스가 모두 유지됨
+    assert len(GPTAnalyzer._retrieval_cache) == 2
+    assert analyzer._get_retrieval_index(first.copy()) is analyzer._get_retrieval_index(first)
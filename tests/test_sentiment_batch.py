@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from utils.gpt_analyzer import GPTAnalyzer
+from tests.test_upstream_guard import SENTIMENTS, analyzer, stub  # noqa: F401 (픽스처)
+
+
+MESSAGES = [f"메시지 {i}" for i in range(20)]
+
+
+def expected(messages, batch_size):
+    return [SENTIMENTS[i % batch_size % 3] for i in range(len(messages))]
+
+
+def classify(analyzer, messages=MESSAGES, batch_size=5, **kwargs):
+    return analyzer.analyze_sentiment_batch(messages, batch_size=batch_size, use_lexicon=False, **kwargs)
+
+
+def test_misaligned_response_is_requested_again(stub, analyzer):
+    stub.misaligned = 1
+
+    assert classify(analyzer) == expected(MESSAGES, 5)
+    assert stub.requests == 5
+    stats = analyzer.last_sentiment_stats
+    assert stats["misaligned_responses"] == 1
+    assert stats["failed_batches"] == 0
+
+
+def test_batch_still_misaligned_after_retries_is_flagged(stub, analyzer):
+    stub.misaligned = 100
+
+    labels = classify(analyzer, MESSAGES[:5], max_retries=2)
+
+    # 응답에 있던 번호는 그대로 쓰고, 끝내 빠진 번호만 중립으로 채운 뒤 실패 배치로 기록
+    assert labels == expected(MESSAGES[:4], 5) + ['중립']
+    assert stub.requests == 3
+    stats = analyzer.last_sentiment_stats
+    assert stats["misaligned_responses"] == 3
+    assert stats["failed_batches"] == 1
+
+
+def test_rate_limited_batch_is_retried(stub, analyzer):
+    stub.failures = 1
+    stub.status = 429
+
+    assert classify(analyzer, MESSAGES[:5]) == expected(MESSAGES[:5], 5)
+    assert stub.requests == 2
+    assert analyzer.last_sentiment_stats["retries"] == 1
+    assert analyzer.last_sentiment_stats["failed_batches"] == 0
+
+
+def test_batches_are_sent_concurrently(stub, analyzer):
+    stub.delay = 0.2
+
+    started = time.time()
+    assert classify(analyzer, concurrency=1) == expected(MESSAGES, 5)
+    serial = time.time() - started
+
+    started = time.time()
+    assert classify(analyzer, concurrency=4) == expected(MESSAGES, 5)
+    concurrent = time.time() - started
+
+    assert stub.requests == 8
+    assert serial >= 0.8
+    assert concurrent < serial / 2
+
+
+@pytest.mark.parametrize("text, labels", [
+    ("0: 긍정\n1: 부정\n2: 중립", ['긍정', '부정', '중립']),
+    ("2: 중립\n0: 긍정\n1) 부정", ['긍정', '부정', '중립']),
+    ("0: 긍정\n2: 중립", ['긍정', None, '중립']),
+    ("0: 긍정\n1: 부정\n5: 중립", ['긍정', '부정', None]),
+    ("긍정\n부정\n중립", [None, None, None]),
+])
+def test_parse_indexed_sentiments(text, labels):
+    assert GPTAnalyzer("sk-test", cache_path=None).parse_indexed_sentiments(text, 3) == labels
@@ -0,0 +1,28 @@
+import pytest
+
+from utils.sentiment_lexicon import SentimentLexicon
+
+
+@pytest.fixture(scope="module")
+def lexicon():
+    return SentimentLexicon()
+
+
+@pytest.mark.parametrize("message", ["badminton", "goodbye", "Goodbye!", "hatebreed", "lollipop", "sadly"])
+def test_ascii_words_do_not_match_inside_other_words(lexicon, message):
+    assert lexicon.classify([message])[0] is None
+
+
+@pytest.mark.parametrize("message, label", [
+    ("good", "긍정"),
+    ("Thanks!", "긍정"),
+    ("lol ㅋㅋ", "긍정"),
+    ("good이에요", "긍정"),
+    ("bad", "부정"),
+    ("so sad ㅠㅠ", "부정"),
+    ("감사합니다", "긍정"),
+    ("짜증나", "부정"),
+    ("좋아요ㅋㅋ", "긍정"),
+])
+def test_lexicon_words_still_match(lexicon, message, label):
+    assert lexicon.classify([message])[0] == label
@@ -0,0 +1,193 @@
+import json
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from utils.gpt_analyzer import GPTAnalyzer
+from utils.rate_limiter import AdaptiveConcurrencyLimiter, CircuitBreaker, CircuitOpenError
+from utils.request_coalescer import RequestCoalescer
+
+
+SENTIMENTS = ['긍정', '부정', '중립']
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """처음 failures번은 status로 실패하고 이후에는 정상 응답하는 Chat Completions 서버
+
+    요청마다 delay초 기다린 뒤 응답합니다. 감정 분류 요청에는 'i: 감정' 형식으로 답하며
+    (i번 메시지는 SENTIMENTS[i % 3]), 처음 misaligned번은 마지막 번호를 빼고 답합니다.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            failing = server.requests <= server.failures
+
+        time.sleep(server.delay)
+        if failing:
+            return self._send(server.status, {"error": {"message": "upstream error"}}, {"retry-after": "0.01"})
+        if body.get('stream'):
+            return self._stream("스트리밍 응답")
+        self._send(200, {
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body['model'],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self._answer(body)},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+    def _answer(self, body):
+        prompt = body['messages'][-1]['content']
+        if '결과를' not in prompt:
+            return "정상 응답"
+
+        indices = [int(i) for i in re.findall(r'^(\d+): ', prompt.split('결과를')[0], re.MULTILINE)]
+        with self.server.lock:
+            if self.server.misaligned > 0:
+                self.server.misaligned -= 1
+                indices = indices[:-1]
+        return "\n".join(f"{i}: {SENTIMENTS[i % 3]}" for i in indices)
+
+    def _send(self, status, obj, headers=None):
+        data = json.dumps(obj, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, content):
+        events = [{"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                   "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                  for piece in content.split()]
+        data = "".join(f"data: {json.dumps(event, ensure_ascii=False)}\n\n" for event in events) + "data: [DONE]\n\n"
+        data = data.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.failures = 0
+    server.status = 500
+    server.delay = 0
+    server.misaligned = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def analyzer(stub, monkeypatch):
+    # 프로세스 공유 한도/차단기를 테스트마다 새로 만듦
+    monkeypatch.setattr(GPTAnalyzer, '_limiter', AdaptiveConcurrencyLimiter(initial_limit=8))
+    monkeypatch.setattr(GPTAnalyzer, '_breaker', CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    base_url = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    return GPTAnalyzer("sk-test", cache_path=None, base_url=base_url, coalesce=False, max_retries=2)
+
+
+def complete(analyzer):
+    return analyzer._chat_completion([{"role": "user", "content": "질문"}], max_tokens=10, temperature=0)
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_upstream_errors_open_breaker_and_shrink_limit(stub, analyzer, status):
+    stub.failures = 100
+    stub.status = status
+
+    with pytest.raises(Exception):
+        complete(analyzer)
+
+    # SDK 재시도 없이 시도마다 요청 1건 (1회 + 재시도 2회)
+    assert stub.requests == 3
+    stats = analyzer.get_upstream_stats()
+    assert stats["concurrency"]["limit"] < 8
+    assert stats["circuit"]["state"] == "open"
+
+    # 차단기가 열린 동안은 요청하지 않고 바로 실패
+    with pytest.raises(CircuitOpenError):
+        complete(analyzer)
+    assert stub.requests == 3
+
+
+def test_sync_call_retries_transient_errors(stub, analyzer):
+    stub.failures = 2
+
+    assert complete(analyzer) == "정상 응답"
+    assert stub.requests == 3
+    assert analyzer.get_upstream_stats()["circuit"]["state"] == "closed"
+
+
+def test_stream_retries_before_first_chunk(stub, analyzer):
+    stub.failures = 1
+
+    parts = list(analyzer._chat_completion_stream([{"role": "user", "content": "질문"}], max_tokens=10, temperature=0))
+    assert "".join(parts) == "스트리밍응답"
+    assert stub.requests == 2
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_each_attempt_is_recorded(stub, analyzer, tmp_path, streamed):
+    analyzer = GPTAnalyzer("sk-test", cache_path=str(tmp_path / "llm.db"), base_url=analyzer.base_url,
+                           coalesce=False, max_retries=2)
+    stub.failures = 2
+    messages = [{"role": "user", "content": "질문"}]
+
+    if streamed:
+        list(analyzer._chat_completion_stream(messages, max_tokens=10, temperature=0, use_cache=False))
+    else:
+        analyzer._chat_completion(messages, max_tokens=10, temperature=0, use_cache=False)
+
+    rows = analyzer.telemetry.pool.get().execute(
+        'SELECT attempt, error, streamed FROM llm_calls ORDER BY id'
+    ).fetchall()
+    assert rows == [(0, "InternalServerError", int(streamed)), (1, "InternalServerError", int(streamed)),
+                    (2, None, int(streamed))]
+    assert analyzer.get_call_summary()["totals"]["retries"] == 2
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_concurrent_identical_calls_share_one_request(stub, analyzer, monkeypatch, streamed):
+    monkeypatch.setattr(GPTAnalyzer, '_coalescer', RequestCoalescer())
+    analyzer = GPTAnalyzer("sk-test", cache_path=None, base_url=analyzer.base_url, coalesce=True, max_retries=2)
+    stub.delay = 0.3
+    callers = 5
+    barrier = threading.Barrier(callers)
+    results = []
+
+    def call():
+        barrier.wait()
+        if streamed:
+            results.append("".join(analyzer._chat_completion_stream(
+                [{"role": "user", "content": "질문"}], max_tokens=10, temperature=0
+            )))
+        else:
+            results.append(complete(analyzer))
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["스트리밍응답" if streamed else "정상 응답"] * callers
+    assert stub.requests == 1
+    assert analyzer.get_coalesce_stats()["merged"] == callers - 1
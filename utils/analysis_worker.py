@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+from utils.database_manager import DatabaseManager
+from utils.gpt_analyzer import GPTAnalyzer
+
+def run_worker(db_path, api_key, worker_id=None, drain=True, poll_interval=5.0, lease_seconds=1800,
+               cache_path="llm_cache.db", base_url=None):
+    """분석 작업 큐(analysis_jobs)의 작업을 하나씩 가져와 실행하는 워커 (반환값: 처리한 작업 수)
+
+    채팅방 메시지를 불러와 GPTAnalyzer.analyze_chat으로 분석하고, 결과를 analysis_history에 저장한 뒤
+    작업을 완료 처리합니다. 증분 작업은 이전 결과 이후의 메시지만 불러와 이전 결과와 합칩니다.
+    오류 결과나 예외는 시도 횟수가 남아 있으면 다시 대기 상태가 됩니다.
+    drain=True이면 대기 작업이 없을 때 종료하고, False이면 poll_interval초마다 새 작업을 확인합니다.
+    실행 중에는 할당을 주기적으로 연장하고, 워커가 강제 종료되면 실행 중이던 작업은
+    lease_seconds 후 다른 워커가 다시 가져갑니다.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    db_manager = DatabaseManager(db_path)
+    analyzer = GPTAnalyzer(api_key, cache_path=cache_path, base_url=base_url)
+
+    processed = 0
+    while True:
+        job = db_manager.claim_analysis_job(worker_id, lease_seconds)
+        if job is None:
+            if drain:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            run_job(db_manager, analyzer, job, worker_id, lease_seconds)
+        except (KeyboardInterrupt, SystemExit):
+            # 중단된 작업은 시도 횟수를 차감하지 않고 반환
+            db_manager.release_analysis_job(job['id'], worker_id)
+            raise
+        processed += 1
+
+@contextmanager
+def lease_heartbeat(db_manager, job_id, worker_id, lease_seconds=1800):
+    """블록이 실행되는 동안 lease_seconds의 1/3마다 작업 할당을 연장하는 백그라운드 스레드
+
+    할당을 잃으면(만료 후 다른 워커가 가져감) 연장을 멈추며, 이후 완료/실패 처리는 무시됩니다.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(lease_seconds / 3):
+            try:
+                if not db_manager.extend_analysis_job_lease(job_id, worker_id, lease_seconds):
+                    print(f"⚠️ #{job_id}: 작업 할당을 잃었습니다. 결과는 저장되지 않습니다.")
+                    return
+            except Exception as e:
+                print(f"⚠️ #{job_id}: 작업 할당 연장 실패: {str(e)}")
+
+    thread = threading.Thread(target=beat, name=f"lease-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def run_job(db_manager, analyzer, job, worker_id, lease_seconds=1800):
+    """작업 하나 실행 (반환값: 저장된 히스토리 ID, 실패 시 None)"""
+    with lease_heartbeat(db_manager, job['id'], worker_id, lease_seconds):
+        return _run_job(db_manager, analyzer, job, worker_id)
+
+def _run_job(db_manager, analyzer, job, worker_id):
+    label = f"#{job['id']} 채팅방 {job['room_id']} {job['analysis_type']} ({job['attempts']}/{job['max_attempts']}회차)"
+    started = time.time()
+
+    try:
+        # 증분 작업: 이전 결과의 마지막 메시지 ID 이후만 조회
+        # (ID가 없는 이전 버전 결과는 마지막 메시지 시각 이후)
+        previous = None
+        start_date = None
+        after_id = None
+        if job['incremental']:
+            previous = db_manager.get_latest_analysis(job['room_id'], job['analysis_type'])
+            if previous is not None and previous.get('last_message_id') is not None:
+                after_id = previous['last_message_id']
+            elif previous is not None:
+                start_date = pd.Timestamp(previous['last_message_ts'] + 1, unit='s')
+
+        data = db_manager.load_room_messages(
+            job['room_id'], start_date=start_date, after_id=after_id,
+            columns=['id', 'datetime', 'user', 'message', 'message_length']
+        )
+        if data.empty:
+            if previous is not None:
+                result_id = db_manager.complete_analysis_job(job['id'], worker_id, None, result_id=previous['id'])
+                print(f"✅ {label}: 새 메시지가 없어 이전 결과(히스토리 ID {previous['id']}) 유지")
+                return result_id
+            db_manager.fail_analysis_job(job['id'], worker_id, "분석할 메시지가 없습니다.", retry=False)
+            print(f"⚠️ {label}: 분석할 메시지가 없습니다.")
+            return None
+
+        if previous is not None:
+            result = analyzer.analyze_chat_incremental(
+                data, job['analysis_type'], previous, room_stats=db_manager.get_room_user_statistics(job['room_id'])
+            )
+        else:
+            result = analyzer.analyze_chat(data, job['analysis_type'], full_history=bool(job['full_history']))
+        if result.get('error'):
+            raise RuntimeError(result.get('summary', '분석 오류'))
+
+        last_message_ts = int(data['datetime'].max().value // 10**9)
+        if previous is not None:
+            last_message_ts = max(last_message_ts, previous['last_message_ts'])
+        result_id = db_manager.complete_analysis_job(
+            job['id'], worker_id, result, last_message_ts=last_message_ts, last_message_id=int(data['id'].max())
+        )
+        if result_id is None:
+            print(f"⚠️ {label}: 작업 할당을 잃어(시간 초과 또는 다른 워커가 가져감) 결과를 저장하지 않았습니다.")
+        else:
+            print(f"✅ {label}: 완료 ({time.time() - started:.1f}초, 히스토리 ID {result_id})")
+        return result_id
+
+    except Exception as e:
+        db_manager.fail_analysis_job(job['id'], worker_id, str(e))
+        print(f"❌ {label}: {str(e)}")
+        return None
+
+def run_workers(db_path, api_key, workers=4, drain=True, **worker_options):
+    """워커 프로세스 workers개로 작업 큐 처리 (동시에 진행되는 분석 = API 동시 요청 수 상한)
+
+    반환값은 모든 워커가 처리한 작업 수의 합입니다.
+    """
+    if workers <= 1:
+        return run_worker(db_path, api_key, drain=drain, **worker_options)
+
+    with multiprocessing.Pool(workers) as pool:
+        results = [
+            pool.apply_async(run_worker, (db_path, api_key), dict(drain=drain, **worker_options))
+            for _ in range(workers)
+        ]
+        return sum(result.get() for result in results)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="분석 작업 큐 워커 (작업 추가: python -m utils.database_manager enqueue)")
+    parser.add_argument('--db', default="kakao_analysis.db", help="데이터베이스 파일 경로")
+    parser.add_argument('--workers', type=int, default=4, help="워커 프로세스 수 (동시 분석 수)")
+    parser.add_argument('--watch', action='store_true', help="큐가 비어도 종료하지 않고 새 작업을 기다림")
+    parser.add_argument('--poll-interval', type=float, default=5.0, help="--watch 시 새 작업 확인 간격 (초)")
+    parser.add_argument('--lease-seconds', type=int, default=1800,
+                        help="작업 할당 유지 시간 (워커가 중단되면 이 시간 후 다른 워커가 다시 실행)")
+    parser.add_argument('--cache-path', default="llm_cache.db", help="LLM 응답 캐시/호출 기록 파일 경로")
+    parser.add_argument('--base-url', help="OpenAI 호환 서버 주소")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY", "")
+    if not api_key:
+        parser.error("OPENAI_API_KEY 환경 변수를 설정하세요.")
+
+    count = run_workers(
+        args.db, api_key, workers=args.workers, drain=not args.watch, poll_interval=args.poll_interval,
+        lease_seconds=args.lease_seconds, cache_path=args.cache_path, base_url=args.base_url
+    )
+    print(f"✅ 분석 작업 {count:,}개 처리 완료")
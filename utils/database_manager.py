@@ -4,26 +4,266 @@ import json
 from datetime import datetime
 import os
 import hashlib
+import threading
+import time
 
-class DatabaseManager:
-    """분석 결과 저장 및 관리를 위한 데이터베이스 클래스"""
+from utils.message_archive import MessageArchive
+from utils.message_index import MessageIndex
+
+try:
+    import xxhash  # 선택 의존성: 있으면 더 빠른 파일 해시 사용
+except ImportError:
+    xxhash = None
+
+# 파일 해시 스트리밍 버퍼 크기와 부분 해시(앞/뒤) 크기
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+PARTIAL_HASH_SIZE = 64 * 1024
+
+class ConnectionPool:
+    """스레드별 SQLite 연결 풀 (db 경로별로 공유)
+    
+    연결은 스레드당 하나씩 생성되어 재사용되며 PRAGMA 설정은 생성 시 한 번만 적용됩니다.
+    종료된 스레드의 연결은 새 연결을 만들 때 정리하고, 이전 호출이 실패해
+    열린 채로 남은 트랜잭션은 연결을 꺼낼 때 롤백합니다.
+    """
+    
+    _pools = {}
+    _pools_lock = threading.Lock()
     
-    def __init__(self, db_path="kakao_analysis.db"):
+    PRAGMAS = [
+        'PRAGMA auto_vacuum=INCREMENTAL;',  # 새 파일은 바로, 기존 파일은 다음 VACUUM에서 적용 (WAL 전환보다 먼저)
+        'PRAGMA journal_mode=WAL;',      # 여러 연결이 동시에 읽을 수 있음
+        'PRAGMA synchronous=NORMAL;',    # WAL에서는 NORMAL로도 손상 없이 안전
+        'PRAGMA foreign_keys=ON;',       # 외래 키 제약 조건 활성화
+        'PRAGMA cache_size=-65536;',     # 페이지 캐시 64MB
+        'PRAGMA mmap_size=268435456;',   # 256MB 메모리 맵 I/O
+        'PRAGMA temp_store=MEMORY;',     # 정렬/임시 테이블을 메모리에서 처리
+    ]
+    
+    def __init__(self, db_path):
         self.db_path = db_path
-        self.init_database()
+        self._local = threading.local()
+        self._connections = {}  # 스레드 -> 연결
+        self._lock = threading.Lock()
     
-    def get_connection(self):
-        """안전한 데이터베이스 연결 획득"""
+    @classmethod
+    def for_path(cls, db_path):
+        """db 경로별 공유 풀 조회 또는 생성"""
+        key = os.path.abspath(db_path)
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(db_path)
+                cls._pools[key] = pool
+            return pool
+    
+    def _create_connection(self):
+        """새 연결 생성 및 PRAGMA 일회 적용"""
         conn = sqlite3.connect(
             self.db_path,
             timeout=30.0,  # 30초 타임아웃
             check_same_thread=False  # 멀티스레드 지원
         )
-        # WAL 모드로 설정 (여러 연결이 동시에 읽을 수 있음)
-        conn.execute('PRAGMA journal_mode=WAL;')
-        # 외래 키 제약 조건 활성화
-        conn.execute('PRAGMA foreign_keys=ON;')
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def get(self):
+        """현재 스레드의 연결 획득
+        
+        같은 스레드에서는 같은 연결을 돌려주므로, 진행 중인 트랜잭션이 있으면 그 트랜잭션을 이어서 사용합니다.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._create_connection()
+            self._local.conn = conn
+            with self._lock:
+                self._close_dead_connections()
+                self._connections[threading.current_thread()] = conn
         return conn
+    
+    def _close_dead_connections(self):
+        """종료된 스레드가 남긴 연결 정리 (lock 보유 상태에서 호출)"""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            try:
+                self._connections.pop(thread).close()
+            except sqlite3.Error:
+                pass
+    
+    def close_all(self):
+        """풀의 모든 연결 종료"""
+        with self._lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = {}
+        self._local = threading.local()
+
+class DatabaseManager:
+    """분석 결과 저장 및 관리를 위한 데이터베이스 클래스"""
+    
+    # 실제 조회 경로 기준 인덱스 (이름, DDL)
+    INDEXES = [
+        ('idx_chat_messages_room_datetime',
+         'CREATE INDEX IF NOT EXISTS idx_chat_messages_room_datetime ON chat_messages (room_id, datetime)'),
+        ('idx_chat_messages_session_datetime',
+         'CREATE INDEX IF NOT EXISTS idx_chat_messages_session_datetime ON chat_messages (session_id, datetime)'),
+        ('idx_chat_messages_file',
+         'CREATE INDEX IF NOT EXISTS idx_chat_messages_file ON chat_messages (file_id)'),
+        ('idx_chat_messages_hash',
+         'CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_messages_hash ON chat_messages (message_hash)'),
+        # 참여자 수 집계(COUNT DISTINCT user)를 테이블 접근 없이 처리하는 커버링 인덱스
+        ('idx_chat_messages_room_user',
+         'CREATE INDEX IF NOT EXISTS idx_chat_messages_room_user ON chat_messages (room_id, user)'),
+        ('idx_chat_files_room',
+         'CREATE INDEX IF NOT EXISTS idx_chat_files_room ON chat_files (room_id)'),
+        ('idx_analysis_sessions_room',
+         'CREATE INDEX IF NOT EXISTS idx_analysis_sessions_room ON analysis_sessions (room_id)'),
+    ]
+    
+    # 최신 스키마 버전 (PRAGMA user_version)
+    SCHEMA_VERSION = 15
+    
+    # 메시지 로더에서 조회 가능한 컬럼 (datetime은 INTEGER ts, user는 chat_users ID에서 변환)
+    MESSAGE_COLUMNS = {
+        'id': 'id',
+        'datetime': 'ts',
+        'user': 'user_id',
+        'message': 'message',
+        'message_length': 'message_length',
+        'file_id': 'file_id',
+    }
+    
+    # ON DELETE 동작을 포함한 테이블 정의 (스키마 버전 7 재구성용)
+    CASCADE_TABLES = {
+        'chat_files': '''
+            CREATE TABLE chat_files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_id INTEGER,
+                file_name TEXT NOT NULL,
+                file_path TEXT,
+                file_hash TEXT UNIQUE,
+                file_size INTEGER,
+                message_count INTEGER,
+                start_date TEXT,
+                end_date TEXT,
+                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                file_mtime REAL,
+                partial_hash TEXT,
+                FOREIGN KEY (room_id) REFERENCES chat_rooms (id) ON DELETE CASCADE
+            )
+        ''',
+        'analysis_sessions': '''
+            CREATE TABLE analysis_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_name TEXT NOT NULL,
+                room_id INTEGER,
+                file_ids TEXT,
+                file_name TEXT,
+                total_messages INTEGER,
+                participants_count INTEGER,
+                start_date TEXT,
+                end_date TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                description TEXT,
+                FOREIGN KEY (room_id) REFERENCES chat_rooms (id) ON DELETE CASCADE
+            )
+        ''',
+        'chat_messages': '''
+            CREATE TABLE chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_id INTEGER,
+                file_id INTEGER,
+                session_id INTEGER,
+                datetime TEXT,
+                user TEXT,
+                message TEXT,
+                message_length INTEGER,
+                message_hash TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ts INTEGER,
+                FOREIGN KEY (room_id) REFERENCES chat_rooms (id) ON DELETE CASCADE,
+                FOREIGN KEY (file_id) REFERENCES chat_files (id) ON DELETE SET NULL,
+                FOREIGN KEY (session_id) REFERENCES analysis_sessions (id) ON DELETE SET NULL
+            )
+        ''',
+        'gpt_analysis_results': '''
+            CREATE TABLE gpt_analysis_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER,
+                analysis_type TEXT,
+                target_user TEXT,
+                summary TEXT,
+                keywords TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (session_id) REFERENCES analysis_sessions (id) ON DELETE CASCADE
+            )
+        ''',
+        'user_statistics': '''
+            CREATE TABLE user_statistics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER,
+                user TEXT,
+                message_count INTEGER,
+                avg_message_length REAL,
+                most_active_hour INTEGER,
+                first_message TEXT,
+                last_message TEXT,
+                room_id INTEGER,
+                total_length INTEGER,
+                hour_counts TEXT,
+                FOREIGN KEY (session_id) REFERENCES analysis_sessions (id) ON DELETE CASCADE,
+                FOREIGN KEY (room_id) REFERENCES chat_rooms (id) ON DELETE CASCADE
+            )
+        ''',
+        'time_statistics': '''
+            CREATE TABLE time_statistics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER,
+                hour INTEGER,
+                message_count INTEGER,
+                room_id INTEGER,
+                date TEXT,
+                FOREIGN KEY (session_id) REFERENCES analysis_sessions (id) ON DELETE CASCADE,
+                FOREIGN KEY (room_id) REFERENCES chat_rooms (id) ON DELETE CASCADE
+            )
+        ''',
+        'room_summary': '''
+            CREATE TABLE room_summary (
+                room_id INTEGER PRIMARY KEY,
+                file_count INTEGER NOT NULL DEFAULT 0,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                participant_count INTEGER NOT NULL DEFAULT 0,
+                first_message TEXT,
+                last_message TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (room_id) REFERENCES chat_rooms (id) ON DELETE CASCADE
+            )
+        ''',
+    }
+    
+    def __init__(self, db_path="kakao_analysis.db", archive_dir=None, index_dir=None):
+        self.db_path = db_path
+        self.pool = ConnectionPool.for_path(db_path)
+        self.init_database()
+        
+        # 선택 기능: 채팅방별 Parquet 아카이브 (pyarrow 필요)
+        self.archive = None
+        if archive_dir and MessageArchive.is_available():
+            self.archive = MessageArchive(archive_dir)
+        
+        # 선택 기능: 채팅방별 유사 메시지 검색 인덱스 (메시지 저장 시 증분 갱신)
+        self.index = MessageIndex(index_dir) if index_dir else None
+    
+    def get_connection(self):
+        """현재 스레드의 풀 연결 획득 (호출자가 닫지 않음)"""
+        return self.pool.get()
+    
+    def close(self):
+        """이 데이터베이스의 모든 풀 연결 종료"""
+        self.pool.close_all()
 
     def init_database(self):
         """데이터베이스 초기화 및 테이블 생성"""
@@ -31,6 +271,11 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
+            # 스키마가 최신이면 DDL 생략
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] >= self.SCHEMA_VERSION:
+                return
+            
             # 기존 테이블 확인
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
             existing_tables = [row[0] for row in cursor.fetchall()]
@@ -173,13 +418,709 @@ class DatabaseManager:
             ''')
             
             conn.commit()
-            conn.close()
+            
+            # 스키마 마이그레이션 실행
+            self.migrate_database(conn)
         except sqlite3.Error as e:
             print(f"Database initialization error: {e}")
             if 'conn' in locals():
-                conn.close()
+                conn.rollback()
             raise
     
+    def migrate_database(self, conn):
+        """PRAGMA user_version 기반 일회성 스키마 마이그레이션
+        
+        단계별로는 VACUUM하지 않고, 모든 단계가 끝난 뒤 비워진 페이지가 있을 때만 한 번 실행합니다.
+        """
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+        
+        if version < 1:
+            removed = self._migrate_deduplicate_messages(cursor)
+            cursor.execute('PRAGMA user_version = 1')
+            conn.commit()
+            if removed > 0:
+                print(f"🧹 중복 메시지 {removed:,}개 제거")
+        
+        if version < 2:
+            self._migrate_create_indexes(cursor)
+            cursor.execute('PRAGMA user_version = 2')
+            conn.commit()
+        
+        if version < 3:
+            self._create_fts(cursor, rebuild=True)
+            cursor.execute('PRAGMA user_version = 3')
+            conn.commit()
+        
+        if version < 4:
+            self._migrate_room_statistics(cursor)
+            cursor.execute('PRAGMA user_version = 4')
+            conn.commit()
+        
+        if version < 5:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS room_summary (
+                    room_id INTEGER PRIMARY KEY,
+                    file_count INTEGER NOT NULL DEFAULT 0,
+                    message_count INTEGER NOT NULL DEFAULT 0,
+                    participant_count INTEGER NOT NULL DEFAULT 0,
+                    first_message TEXT,
+                    last_message TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (room_id) REFERENCES chat_rooms (id)
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_room_summary_last_message ON room_summary (last_message)')
+            self._rebuild_room_summary(cursor)
+            cursor.execute('PRAGMA user_version = 5')
+            conn.commit()
+        
+        if version < 6:
+            # 파일 재해시 생략용 (크기, 수정시각, 부분 해시) 정보
+            cursor.execute("PRAGMA table_info(chat_files)")
+            columns = [row[1] for row in cursor.fetchall()]
+            if 'file_mtime' not in columns:
+                cursor.execute('ALTER TABLE chat_files ADD COLUMN file_mtime REAL')
+            if 'partial_hash' not in columns:
+                cursor.execute('ALTER TABLE chat_files ADD COLUMN partial_hash TEXT')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_files_path_size ON chat_files (file_path, file_size)')
+            cursor.execute('PRAGMA user_version = 6')
+            conn.commit()
+        
+        if version < 7:
+            # 외래 키 변경은 테이블 재구성이 필요하므로 제약 검사를 끄고 진행
+            conn.execute('PRAGMA foreign_keys=OFF')
+            try:
+                for table, create_sql in self.CASCADE_TABLES.items():
+                    self._rebuild_table(cursor, table, create_sql)
+                cursor.execute('PRAGMA user_version = 7')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute('PRAGMA foreign_keys=ON')
+        
+        if version < 8:
+            # 범위 조회용 INTEGER epoch 타임스탬프 (초, datetime 문자열 기준)
+            cursor.execute("PRAGMA table_info(chat_messages)")
+            if 'ts' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE chat_messages ADD COLUMN ts INTEGER')
+            cursor.execute("UPDATE chat_messages SET ts = CAST(strftime('%s', datetime) AS INTEGER)")
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_messages_room_ts ON chat_messages (room_id, ts)')
+            cursor.execute('PRAGMA user_version = 8')
+            conn.commit()
+        
+        if version < 9:
+            # 사용자 이름을 채팅방별 정수 ID로 정규화 (chat_messages 재구성)
+            conn.execute('PRAGMA foreign_keys=OFF')
+            try:
+                self._migrate_user_dictionary(cursor)
+                cursor.execute('PRAGMA user_version = 9')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute('PRAGMA foreign_keys=ON')
+        
+        if version < 10:
+            # 백그라운드 일괄 분석 작업 큐
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analysis_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    room_id INTEGER NOT NULL,
+                    analysis_type TEXT NOT NULL,
+                    full_history INTEGER NOT NULL DEFAULT 0,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL DEFAULT 3,
+                    worker TEXT,
+                    lease_until REAL,
+                    result_id INTEGER,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    FOREIGN KEY (room_id) REFERENCES chat_rooms (id) ON DELETE CASCADE,
+                    FOREIGN KEY (result_id) REFERENCES analysis_history (id) ON DELETE SET NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_analysis_jobs_state ON analysis_jobs (state, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_analysis_jobs_room ON analysis_jobs (room_id, analysis_type)')
+            cursor.execute('PRAGMA user_version = 10')
+            conn.commit()
+        
+        if version < 11:
+            # 증분 분석용: 분석 결과의 채팅방과 분석에 포함된 마지막 메시지 시각(epoch 초)
+            cursor.execute("PRAGMA table_info(analysis_history)")
+            columns = [row[1] for row in cursor.fetchall()]
+            if 'room_id' not in columns:
+                cursor.execute('ALTER TABLE analysis_history ADD COLUMN room_id INTEGER')
+            if 'last_message_ts' not in columns:
+                cursor.execute('ALTER TABLE analysis_history ADD COLUMN last_message_ts INTEGER')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_analysis_history_room_type
+                ON analysis_history (room_id, analysis_type, id)
+            ''')
+            cursor.execute("PRAGMA table_info(analysis_jobs)")
+            if 'incremental' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE analysis_jobs ADD COLUMN incremental INTEGER NOT NULL DEFAULT 0')
+            cursor.execute('PRAGMA user_version = 11')
+            conn.commit()
+        
+        if version < 12:
+            rehashed = self._migrate_legacy_file_hashes(cursor)
+            cursor.execute('PRAGMA user_version = 12')
+            conn.commit()
+            if rehashed > 0:
+                print(f"🔑 이전 버전 파일 해시 {rehashed:,}개를 새 형식으로 변환했습니다.")
+        
+        if version < 13:
+            # 증분 분석 기준: 분석에 포함된 마지막 메시지 ID (같은 분(minute)에 나중에 추가된 메시지도 포함되도록)
+            cursor.execute("PRAGMA table_info(analysis_history)")
+            if 'last_message_id' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE analysis_history ADD COLUMN last_message_id INTEGER')
+            cursor.execute('PRAGMA user_version = 13')
+            conn.commit()
+        
+        if version < 14:
+            # 채팅방 목록 조회 시 사용자 사전 전체를 읽지 않도록 참여자 목록을 요약 테이블에 보관
+            cursor.execute("PRAGMA table_info(room_summary)")
+            if 'participants' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE room_summary ADD COLUMN participants TEXT')
+            self._refresh_room_participants(cursor)
+            cursor.execute('PRAGMA user_version = 14')
+            conn.commit()
+        
+        if version < 15:
+            # 메시지는 저장됐지만 아직 아카이브에 반영되지 않은(또는 반영에 실패한) 저장 횟수
+            cursor.execute("PRAGMA table_info(chat_rooms)")
+            if 'archive_pending' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE chat_rooms ADD COLUMN archive_pending INTEGER NOT NULL DEFAULT 0')
+            cursor.execute('PRAGMA user_version = 15')
+            conn.commit()
+        
+        # 중복 제거/테이블 재구성으로 비워진 페이지를 한 번에 회수 (트랜잭션 밖에서만 가능)
+        cursor.execute('PRAGMA freelist_count')
+        if cursor.fetchone()[0] > 0:
+            print("🧹 마이그레이션으로 비워진 데이터베이스 공간 회수 중...")
+            conn.execute('VACUUM')
+    
+    def _rebuild_table(self, cursor, table, create_sql, column_map=None):
+        """새 정의로 테이블 재구성 (데이터, 인덱스, 트리거 유지, 커밋하지 않음)
+        
+        column_map({새 컬럼: 기존 테이블 기준 SELECT 식})으로 새로 생기는 컬럼 값을 채울 수 있습니다.
+        """
+        column_map = column_map or {}
+        cursor.execute(f"PRAGMA table_info({table})")
+        old_columns = [row[1] for row in cursor.fetchall()]
+        
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)
+        )
+        dependent_sql = [row[0] for row in cursor.fetchall()]
+        
+        new_table = f"{table}_new"
+        cursor.execute(create_sql.replace(f"CREATE TABLE {table} (", f"CREATE TABLE {new_table} (", 1))
+        cursor.execute(f"PRAGMA table_info({new_table})")
+        columns = [row[1] for row in cursor.fetchall() if row[1] in old_columns or row[1] in column_map]
+        column_list = ', '.join(columns)
+        select_list = ', '.join(column_map.get(col, col) for col in columns)
+        
+        cursor.execute(f"INSERT INTO {new_table} ({column_list}) SELECT {select_list} FROM {table}")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+        
+        for sql in dependent_sql:
+            cursor.execute(sql)
+    
+    def _migrate_user_dictionary(self, cursor):
+        """채팅방별 사용자 사전(chat_users) 생성 후 chat_messages.user를 user_id로 대체 (커밋하지 않음)"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chat_users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                UNIQUE (room_id, name),
+                FOREIGN KEY (room_id) REFERENCES chat_rooms (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # 채팅방 안에서 처음 등장한 순서대로 ID 부여
+        cursor.execute('''
+            INSERT OR IGNORE INTO chat_users (room_id, name)
+            SELECT room_id, user FROM chat_messages
+            WHERE room_id IS NOT NULL AND user IS NOT NULL
+            GROUP BY room_id, user
+            ORDER BY MIN(id)
+        ''')
+        
+        # 이름 문자열 기준 인덱스는 재구성 전에 제거
+        cursor.execute('DROP INDEX IF EXISTS idx_chat_messages_room_user')
+        
+        self._rebuild_table(cursor, 'chat_messages', '''
+            CREATE TABLE chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_id INTEGER,
+                file_id INTEGER,
+                session_id INTEGER,
+                datetime TEXT,
+                user_id INTEGER,
+                message TEXT,
+                message_length INTEGER,
+                message_hash TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ts INTEGER,
+                FOREIGN KEY (room_id) REFERENCES chat_rooms (id) ON DELETE CASCADE,
+                FOREIGN KEY (file_id) REFERENCES chat_files (id) ON DELETE SET NULL,
+                FOREIGN KEY (session_id) REFERENCES analysis_sessions (id) ON DELETE SET NULL,
+                FOREIGN KEY (user_id) REFERENCES chat_users (id)
+            )
+        ''', column_map={
+            'user_id': '''(SELECT cu.id FROM chat_users cu
+                           WHERE cu.room_id = chat_messages.room_id AND cu.name = chat_messages.user)'''
+        })
+        
+        # 사용자 필터 및 chat_users 삭제 시 외래 키 검사용
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_messages_user ON chat_messages (user_id)')
+    
+    def _get_user_ids(self, cursor, room_id, names):
+        """채팅방 사용자 이름 → 정수 ID 매핑 (처음 보는 사용자는 등록, 커밋하지 않음)"""
+        names = [name for name in pd.unique(pd.Series(names)) if pd.notna(name)]
+        if room_id is None or not names:
+            return {}
+        
+        cursor.executemany(
+            'INSERT OR IGNORE INTO chat_users (room_id, name) VALUES (?, ?)',
+            [(room_id, name) for name in names]
+        )
+        
+        user_ids = {}
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            cursor.execute(
+                f"SELECT name, id FROM chat_users WHERE room_id = ? AND name IN ({','.join('?' * len(chunk))})",
+                [room_id] + chunk
+            )
+            user_ids.update(cursor.fetchall())
+        return user_ids
+    
+    def _migrate_deduplicate_messages(self, cursor):
+        """세션별 메시지 사본 제거 및 세션을 채팅방 메시지 범위 참조로 전환"""
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_migration_dedup ON chat_messages (datetime, user)')
+        
+        # 사본을 지우기 전에, 사본과 같은 메시지가 가장 많은 채팅방을 세션의 채팅방으로 정하고
+        # 사본의 기간을 세션의 메시지 범위로 연결 (파일 없이 저장된 세션도 메시지를 잃지 않도록)
+        cursor.execute('''
+            SELECT c.session_id, d.room_id, COUNT(*) AS matches
+            FROM chat_messages c
+            JOIN chat_messages d
+              ON d.room_id IS NOT NULL
+             AND d.datetime = c.datetime
+             AND d.user = c.user
+             AND d.message IS c.message
+            WHERE c.room_id IS NULL AND c.session_id IS NOT NULL
+            GROUP BY c.session_id, d.room_id
+            ORDER BY c.session_id, matches DESC, d.room_id
+        ''')
+        session_rooms = {}
+        for session_id, room_id, _ in cursor.fetchall():
+            session_rooms.setdefault(session_id, room_id)
+        
+        cursor.executemany('''
+            UPDATE analysis_sessions
+            SET room_id = ?,
+                start_date = (SELECT MIN(datetime) FROM chat_messages WHERE session_id = ? AND room_id IS NULL),
+                end_date = (SELECT MAX(datetime) FROM chat_messages WHERE session_id = ? AND room_id IS NULL)
+            WHERE id = ? AND room_id IS NULL
+        ''', [(room_id, session_id, session_id, session_id) for session_id, room_id in session_rooms.items()])
+        
+        # 채팅방에 이미 저장된 메시지와 동일한 세션 전용 사본 삭제
+        cursor.execute('''
+            DELETE FROM chat_messages
+            WHERE room_id IS NULL
+              AND EXISTS (
+                  SELECT 1 FROM chat_messages d
+                  WHERE d.room_id IS NOT NULL
+                    AND d.datetime = chat_messages.datetime
+                    AND d.user = chat_messages.user
+                    AND d.message IS chat_messages.message
+              )
+        ''')
+        removed = cursor.rowcount
+        cursor.execute('DROP INDEX IF EXISTS idx_migration_dedup')
+        
+        # 남은 세션 메시지는 위에서 정한 채팅방에, 겹치는 메시지가 없던 세션은 참여자 기준 채팅방에 편입
+        cursor.execute('''
+            SELECT DISTINCT session_id FROM chat_messages
+            WHERE room_id IS NULL AND session_id IS NOT NULL
+        ''')
+        orphan_sessions = [row[0] for row in cursor.fetchall()]
+        
+        for session_id in orphan_sessions:
+            room_id = session_rooms.get(session_id)
+            if room_id is None:
+                cursor.execute(
+                    'SELECT DISTINCT user FROM chat_messages WHERE session_id = ? AND room_id IS NULL', (session_id,)
+                )
+                participants = [row[0] for row in cursor.fetchall() if row[0] is not None]
+                room_id = self._get_or_create_chat_room(cursor, participants)
+            
+            cursor.execute('''
+                SELECT id, datetime, user, message FROM chat_messages
+                WHERE session_id = ? AND room_id IS NULL
+            ''', (session_id,))
+            updates = [
+                (room_id, self.create_message_hash(dt, user, message), row_id)
+                for row_id, dt, user, message in cursor.fetchall()
+            ]
+            cursor.executemany('UPDATE chat_messages SET room_id = ?, message_hash = ? WHERE id = ?', updates)
+        
+        # 세션이 채팅방과 파일을 참조하도록 연결
+        cursor.execute('''
+            UPDATE analysis_sessions
+            SET room_id = COALESCE(
+                (SELECT cm.room_id FROM chat_messages cm
+                 WHERE cm.session_id = analysis_sessions.id AND cm.room_id IS NOT NULL
+                 LIMIT 1),
+                (SELECT cf.room_id FROM chat_files cf
+                 WHERE cf.file_name = analysis_sessions.file_name
+                 ORDER BY cf.id DESC LIMIT 1)
+            )
+            WHERE room_id IS NULL
+        ''')
+        
+        cursor.execute('''
+            SELECT s.id, cf.id FROM analysis_sessions s
+            JOIN chat_files cf ON cf.room_id = s.room_id AND cf.file_name = s.file_name
+            WHERE s.file_ids IS NULL
+        ''')
+        session_files = {}
+        for session_id, file_id in cursor.fetchall():
+            session_files.setdefault(session_id, []).append(file_id)
+        cursor.executemany(
+            'UPDATE analysis_sessions SET file_ids = ? WHERE id = ?',
+            [(json.dumps(file_ids), session_id) for session_id, file_ids in session_files.items()]
+        )
+        
+        return removed
+    
+    def _migrate_create_indexes(self, cursor):
+        """조회 경로별 인덱스 생성 (고유 인덱스 생성 전 해시 중복 정리)"""
+        cursor.execute('''
+            DELETE FROM chat_messages
+            WHERE message_hash IS NOT NULL
+              AND id NOT IN (
+                  SELECT MIN(id) FROM chat_messages
+                  WHERE message_hash IS NOT NULL
+                  GROUP BY message_hash
+              )
+        ''')
+        
+        for _, ddl in self.INDEXES:
+            cursor.execute(ddl)
+        
+        cursor.execute('ANALYZE')
+    
+    def _create_fts(self, cursor, rebuild=False):
+        """메시지 전문 검색용 FTS5 테이블과 동기화 트리거 생성"""
+        try:
+            # trigram 토크나이저: 띄어쓰기와 무관한 한국어 부분 문자열 검색
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts USING fts5(
+                    message,
+                    content='chat_messages',
+                    content_rowid='id',
+                    tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            # FTS5/trigram 미지원 SQLite에서는 LIKE 검색으로 대체
+            print(f"FTS5 전문 검색을 사용할 수 없습니다: {e}")
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+                INSERT INTO chat_messages_fts (rowid, message) VALUES (new.id, new.message);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+                INSERT INTO chat_messages_fts (chat_messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE OF message ON chat_messages BEGIN
+                INSERT INTO chat_messages_fts (chat_messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                INSERT INTO chat_messages_fts (rowid, message) VALUES (new.id, new.message);
+            END
+        ''')
+        
+        if rebuild:
+            cursor.execute("INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('rebuild')")
+        return True
+    
+    def _migrate_legacy_file_hashes(self, cursor):
+        """접두사 없는 MD5로 저장된 파일 해시를 새 형식으로 변환 (반환값: 변환한 파일 수)
+        
+        경로의 파일이 남아 있고 내용의 MD5가 저장된 해시와 같을 때만 변환합니다.
+        파일이 없는 행은 save_chat_file에서 크기가 같은 파일이 올라올 때 MD5로 비교합니다.
+        """
+        cursor.execute("SELECT id, file_path, file_hash FROM chat_files WHERE instr(file_hash, ':') = 0")
+        rehashed = 0
+        for file_id, file_path, legacy_hash in cursor.fetchall():
+            if not file_path or not os.path.exists(file_path):
+                continue
+            
+            md5 = hashlib.md5()
+            algorithm, hasher = self._new_file_hasher()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    md5.update(chunk)
+                    hasher.update(chunk)
+            if md5.hexdigest() != legacy_hash:
+                continue  # 저장 이후 파일이 바뀜
+            
+            file_size, file_mtime, partial_hash = self._file_fingerprint(file_path)
+            cursor.execute('''
+                UPDATE OR IGNORE chat_files SET file_hash = ?, file_size = ?, file_mtime = ?, partial_hash = ?
+                WHERE id = ?
+            ''', (f"{algorithm}:{hasher.hexdigest()}", file_size, file_mtime, partial_hash, file_id))
+            rehashed += cursor.rowcount
+        return rehashed
+    
+    def _find_legacy_file(self, cursor, file_path, file_size, file_bytes, file_hash):
+        """같은 내용이 이전 버전 해시(접두사 없는 MD5)로 저장된 파일 ID 조회 (커밋하지 않음)
+        
+        크기가 같은 이전 형식 행이 있을 때만 MD5를 계산하며, 찾은 행은 새 해시로 갱신합니다.
+        """
+        cursor.execute(
+            "SELECT id, file_hash FROM chat_files WHERE file_size = ? AND instr(file_hash, ':') = 0",
+            (file_size,)
+        )
+        legacy = cursor.fetchall()
+        if not legacy:
+            return None
+        
+        md5 = hashlib.md5()
+        if file_bytes is not None:
+            md5.update(file_bytes)
+        elif file_path and os.path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    md5.update(chunk)
+        else:
+            return None
+        
+        digest = md5.hexdigest()
+        for file_id, legacy_hash in legacy:
+            if legacy_hash == digest:
+                cursor.execute('UPDATE chat_files SET file_hash = ? WHERE id = ?', (file_hash, file_id))
+                return file_id
+        return None
+    
+    def _migrate_room_statistics(self, cursor):
+        """user_statistics/time_statistics를 채팅방 단위 롤업 테이블로 확장하고 기존 메시지로 채움"""
+        cursor.execute("PRAGMA table_info(user_statistics)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'room_id' not in columns:
+            cursor.execute('ALTER TABLE user_statistics ADD COLUMN room_id INTEGER REFERENCES chat_rooms (id)')
+        if 'total_length' not in columns:
+            cursor.execute('ALTER TABLE user_statistics ADD COLUMN total_length INTEGER')
+        if 'hour_counts' not in columns:
+            cursor.execute('ALTER TABLE user_statistics ADD COLUMN hour_counts TEXT')  # JSON, 시간대(0~23)별 메시지 수
+        
+        cursor.execute("PRAGMA table_info(time_statistics)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'room_id' not in columns:
+            cursor.execute('ALTER TABLE time_statistics ADD COLUMN room_id INTEGER REFERENCES chat_rooms (id)')
+        if 'date' not in columns:
+            cursor.execute('ALTER TABLE time_statistics ADD COLUMN date TEXT')
+        
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_user_statistics_room_user ON user_statistics (room_id, user)')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_time_statistics_room_date_hour ON time_statistics (room_id, date, hour)')
+        
+        # 기존 메시지로 롤업 채우기
+        cursor.execute('DELETE FROM user_statistics WHERE room_id IS NOT NULL')
+        cursor.execute('DELETE FROM time_statistics WHERE room_id IS NOT NULL')
+        
+        cursor.execute('''
+            SELECT room_id, user, CAST(strftime('%H', datetime) AS INTEGER) AS hour, COUNT(*)
+            FROM chat_messages
+            WHERE room_id IS NOT NULL
+            GROUP BY room_id, user, hour
+        ''')
+        hour_counts = {}
+        for room_id, user, hour, count in cursor.fetchall():
+            if hour is not None:
+                hour_counts.setdefault((room_id, user), [0] * 24)[hour] = count
+        
+        cursor.execute('''
+            SELECT room_id, user, COUNT(*), SUM(message_length), MIN(datetime), MAX(datetime)
+            FROM chat_messages
+            WHERE room_id IS NOT NULL
+            GROUP BY room_id, user
+        ''')
+        user_rows = []
+        for room_id, user, count, total_length, first_message, last_message in cursor.fetchall():
+            hours = hour_counts.get((room_id, user), [0] * 24)
+            user_rows.append((
+                room_id, user, count, total_length or 0, (total_length or 0) / count,
+                hours.index(max(hours)), first_message, last_message, json.dumps(hours)
+            ))
+        cursor.executemany('''
+            INSERT INTO user_statistics
+            (room_id, user, message_count, total_length, avg_message_length, most_active_hour,
+             first_message, last_message, hour_counts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', user_rows)
+        
+        cursor.execute('''
+            INSERT INTO time_statistics (room_id, date, hour, message_count)
+            SELECT room_id, substr(datetime, 1, 10), CAST(strftime('%H', datetime) AS INTEGER), COUNT(*)
+            FROM chat_messages
+            WHERE room_id IS NOT NULL AND datetime IS NOT NULL
+            GROUP BY room_id, substr(datetime, 1, 10), CAST(strftime('%H', datetime) AS INTEGER)
+        ''')
+    
+    def _update_room_statistics(self, cursor, room_id, new_messages):
+        """새로 저장된 메시지로 채팅방 롤업 통계 갱신 (커밋하지 않음)"""
+        if room_id is None or new_messages.empty:
+            return
+        
+        hours = new_messages['datetime'].dt.hour
+        
+        # 날짜 x 시간대별 메시지 수
+        time_counts = new_messages.groupby([new_messages['datetime'].dt.strftime('%Y-%m-%d'), hours]).size()
+        cursor.executemany('''
+            INSERT INTO time_statistics (room_id, date, hour, message_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (room_id, date, hour)
+            DO UPDATE SET message_count = message_count + excluded.message_count
+        ''', [(room_id, date, int(hour), int(count)) for (date, hour), count in time_counts.items()])
+        
+        # 사용자별 메시지 수/길이/첫·마지막 메시지 및 시간대 분포
+        user_groups = new_messages.groupby('user')
+        user_stats = pd.DataFrame({
+            'message_count': user_groups.size(),
+            'total_length': user_groups['message_length'].sum(),
+            'first_message': user_groups['datetime'].min(),
+            'last_message': user_groups['datetime'].max(),
+        })
+        user_hours = pd.crosstab(new_messages['user'], hours).reindex(columns=range(24), fill_value=0)
+        
+        users = user_stats.index.tolist()
+        existing_hours = {}
+        for i in range(0, len(users), 500):
+            chunk = users[i:i + 500]
+            cursor.execute(
+                f"SELECT user, hour_counts FROM user_statistics WHERE room_id = ? AND user IN ({','.join('?' * len(chunk))})",
+                [room_id] + chunk
+            )
+            existing_hours.update({user: json.loads(counts) for user, counts in cursor.fetchall() if counts})
+        
+        user_rows = []
+        for user, stats in user_stats.iterrows():
+            merged = [a + int(b) for a, b in zip(existing_hours.get(user, [0] * 24), user_hours.loc[user])]
+            user_rows.append((
+                room_id, user, int(stats['message_count']), int(stats['total_length']),
+                stats['total_length'] / stats['message_count'], merged.index(max(merged)),
+                stats['first_message'].isoformat(), stats['last_message'].isoformat(), json.dumps(merged)
+            ))
+        
+        cursor.executemany('''
+            INSERT INTO user_statistics
+            (room_id, user, message_count, total_length, avg_message_length, most_active_hour,
+             first_message, last_message, hour_counts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (room_id, user) DO UPDATE SET
+                message_count = message_count + excluded.message_count,
+                total_length = total_length + excluded.total_length,
+                avg_message_length = (total_length + excluded.total_length) * 1.0
+                                     / (message_count + excluded.message_count),
+                most_active_hour = excluded.most_active_hour,
+                first_message = MIN(first_message, excluded.first_message),
+                last_message = MAX(last_message, excluded.last_message),
+                hour_counts = excluded.hour_counts
+        ''', user_rows)
+    
+    def _update_room_summary(self, cursor, room_id, new_messages):
+        """새로 저장된 메시지로 채팅방 요약 갱신 (커밋하지 않음, 사용자 롤업 갱신 후 호출)"""
+        if room_id is None or new_messages.empty:
+            return
+        
+        first_message = new_messages['datetime'].min().isoformat()
+        last_message = new_messages['datetime'].max().isoformat()
+        
+        cursor.execute('INSERT OR IGNORE INTO room_summary (room_id) VALUES (?)', (room_id,))
+        cursor.execute('''
+            UPDATE room_summary SET
+                message_count = message_count + ?,
+                participant_count = (SELECT COUNT(*) FROM user_statistics WHERE room_id = ?),
+                first_message = MIN(COALESCE(first_message, ?), ?),
+                last_message = MAX(COALESCE(last_message, ?), ?),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE room_id = ?
+        ''', (len(new_messages), room_id, first_message, first_message, last_message, last_message, room_id))
+        self._refresh_room_participants(cursor, room_id)
+    
+    def _refresh_room_participants(self, cursor, room_id=None):
+        """채팅방 요약의 참여자 목록(사용자 사전 등록 순 JSON) 갱신 (커밋하지 않음, room_id 미지정 시 전체)"""
+        room_filter = 'WHERE room_id = ?' if room_id is not None else ''
+        cursor.execute(f'''
+            UPDATE room_summary SET participants = (
+                SELECT json_group_array(name) FROM (
+                    SELECT cu.name FROM chat_users cu WHERE cu.room_id = room_summary.room_id ORDER BY cu.id
+                )
+            )
+            {room_filter}
+        ''', (room_id,) if room_id is not None else ())
+    
+    def _rebuild_room_summary(self, cursor, room_id=None):
+        """원본 데이터로 채팅방 요약 재구성 (커밋하지 않음)"""
+        room_filter = 'WHERE cr.id = ?' if room_id is not None else ''
+        params = (room_id,) if room_id is not None else ()
+        
+        if room_id is not None:
+            cursor.execute('DELETE FROM room_summary WHERE room_id = ?', params)
+        else:
+            cursor.execute('DELETE FROM room_summary')
+        
+        cursor.execute(f'''
+            INSERT INTO room_summary
+            (room_id, file_count, message_count, participant_count, first_message, last_message)
+            SELECT cr.id,
+                   (SELECT COUNT(*) FROM chat_files cf WHERE cf.room_id = cr.id),
+                   (SELECT COUNT(*) FROM chat_messages cm WHERE cm.room_id = cr.id),
+                   (SELECT COUNT(*) FROM user_statistics us WHERE us.room_id = cr.id),
+                   (SELECT MIN(cm.datetime) FROM chat_messages cm WHERE cm.room_id = cr.id),
+                   (SELECT MAX(cm.datetime) FROM chat_messages cm WHERE cm.room_id = cr.id)
+            FROM chat_rooms cr
+            {room_filter}
+        ''', params)
+        return cursor.rowcount
+    
+    def rebuild_room_summary(self, room_id=None):
+        """채팅방 요약 테이블 재구성 (room_id 미지정 시 전체)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            count = self._rebuild_room_summary(cursor, room_id)
+            self._refresh_room_participants(cursor, room_id)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Rebuild room summary error: {e}")
+            raise e
+        
+        return count
+    
     def create_message_hash(self, datetime_str, user, message):
         """메시지 중복 방지용 해시 생성"""
         content = f"{datetime_str}|{user}|{message}"
@@ -191,22 +1132,69 @@ class DatabaseManager:
         content = "|".join(sorted_participants)
         return hashlib.md5(content.encode('utf-8')).hexdigest()
     
-    def create_file_hash(self, file_path, file_name):
-        """파일 중복 검사용 해시 생성"""
-        if os.path.exists(file_path):
-            with open(file_path, 'rb') as f:
-                content = f.read()
-            return hashlib.md5(content).hexdigest()
-        else:
-            # 파일이 없는 경우 파일명과 현재 시간으로 해시 생성
-            content = f"{file_name}|{datetime.now().isoformat()}"
-            return hashlib.md5(content.encode('utf-8')).hexdigest()
+    def _new_file_hasher(self):
+        """파일 해시 객체 생성 (xxHash가 있으면 xxh3_128, 없으면 BLAKE2b)"""
+        if xxhash is not None:
+            return 'xxh3', xxhash.xxh3_128()
+        return 'blake2b', hashlib.blake2b(digest_size=16)
+    
+    def _file_fingerprint(self, file_path):
+        """파일 변경 여부 빠른 확인용 (크기, 수정시각, 앞/뒤 부분 해시)"""
+        stat = os.stat(file_path)
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            hasher.update(f.read(PARTIAL_HASH_SIZE))
+            if stat.st_size > PARTIAL_HASH_SIZE * 2:
+                f.seek(-PARTIAL_HASH_SIZE, os.SEEK_END)
+                hasher.update(f.read(PARTIAL_HASH_SIZE))
+        return stat.st_size, stat.st_mtime, hasher.hexdigest()
+    
+    def create_file_hash(self, file_path, file_name, file_bytes=None):
+        """파일 중복 검사용 해시 생성
+        
+        업로드된 바이트가 주어지면 그대로 해시하고, 경로만 있으면 청크 단위로 스트리밍 해시합니다.
+        같은 경로의 파일이 (크기, 수정시각, 부분 해시) 모두 같으면 저장된 해시를 재사용합니다.
+        내용을 알 수 없으면 None을 반환합니다 (중복 검사 불가).
+        """
+        if file_bytes is not None:
+            algorithm, hasher = self._new_file_hasher()
+            hasher.update(file_bytes)
+            return f"{algorithm}:{hasher.hexdigest()}"
+        
+        if not file_path or not os.path.exists(file_path):
+            return None
+        
+        # 변경되지 않은 파일은 다시 해시하지 않음
+        file_size, file_mtime, partial_hash = self._file_fingerprint(file_path)
+        cursor = self.get_connection().cursor()
+        cursor.execute('''
+            SELECT file_hash FROM chat_files
+            WHERE file_path = ? AND file_size = ? AND file_mtime = ? AND partial_hash = ?
+              AND file_hash IS NOT NULL
+            LIMIT 1
+        ''', (file_path, file_size, file_mtime, partial_hash))
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        
+        algorithm, hasher = self._new_file_hasher()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        return f"{algorithm}:{hasher.hexdigest()}"
     
     def get_or_create_chat_room(self, participants):
         """채팅방 조회 또는 생성"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        room_id = self._get_or_create_chat_room(cursor, participants)
+        
+        conn.commit()
+        return room_id
+    
+    def _get_or_create_chat_room(self, cursor, participants):
+        """주어진 커서로 채팅방 조회 또는 생성 (커밋하지 않음)"""
         room_hash = self.create_room_hash(participants)
         
         # 기존 채팅방 확인
@@ -214,23 +1202,19 @@ class DatabaseManager:
         result = cursor.fetchone()
         
         if result:
-            room_id = result[0]
-        else:
-            # 새 채팅방 생성
-            room_name = f"채팅방 ({len(participants)}명)"
-            if len(participants) <= 3:
-                room_name = ", ".join(participants[:3])
-            
-            cursor.execute('''
-                INSERT INTO chat_rooms (room_name, room_hash, participants)
-                VALUES (?, ?, ?)
-            ''', (room_name, room_hash, json.dumps(participants, ensure_ascii=False)))
-            
-            room_id = cursor.lastrowid
+            return result[0]
         
-        conn.commit()
-        conn.close()
-        return room_id
+        # 새 채팅방 생성
+        room_name = f"채팅방 ({len(participants)}명)"
+        if len(participants) <= 3:
+            room_name = ", ".join(participants[:3])
+        
+        cursor.execute('''
+            INSERT INTO chat_rooms (room_name, room_hash, participants)
+            VALUES (?, ?, ?)
+        ''', (room_name, room_hash, json.dumps(participants, ensure_ascii=False)))
+        
+        return cursor.lastrowid
     
     def get_all_rooms(self):
         """모든 채팅방 목록 조회"""
@@ -244,7 +1228,6 @@ class DatabaseManager:
             
             if not chat_rooms_exists:
                 # 채팅방 테이블이 없으면 빈 DataFrame 반환
-                conn.close()
                 return pd.DataFrame(columns=['id', 'room_name', 'participants', 'file_count', 'total_messages', 'first_message', 'last_message', 'participants_list', 'participant_count', 'created_at', 'last_activity'])
             
             # 컬럼 존재 여부 확인
@@ -253,21 +1236,26 @@ class DatabaseManager:
             has_room_id = 'room_id' in columns
             
             if has_room_id:
-                # 새로운 스키마 사용
+                # 새로운 스키마 사용 (수집 시 갱신되는 room_summary 조회)
                 rooms_df = pd.read_sql_query('''
                     SELECT cr.id, cr.room_name, cr.participants, cr.created_at,
-                           COUNT(DISTINCT cf.id) as file_count,
-                           COUNT(cm.id) as total_messages,
-                           COUNT(DISTINCT cm.user) as participant_count,
-                           MIN(cm.datetime) as first_message,
-                           MAX(cm.datetime) as last_message,
-                           MAX(cm.datetime) as last_activity
+                           rs.participants as summary_participants,
+                           COALESCE(rs.file_count, 0) as file_count,
+                           COALESCE(rs.message_count, 0) as total_messages,
+                           COALESCE(rs.participant_count, 0) as participant_count,
+                           rs.first_message,
+                           rs.last_message,
+                           rs.last_message as last_activity
                     FROM chat_rooms cr
-                    LEFT JOIN chat_files cf ON cr.id = cf.room_id
-                    LEFT JOIN chat_messages cm ON cr.id = cm.room_id
-                    GROUP BY cr.id, cr.room_name, cr.participants, cr.created_at
-                    ORDER BY last_message DESC
+                    LEFT JOIN room_summary rs ON rs.room_id = cr.id
+                    ORDER BY rs.last_message DESC
                 ''', conn)
+                
+                # 참여자 목록은 요약 테이블에 저장된 사용자 사전 목록 사용 (메시지가 없는 채팅방은 생성 시 참여자)
+                rooms_df['participants_list'] = [
+                    json.loads(s) if pd.notna(s) and s != '[]' else (json.loads(p) if p and p != '[]' else [])
+                    for s, p in zip(rooms_df.pop('summary_participants'), rooms_df['participants'])
+                ]
             else:
                 # 기존 스키마 사용
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='analysis_sessions';")
@@ -288,8 +1276,10 @@ class DatabaseManager:
                 else:
                     rooms_df = pd.DataFrame(columns=['id', 'room_name', 'participants', 'file_count', 'total_messages', 'first_message', 'last_message', 'participant_count', 'created_at', 'last_activity'])
             
-            # participants JSON 파싱
-            if not rooms_df.empty and 'participants' in rooms_df.columns:
+            # participants JSON 파싱 (사용자 사전에서 채우지 못한 경우)
+            if 'participants_list' in rooms_df.columns:
+                pass
+            elif not rooms_df.empty and 'participants' in rooms_df.columns:
                 rooms_df['participants_list'] = rooms_df['participants'].apply(
                     lambda x: json.loads(x) if x and x != '[]' else []
                 )
@@ -305,70 +1295,83 @@ class DatabaseManager:
         except Exception as e:
             print(f"Database error in get_all_rooms: {e}")
             rooms_df = pd.DataFrame(columns=['id', 'room_name', 'participants', 'file_count', 'total_messages', 'first_message', 'last_message', 'participants_list', 'participant_count', 'created_at', 'last_activity'])
-        finally:
-            conn.close()
         
         return rooms_df
     
-    def delete_chat_room(self, room_id):
-        """채팅방 완전 삭제 (모든 관련 데이터 포함)"""
+    def delete_chat_room(self, room_id, batch_size=5000, pause=0.005, vacuum=False):
+        """채팅방 완전 삭제 (모든 관련 데이터 포함)
+        
+        메시지는 batch_size 단위의 짧은 트랜잭션으로 나눠 삭제하고 배치 사이에 pause초 쉬어
+        다른 연결이 쓰기 잠금을 얻을 수 있게 하며, 나머지 데이터는 채팅방 삭제 시
+        ON DELETE CASCADE로 함께 삭제됩니다.
+        vacuum=True이면 비워진 페이지를 파일 시스템에 반환하고 WAL을 정리합니다.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # 컬럼 존재 여부 확인
-            cursor.execute("PRAGMA table_info(chat_messages)")
-            columns = [row[1] for row in cursor.fetchall()]
-            has_room_id = 'room_id' in columns
-            
-            if has_room_id:
-                # 새로운 스키마 사용
-                cursor.execute('DELETE FROM chat_messages WHERE room_id = ?', (room_id,))
-                cursor.execute('DELETE FROM chat_files WHERE room_id = ?', (room_id,))
-                
-                # 분석 세션과 관련 데이터 삭제
-                cursor.execute('SELECT id FROM analysis_sessions WHERE room_id = ?', (room_id,))
-                session_ids = [row[0] for row in cursor.fetchall()]
-                
-                for session_id in session_ids:
-                    cursor.execute('DELETE FROM gpt_analysis_results WHERE session_id = ?', (session_id,))
-                    cursor.execute('DELETE FROM user_statistics WHERE session_id = ?', (session_id,))
-                    cursor.execute('DELETE FROM time_statistics WHERE session_id = ?', (session_id,))
-                
-                cursor.execute('DELETE FROM analysis_sessions WHERE room_id = ?', (room_id,))
-                cursor.execute('DELETE FROM chat_rooms WHERE id = ?', (room_id,))
-            else:
-                # 기존 스키마 사용
-                cursor.execute('DELETE FROM gpt_analysis_results WHERE session_id = ?', (room_id,))
-                cursor.execute('DELETE FROM user_statistics WHERE session_id = ?', (room_id,))
-                cursor.execute('DELETE FROM time_statistics WHERE session_id = ?', (room_id,))
-                cursor.execute('DELETE FROM chat_messages WHERE session_id = ?', (room_id,))
-                cursor.execute('DELETE FROM analysis_sessions WHERE id = ?', (room_id,))
+            # 메시지 일괄 삭제 (배치 사이에 쉬어 대기 중인 쓰기 연결에 잠금 양보)
+            while True:
+                cursor.execute('''
+                    DELETE FROM chat_messages
+                    WHERE id IN (SELECT id FROM chat_messages WHERE room_id = ? LIMIT ?)
+                ''', (room_id, batch_size))
+                deleted_messages = cursor.rowcount
+                conn.commit()
+                if deleted_messages < batch_size:
+                    break
+                if pause > 0:
+                    time.sleep(pause)
             
-            conn.commit()
+            # 파일, 세션, 통계, 요약은 외래 키 CASCADE로 함께 삭제
+            cursor.execute('DELETE FROM chat_rooms WHERE id = ?', (room_id,))
             deleted_count = cursor.rowcount
+            conn.commit()
             
         except Exception as e:
             conn.rollback()
             print(f"Delete room error: {e}")
             raise e
-        finally:
-            conn.close()
+        
+        if self.archive is not None:
+            self.archive.delete_room(room_id)
+        if self.index is not None:
+            self.index.delete_room(room_id)
+        
+        if vacuum:
+            self.reclaim_space()
         
         return deleted_count > 0
     
-    def save_analysis_session(self, session_name, chat_data, file_name=None, description=None):
-        """분석 세션 저장"""
+    def reclaim_space(self):
+        """삭제로 비워진 페이지를 점진적 VACUUM으로 반환하고 WAL 파일 정리"""
+        conn = self.get_connection()
+        # execute()로는 한 페이지씩만 반환되므로 executescript로 끝까지 실행
+        conn.executescript('PRAGMA incremental_vacuum;')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    
+    def save_analysis_session(self, session_name, chat_data, file_name=None, description=None, room_id=None, file_id=None):
+        """분석 세션 저장
+        
+        세션은 메시지를 복사해 소유하지 않고 채팅방의 메시지 범위(start_date ~ end_date)와
+        파일을 참조합니다. room_id 없이 호출되면 참여자 기준 채팅방에 메시지를 한 번만 저장합니다.
+        """
+        store_messages = room_id is None
+        if store_messages:
+            room_id = self.get_or_create_chat_room(chat_data['user'].unique().tolist())
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # 세션 정보 저장
+        # 세션 정보 저장 (메시지는 room_id + 기간으로 참조)
         cursor.execute('''
             INSERT INTO analysis_sessions 
-            (session_name, file_name, total_messages, participants_count, start_date, end_date, description)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            (session_name, room_id, file_ids, file_name, total_messages, participants_count, start_date, end_date, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             session_name,
+            room_id,
+            json.dumps([file_id] if file_id is not None else []),
             file_name,
             len(chat_data),
             chat_data['user'].nunique(),
@@ -379,55 +1382,377 @@ class DatabaseManager:
         
         session_id = cursor.lastrowid
         
-        # 채팅 메시지 저장
-        chat_records = []
-        for _, row in chat_data.iterrows():
-            chat_records.append((
-                session_id,
-                row['datetime'].isoformat(),
-                row['user'],
-                row['message'],
-                len(row['message']) if pd.notna(row['message']) else 0
-            ))
-        
-        cursor.executemany('''
-            INSERT INTO chat_messages 
-            (session_id, datetime, user, message, message_length)
-            VALUES (?, ?, ?, ?, ?)
-        ''', chat_records)
-        
         conn.commit()
-        conn.close()
+        
+        if store_messages:
+            self.save_messages(room_id, file_id, session_id, chat_data)
         
         return session_id
     
     def get_session_data(self, session_id):
         """특정 세션의 채팅 데이터 조회"""
         conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT room_id, start_date, end_date FROM analysis_sessions WHERE id = ?', (session_id,))
+        session = cursor.fetchone()
         
-        chat_df = pd.read_sql_query('''
-            SELECT datetime, user, message, message_length
-            FROM chat_messages 
-            WHERE session_id = ?
-            ORDER BY datetime
-        ''', conn, params=[session_id])
+        if session and session[0] is not None:
+            # 세션이 참조하는 채팅방 메시지 범위 조회
+            return self.load_room_messages(session[0], session[1], session[2], use_archive=False)
+        else:
+            # 기존 스키마: 세션이 직접 소유한 메시지
+            chat_df = pd.read_sql_query('''
+                SELECT cm.datetime, cu.name AS user, cm.message, cm.message_length
+                FROM chat_messages cm
+                LEFT JOIN chat_users cu ON cu.id = cm.user_id
+                WHERE cm.session_id = ?
+                ORDER BY cm.datetime
+            ''', conn, params=[session_id])
         
         # datetime 컬럼을 datetime 타입으로 변환
         chat_df['datetime'] = pd.to_datetime(chat_df['datetime'])
         
-        conn.close()
         return chat_df 
     
-    def save_chat_file(self, room_id, file_name, file_path, file_size, message_count, start_date, end_date):
-        """채팅 파일 정보 저장"""
+    def search_messages(self, room_id, query, start_date=None, end_date=None, users=None, limit=50, cursor=None):
+        """채팅방 메시지 전문 검색
+        
+        관련도(bm25) 순으로 정렬된 결과와 함께 다음 페이지 조회용 next_cursor를 반환합니다.
+        next_cursor를 그대로 cursor 인자로 넘기면 이어지는 결과를 가져옵니다 (keyset 페이지네이션).
+        trigram 인덱스는 3글자 이상 검색어에만 사용되므로 더 짧은 검색어는 LIKE로 검색합니다.
+        """
+        conn = self.get_connection()
+        
+        cursor_score, cursor_id = cursor if cursor else (None, None)
+        
+        cur = conn.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='chat_messages_fts'")
+        use_fts = cur.fetchone() is not None and len(query) >= 3
+        
+        conditions = ['cm.room_id = ?']
+        params = [room_id]
+        
+        if start_date is not None:
+            conditions.append('cm.datetime >= ?')
+            params.append(start_date.isoformat() if hasattr(start_date, 'isoformat') else str(start_date))
+        if end_date is not None:
+            conditions.append('cm.datetime <= ?')
+            params.append(end_date.isoformat() if hasattr(end_date, 'isoformat') else str(end_date))
+        if users:
+            conditions.append(
+                f"cm.user_id IN (SELECT id FROM chat_users WHERE room_id = ? AND name IN ({','.join('?' * len(users))}))"
+            )
+            params.append(room_id)
+            params.extend(users)
+        
+        if use_fts:
+            match_query = '"' + query.replace('"', '""') + '"'
+            sql = f'''
+                SELECT cm.id, cm.datetime, cu.name, cm.message,
+                       snippet(chat_messages_fts, 0, '[', ']', '…', 16) AS snippet,
+                       bm25(chat_messages_fts) AS score
+                FROM chat_messages_fts
+                JOIN chat_messages cm ON cm.id = chat_messages_fts.rowid
+                LEFT JOIN chat_users cu ON cu.id = cm.user_id
+                WHERE chat_messages_fts MATCH ? AND {' AND '.join(conditions)}
+            '''
+            params = [match_query] + params
+        else:
+            conditions.append("cm.message LIKE ? ESCAPE '\\'")
+            params.append('%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+            sql = f'''
+                SELECT cm.id, cm.datetime, cu.name, cm.message,
+                       cm.message AS snippet,
+                       0.0 AS score
+                FROM chat_messages cm
+                LEFT JOIN chat_users cu ON cu.id = cm.user_id
+                WHERE {' AND '.join(conditions)}
+            '''
+        
+        # 정렬 키 (score, id) 기준 keyset 페이지네이션
+        sql = f'SELECT * FROM ({sql})'
+        if cursor_id is not None:
+            sql += ' WHERE score > ? OR (score = ? AND id > ?)'
+            params.extend([cursor_score, cursor_score, cursor_id])
+        sql += ' ORDER BY score, id LIMIT ?'
+        params.append(limit)
+        
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        
+        results = [
+            {
+                'id': row[0],
+                'datetime': row[1],
+                'user': row[2],
+                'message': row[3],
+                'snippet': row[4],
+                'score': row[5]
+            }
+            for row in rows
+        ]
+        
+        next_cursor = (rows[-1][5], rows[-1][0]) if len(rows) == limit else None
+        return {'results': results, 'next_cursor': next_cursor}
+    
+    def iter_room_messages(self, room_id, start_date=None, end_date=None, users=None, columns=None,
+                           chunk_size=100000, as_arrow=False, after_id=None):
+        """채팅방 메시지를 고정 크기 청크로 스트리밍 조회
+        
+        기간(포함 범위), 사용자, 컬럼 조건은 SQL로 내려보내고 INTEGER ts 인덱스를 (ts, id) keyset으로
+        순회하므로 메모리보다 큰 채팅방도 처리할 수 있습니다. after_id를 주면 그보다 나중에 저장된
+        (ID가 큰) 메시지만 조회합니다. 청크마다 DataFrame을 yield하며,
+        as_arrow=True이면 pyarrow RecordBatch를 yield합니다.
+        user 컬럼은 채팅방 사용자 사전(chat_users) 등록 순서를 카테고리로 하는 category 타입입니다.
+        """
+        columns = columns or ['datetime', 'user', 'message', 'message_length']
+        unknown = [col for col in columns if col not in self.MESSAGE_COLUMNS]
+        if unknown:
+            raise ValueError(f"지원하지 않는 컬럼입니다: {unknown}")
+        
+        select_columns = ['id', 'ts'] + [self.MESSAGE_COLUMNS[col] for col in columns if col not in ('id', 'datetime')]
+        
+        conditions = ['room_id = ?']
+        params = [room_id]
+        if start_date is not None:
+            conditions.append('ts >= ?')
+            params.append(int(pd.Timestamp(start_date).value // 10**9))
+        if end_date is not None:
+            conditions.append('ts <= ?')
+            params.append(int(pd.Timestamp(end_date).value // 10**9))
+        if after_id is not None:
+            conditions.append('id > ?')
+            params.append(int(after_id))
+        if users:
+            conditions.append(
+                f"user_id IN (SELECT id FROM chat_users WHERE room_id = ? AND name IN ({','.join('?' * len(users))}))"
+            )
+            params.append(room_id)
+            params.extend(users)
+        
+        sql = f'''
+            SELECT {', '.join(select_columns)}
+            FROM chat_messages
+            WHERE {' AND '.join(conditions)} AND (ts > ? OR (ts = ? AND id > ?))
+            ORDER BY ts, id
+            LIMIT ?
+        '''
+        
+        cursor = self.get_connection().cursor()
+        
+        # 사용자 사전: user_id → category 코드 (이름 문자열 해싱 없이 정수 ID로 변환)
+        if 'user' in columns:
+            cursor.execute('SELECT id, name FROM chat_users WHERE room_id = ? ORDER BY id', (room_id,))
+            user_rows = cursor.fetchall()
+            user_index = pd.Index([row[0] for row in user_rows], dtype='int64')
+            user_names = [row[1] for row in user_rows]
+        
+        last_ts, last_id = -2**63, -1
+        while True:
+            cursor.execute(sql, params + [last_ts, last_ts, last_id, chunk_size])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            last_id, last_ts = rows[-1][0], rows[-1][1]
+            chunk = pd.DataFrame.from_records(rows, columns=select_columns)
+            if 'datetime' in columns:
+                chunk['datetime'] = pd.to_datetime(chunk['ts'], unit='s')
+            if 'user' in columns:
+                chunk['user'] = pd.Categorical.from_codes(user_index.get_indexer(chunk['user_id']), user_names)
+            chunk = chunk[columns]
+            
+            if as_arrow:
+                import pyarrow as pa
+                yield pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+            else:
+                yield chunk
+            
+            if len(rows) < chunk_size:
+                break
+    
+    def load_room_messages(self, room_id, start_date=None, end_date=None, columns=None, users=None, use_archive=True,
+                           after_id=None):
+        """채팅방 메시지 조회 (아카이브가 있으면 Parquet에서 필요한 월/컬럼만 읽음)
+        
+        아카이브에는 메시지 ID가 없으므로 id 컬럼이나 after_id 조건이 있으면 SQLite에서 조회하고,
+        아카이브가 저장된 메시지보다 뒤처진 채팅방(is_archive_current 참고)도 SQLite에서 조회합니다.
+        """
+        columns = columns or ['datetime', 'user', 'message', 'message_length']
+        
+        if (use_archive and self.archive is not None and after_id is None and 'id' not in columns
+                and self.is_archive_current(room_id)):
+            return self.archive.load(room_id, start_date, end_date, columns, users)
+        
+        chunks = list(self.iter_room_messages(room_id, start_date, end_date, users, columns, after_id=after_id))
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(chunks, ignore_index=True)
+    
+    def index_room(self, room_id):
+        """채팅방 전체 메시지로 검색 인덱스 재구성 (인덱스 기능 도입 전에 저장된 채팅방용)"""
+        if self.index is None:
+            raise RuntimeError("검색 인덱스가 설정되지 않았습니다. DatabaseManager(index_dir=...)로 생성하세요.")
+        
+        self.index.delete_room(room_id)
+        indexed = 0
+        for chunk in self.iter_room_messages(room_id, columns=['id', 'message']):
+            indexed += self.index.append(room_id, chunk['id'].to_numpy(), chunk['message'])
+        self.index.compact(room_id)
+        return indexed
+    
+    def retrieve_messages(self, room_id, query, k=50):
+        """검색 인덱스에서 질의와 내용이 비슷한 메시지 k개를 관련도 순으로 조회 (score 컬럼 포함)"""
+        columns = ['datetime', 'user', 'message', 'score']
+        if self.index is None:
+            return pd.DataFrame(columns=columns)
+        
+        ids, scores = self.index.search(room_id, query, k)
+        if len(ids) == 0:
+            return pd.DataFrame(columns=columns)
+        
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'''
+            SELECT cm.id, cm.ts, cu.name, cm.message
+            FROM chat_messages cm
+            LEFT JOIN chat_users cu ON cu.id = cm.user_id
+            WHERE cm.id IN ({','.join('?' * len(ids))})
+        ''', [int(i) for i in ids])
+        
+        rows = pd.DataFrame.from_records(cursor.fetchall(), columns=['id', 'ts', 'user', 'message']).set_index('id')
+        result = rows.reindex(ids).dropna(subset=['ts'])
+        result['datetime'] = pd.to_datetime(result['ts'].astype('int64'), unit='s')
+        result['score'] = pd.Series(scores, index=ids)
+        return result[columns].reset_index(drop=True)
+    
+    def archive_room(self, room_id):
+        """기존 채팅방 메시지를 아카이브로 내보내기 (아카이브 재구성용, 뒤처진 아카이브 복구)"""
+        if self.archive is None:
+            raise RuntimeError("아카이브가 설정되지 않았습니다. DatabaseManager(archive_dir=...)로 생성하세요.")
+        
+        # 메시지를 읽기 전에 커밋된 저장은 아래에서 모두 내보내므로, 그만큼만 미반영 횟수에서 뺌
+        conn = self.get_connection()
+        pending = self._get_archive_pending(room_id)
+        
+        self.archive.delete_room(room_id)
+        chat_df = self.load_room_messages(room_id, use_archive=False)
+        
+        written = self.archive.append(room_id, chat_df)
+        self.archive.compact(room_id)
+        
+        conn.execute(
+            'UPDATE chat_rooms SET archive_pending = MAX(archive_pending - ?, 0) WHERE id = ?', (pending, room_id)
+        )
+        conn.commit()
+        return written
+    
+    def is_archive_current(self, room_id):
+        """채팅방 아카이브에 저장된 메시지가 모두 반영되어 있는지 여부
+        
+        메시지 저장 후 아카이브 추가가 실패했거나 아직 진행 중이면 False이며, 실패한 경우
+        archive_room으로 재구성할 때까지 메시지 조회는 SQLite를 사용합니다.
+        """
+        return self._get_archive_pending(room_id) == 0
+    
+    def _get_archive_pending(self, room_id):
+        """아카이브에 아직 반영되지 않은 메시지 저장 횟수"""
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT archive_pending FROM chat_rooms WHERE id = ?', (room_id,))
+        row = cursor.fetchone()
+        return row[0] if row is not None else 0
+    
+    def get_room_user_statistics(self, room_id):
+        """채팅방 사용자별 통계 조회 (롤업 테이블, 원본 메시지 미조회)
+        
+        DataProcessor.get_user_statistics와 같은 형태의 딕셔너리를 반환합니다.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        file_hash = self.create_file_hash(file_path, file_name)
+        cursor.execute('''
+            SELECT user, message_count, avg_message_length, first_message, last_message, most_active_hour
+            FROM user_statistics
+            WHERE room_id = ?
+            ORDER BY message_count DESC
+        ''', (room_id,))
+        
+        stats = {}
+        for user, count, avg_length, first_message, last_message, active_hour in cursor.fetchall():
+            stats[user] = {
+                'message_count': count,
+                'avg_message_length': avg_length,
+                'first_message': pd.to_datetime(first_message),
+                'last_message': pd.to_datetime(last_message),
+                'most_active_hour': active_hour
+            }
+        
+        return stats
+    
+    def get_room_activity(self, room_id):
+        """채팅방 날짜 x 시간대별 메시지 수 조회 (롤업 테이블)"""
+        conn = self.get_connection()
+        
+        activity_df = pd.read_sql_query('''
+            SELECT date, hour, message_count
+            FROM time_statistics
+            WHERE room_id = ?
+            ORDER BY date, hour
+        ''', conn, params=[room_id])
+        activity_df['date'] = pd.to_datetime(activity_df['date'])
+        
+        return activity_df
+    
+    def get_room_time_statistics(self, room_id):
+        """채팅방 시간별 통계 조회 (롤업 테이블, 원본 메시지 미조회)
+        
+        DataProcessor.get_time_statistics와 같은 형태에 일별 메시지 수(daily_counts)를 더해 반환합니다.
+        """
+        activity_df = self.get_room_activity(room_id)
+        stats = {}
+        
+        # 시간대별 메시지 수
+        stats['hourly_distribution'] = activity_df.groupby('hour')['message_count'].sum().to_dict()
+        
+        # 요일별 메시지 수
+        daily_counts = activity_df.groupby(activity_df['date'].dt.dayofweek)['message_count'].sum()
+        day_names = ['월', '화', '수', '목', '금', '토', '일']
+        stats['daily_distribution'] = {
+            day_names[i]: int(daily_counts.get(i, 0)) for i in range(7)
+        }
+        
+        # 월별 메시지 수
+        monthly_counts = activity_df.groupby(activity_df['date'].dt.to_period('M'))['message_count'].sum()
+        stats['monthly_distribution'] = {
+            str(period): int(count) for period, count in monthly_counts.items()
+        }
+        
+        # 일별 메시지 수
+        stats['daily_counts'] = activity_df.groupby('date')['message_count'].sum()
+        
+        return stats
+    
+    def save_chat_file(self, room_id, file_name, file_path, file_size, message_count, start_date, end_date, file_bytes=None):
+        """채팅 파일 정보 저장"""
+        file_hash = self.create_file_hash(file_path, file_name, file_bytes)
+        
+        file_mtime = partial_hash = None
+        if file_bytes is None and file_path and os.path.exists(file_path):
+            _, file_mtime, partial_hash = self._file_fingerprint(file_path)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
         # 기존 파일 확인
-        cursor.execute('SELECT id FROM chat_files WHERE file_hash = ?', (file_hash,))
-        result = cursor.fetchone()
+        result = None
+        if file_hash is not None:
+            cursor.execute('SELECT id FROM chat_files WHERE file_hash = ?', (file_hash,))
+            result = cursor.fetchone()
+            if result is None:
+                # 업그레이드 전에 저장된 파일은 MD5로 비교
+                legacy_id = self._find_legacy_file(cursor, file_path, file_size, file_bytes, file_hash)
+                if legacy_id is not None:
+                    result = (legacy_id,)
         
         if result:
             file_id = result[0]
@@ -435,56 +1760,118 @@ class DatabaseManager:
             # 새 파일 정보 저장
             cursor.execute('''
                 INSERT INTO chat_files 
-                (room_id, file_name, file_path, file_hash, file_size, message_count, start_date, end_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (room_id, file_name, file_path, file_hash, file_size, message_count, start_date, end_date))
+                (room_id, file_name, file_path, file_hash, file_size, message_count, start_date, end_date,
+                 file_mtime, partial_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (room_id, file_name, file_path, file_hash, file_size, message_count, start_date, end_date,
+                  file_mtime, partial_hash))
             
             file_id = cursor.lastrowid
+            
+            # 채팅방 요약의 파일 수 갱신
+            cursor.execute('INSERT OR IGNORE INTO room_summary (room_id) VALUES (?)', (room_id,))
+            cursor.execute('''
+                UPDATE room_summary SET file_count = file_count + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE room_id = ?
+            ''', (room_id,))
         
         conn.commit()
-        conn.close()
         return file_id
     
     def save_messages(self, room_id, file_id, session_id, chat_data):
-        """채팅 메시지 저장"""
+        """채팅 메시지 저장 (새 메시지만 저장하고 채팅방 롤업 통계를 같은 트랜잭션에서 갱신)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # 채팅 메시지 저장
-        chat_records = []
-        for _, row in chat_data.iterrows():
-            message_hash = self.create_message_hash(
-                row['datetime'].isoformat(),
-                row['user'],
-                row['message']
-            )
+        messages = chat_data[['datetime', 'user', 'message']].copy()
+        messages['datetime_str'] = [dt.isoformat() for dt in messages['datetime']]
+        messages['ts'] = messages['datetime'].values.astype('datetime64[s]').astype('int64')
+        messages['message_length'] = [
+            len(message) if pd.notna(message) else 0 for message in messages['message']
+        ]
+        messages['message_hash'] = [
+            self.create_message_hash(dt, user, message)
+            for dt, user, message in zip(messages['datetime_str'], messages['user'], messages['message'])
+        ]
+        messages = messages.drop_duplicates('message_hash')
+        
+        indexed_rows = []
+        try:
+            # 기존 메시지 조회부터 쓰기 잠금을 잡아, 겹치는 파일을 동시에 저장해도
+            # 나중 트랜잭션이 먼저 커밋된 메시지를 보고 제외하도록 함 (고유 해시 충돌 방지)
+            conn.execute('BEGIN IMMEDIATE')
+            
+            # 이미 저장된 메시지 제외 (message_hash 고유 인덱스 조회)
+            hashes = messages['message_hash'].tolist()
+            existing = set()
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                cursor.execute(
+                    f"SELECT message_hash FROM chat_messages WHERE message_hash IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                existing.update(row[0] for row in cursor.fetchall())
+            new_messages = messages[~messages['message_hash'].isin(existing)]
+            
+            if not new_messages.empty:
+                cursor.execute('SELECT COALESCE(MAX(id), 0) FROM chat_messages')
+                last_id = cursor.fetchone()[0]
+                
+                user_ids = self._get_user_ids(cursor, room_id, new_messages['user'])
+                cursor.executemany('''
+                    INSERT INTO chat_messages 
+                    (room_id, file_id, session_id, datetime, ts, user_id, message, message_length, message_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (room_id, file_id, session_id, dt, int(ts), user_ids.get(user), message, length, message_hash)
+                    for dt, ts, user, message, length, message_hash in zip(
+                        new_messages['datetime_str'], new_messages['ts'], new_messages['user'],
+                        new_messages['message'], new_messages['message_length'], new_messages['message_hash']
+                    )
+                ])
+                
+                self._update_room_statistics(cursor, room_id, new_messages)
+                self._update_room_summary(cursor, room_id, new_messages)
+                
+                # 아카이브에 추가될 때까지(실패하면 재구성할 때까지) 조회는 SQLite 사용
+                if self.archive is not None and room_id is not None:
+                    cursor.execute(
+                        'UPDATE chat_rooms SET archive_pending = archive_pending + 1 WHERE id = ?', (room_id,)
+                    )
+                
+                # 검색 인덱스에 추가할 새 메시지 ID (쓰기 트랜잭션 안이므로 다른 연결의 삽입과 섞이지 않음)
+                if self.index is not None and room_id is not None:
+                    cursor.execute(
+                        'SELECT id, message FROM chat_messages WHERE room_id = ? AND id > ? ORDER BY id',
+                        (room_id, last_id)
+                    )
+                    indexed_rows = cursor.fetchall()
             
-            # 중복 메시지 확인
-            cursor.execute('SELECT id FROM chat_messages WHERE message_hash = ?', (message_hash,))
-            if cursor.fetchone() is None:
-                chat_records.append((
-                    room_id,
-                    file_id,
-                    session_id,
-                    row['datetime'].isoformat(),
-                    row['user'],
-                    row['message'],
-                    len(row['message']) if pd.notna(row['message']) else 0,
-                    message_hash
-                ))
-        
-        if chat_records:
-            cursor.executemany('''
-                INSERT INTO chat_messages 
-                (room_id, file_id, session_id, datetime, user, message, message_length, message_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', chat_records)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         
-        conn.commit()
-        conn.close()
-        return len(chat_records)
+        if indexed_rows:
+            try:
+                self.index.append(room_id, [row[0] for row in indexed_rows], [row[1] for row in indexed_rows])
+            except Exception as e:
+                print(f"Index append error: {e}")
+        
+        if self.archive is not None and room_id is not None and not new_messages.empty:
+            try:
+                self.archive.append(room_id, new_messages)
+                conn.execute(
+                    'UPDATE chat_rooms SET archive_pending = MAX(archive_pending - 1, 0) WHERE id = ?', (room_id,)
+                )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Archive append error (archive_room으로 재구성할 때까지 SQLite에서 조회): {e}")
+        
+        return len(new_messages)
     
-    def save_chat_file_complete(self, file_path, file_name, chat_data):
+    def save_chat_file_complete(self, file_path, file_name, chat_data, file_bytes=None):
         """완전한 채팅 파일 저장 (채팅방 생성 + 파일 정보 + 메시지)"""
         try:
             # 참여자 목록 추출
@@ -494,19 +1881,24 @@ class DatabaseManager:
             room_id = self.get_or_create_chat_room(participants)
             
             # 파일 정보 저장
-            file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            if file_bytes is not None:
+                file_size = len(file_bytes)
+            else:
+                file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
             message_count = len(chat_data)
             start_date = chat_data['datetime'].min().isoformat()
             end_date = chat_data['datetime'].max().isoformat()
             
-            file_id = self.save_chat_file(room_id, file_name, file_path, file_size, message_count, start_date, end_date)
+            file_id = self.save_chat_file(room_id, file_name, file_path, file_size, message_count, start_date, end_date, file_bytes)
             
-            # 분석 세션 생성
+            # 분석 세션 생성 (메시지는 아래에서 한 번만 저장)
             session_id = self.save_analysis_session(
                 f"{file_name} 분석",
                 chat_data,
                 file_name,
-                f"자동 생성된 분석 세션"
+                f"자동 생성된 분석 세션",
+                room_id=room_id,
+                file_id=file_id
             )
             
             # 메시지 저장
@@ -518,23 +1910,28 @@ class DatabaseManager:
             print(f"Complete save error: {e}")
             raise e
     
-    def update_room_with_new_file(self, room_id, file_path, file_name, chat_data):
+    def update_room_with_new_file(self, room_id, file_path, file_name, chat_data, file_bytes=None):
         """기존 채팅방에 새로운 파일 추가"""
         try:
             # 파일 정보 저장
-            file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            if file_bytes is not None:
+                file_size = len(file_bytes)
+            else:
+                file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
             message_count = len(chat_data)
             start_date = chat_data['datetime'].min().isoformat()
             end_date = chat_data['datetime'].max().isoformat()
             
-            file_id = self.save_chat_file(room_id, file_name, file_path, file_size, message_count, start_date, end_date)
+            file_id = self.save_chat_file(room_id, file_name, file_path, file_size, message_count, start_date, end_date, file_bytes)
             
-            # 분석 세션 생성
+            # 분석 세션 생성 (메시지는 아래에서 한 번만 저장)
             session_id = self.save_analysis_session(
                 f"{file_name} 추가 분석",
                 chat_data,
                 file_name,
-                f"기존 채팅방에 추가된 파일"
+                f"기존 채팅방에 추가된 파일",
+                room_id=room_id,
+                file_id=file_id
             )
             
             # 메시지 저장
@@ -562,37 +1959,79 @@ class DatabaseManager:
         except Exception as e:
             print(f"Get analysis results error: {e}")
             return pd.DataFrame()
-        finally:
-            conn.close()
     
-    def save_analysis_result(self, room_name, analysis_type, analysis_mode, target_user, prompt, result):
-        """분석 결과를 히스토리에 저장"""
+    def save_analysis_result(self, room_name, analysis_type, analysis_mode, target_user, prompt, result,
+                             room_id=None, last_message_ts=None, last_message_id=None):
+        """분석 결과를 히스토리에 저장 (반환값: 저장된 히스토리 ID, 실패 시 False)
+        
+        room_id와 last_message_ts(분석에 포함된 마지막 메시지의 epoch 초), last_message_id(분석 시점의
+        채팅방 마지막 메시지 ID)를 함께 저장하면 이후 증분 분석(get_latest_analysis)의 기준 결과로 사용됩니다.
+        """
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # 결과에서 필요한 정보 추출
-            summary = result.get('summary', '')
-            keywords = json.dumps(result.get('keywords', []), ensure_ascii=False)
-            insights = json.dumps(result.get('insights', []), ensure_ascii=False)
-            recommendations = json.dumps(result.get('recommendations', []), ensure_ascii=False)
-            
-            cursor.execute('''
-                INSERT INTO analysis_history 
-                (room_name, analysis_type, analysis_mode, target_user, prompt, 
-                 result_summary, keywords, insights, recommendations)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (room_name, analysis_type, analysis_mode, target_user, prompt,
-                  summary, keywords, insights, recommendations))
+            analysis_id = self._insert_analysis_result(
+                cursor, room_name, analysis_type, analysis_mode, target_user, prompt, result, room_id, last_message_ts,
+                last_message_id
+            )
             
             conn.commit()
-            conn.close()
-            return True
+            return analysis_id
             
         except Exception as e:
+            if 'conn' in locals():
+                conn.rollback()
             print(f"분석 결과 저장 오류: {e}")
             return False
     
+    def _insert_analysis_result(self, cursor, room_name, analysis_type, analysis_mode, target_user, prompt, result,
+                                room_id=None, last_message_ts=None, last_message_id=None):
+        """주어진 커서로 분석 결과 히스토리 저장 (커밋하지 않음, 반환값: 히스토리 ID)"""
+        # 결과에서 필요한 정보 추출
+        summary = result.get('summary', '')
+        keywords = json.dumps(result.get('keywords', []), ensure_ascii=False)
+        insights = json.dumps(result.get('insights', []), ensure_ascii=False)
+        recommendations = json.dumps(result.get('recommendations', []), ensure_ascii=False)
+        
+        cursor.execute('''
+            INSERT INTO analysis_history 
+            (room_name, analysis_type, analysis_mode, target_user, prompt, 
+             result_summary, keywords, insights, recommendations, room_id, last_message_ts, last_message_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (room_name, analysis_type, analysis_mode, target_user, prompt,
+              summary, keywords, insights, recommendations, room_id, last_message_ts, last_message_id))
+        return cursor.lastrowid
+    
+    def get_latest_analysis(self, room_id, analysis_type):
+        """채팅방/분석 유형의 가장 최근 분석 결과 (증분 분석 기준, 없으면 None)
+        
+        마지막 메시지 시각(last_message_ts)이 기록된 전체 대상 결과만 조회합니다.
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute('''
+            SELECT id, result_summary, keywords, insights, recommendations, last_message_ts, created_at, last_message_id
+            FROM analysis_history
+            WHERE room_id = ? AND analysis_type = ? AND last_message_ts IS NOT NULL
+              AND COALESCE(target_user, '전체') = '전체'
+            ORDER BY id DESC
+            LIMIT 1
+        ''', (room_id, analysis_type))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        
+        return {
+            'id': row[0],
+            'summary': row[1],
+            'keywords': json.loads(row[2]) if row[2] else [],
+            'insights': json.loads(row[3]) if row[3] else [],
+            'recommendations': json.loads(row[4]) if row[4] else [],
+            'last_message_ts': row[5],
+            'created_at': row[6],
+            'last_message_id': row[7],
+        }
+    
     def get_analysis_history(self, limit=50):
         """분석 히스토리 조회"""
         try:
@@ -609,7 +2048,6 @@ class DatabaseManager:
             ''', (limit,))
             
             results = cursor.fetchall()
-            conn.close()
             
             # 결과를 딕셔너리 리스트로 변환
             history = []
@@ -653,10 +2091,11 @@ class DatabaseManager:
             cursor.execute('DELETE FROM analysis_history WHERE id = ?', (analysis_id,))
             
             conn.commit()
-            conn.close()
             return True
             
         except Exception as e:
+            if 'conn' in locals():
+                conn.rollback()
             print(f"히스토리 삭제 오류: {e}")
             return False
     
@@ -669,9 +2108,273 @@ class DatabaseManager:
             cursor.execute('DELETE FROM analysis_history')
             
             conn.commit()
-            conn.close()
             return True
             
         except Exception as e:
+            if 'conn' in locals():
+                conn.rollback()
             print(f"히스토리 전체 삭제 오류: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def enqueue_analysis_jobs(self, room_ids, analysis_types, full_history=False, max_attempts=3, incremental=False):
+        """채팅방 × 분석 유형 조합을 분석 작업 큐에 추가 (반환값: 추가된 작업 수)
+        
+        같은 채팅방/분석 유형의 작업이 이미 대기 중이거나 실행 중이면 다시 추가하지 않습니다.
+        incremental=True이면 이전 결과가 있을 때 그 이후 메시지만 분석해 이전 결과와 합칩니다.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        now = time.time()
+        
+        try:
+            added = 0
+            for room_id in room_ids:
+                for analysis_type in analysis_types:
+                    cursor.execute('''
+                        INSERT INTO analysis_jobs
+                        (room_id, analysis_type, full_history, incremental, max_attempts, created_at)
+                        SELECT ?, ?, ?, ?, ?, ?
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM analysis_jobs
+                            WHERE room_id = ? AND analysis_type = ? AND state IN ('pending', 'running')
+                        )
+                    ''', (room_id, analysis_type, int(full_history), int(incremental), max_attempts, now,
+                          room_id, analysis_type))
+                    added += cursor.rowcount
+            conn.commit()
+            return added
+        except Exception as e:
+            conn.rollback()
+            print(f"Enqueue analysis jobs error: {e}")
+            raise
+    
+    def claim_analysis_job(self, worker, lease_seconds=1800):
+        """가장 오래된 대기 작업 하나를 worker에 할당 (없으면 None)
+        
+        할당된 작업은 lease_seconds 동안 해당 워커 소유이며(실행 중에는 extend_analysis_job_lease로 연장),
+        그 안에 완료/실패 처리되지 않으면 (워커 프로세스가 죽은 경우) 다른 워커가 다시 가져갑니다.
+        시도 횟수를 다 쓴 작업은 실패 처리합니다.
+        여러 프로세스가 동시에 호출해도 쓰기 잠금(BEGIN IMMEDIATE)으로 한 작업은 한 워커에만 할당됩니다.
+        """
+        conn = self.get_connection()
+        now = time.time()
+        
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                UPDATE analysis_jobs
+                SET state = 'failed', error = '작업 시간 초과 (워커 중단)', finished_at = ?
+                WHERE state = 'running' AND lease_until < ? AND attempts >= max_attempts
+            ''', (now, now))
+            row = conn.execute('''
+                UPDATE analysis_jobs
+                SET state = 'running', attempts = attempts + 1, worker = ?, lease_until = ?, started_at = ?
+                WHERE id = (
+                    SELECT id FROM analysis_jobs
+                    WHERE state = 'pending' OR (state = 'running' AND lease_until < ?)
+                    ORDER BY id
+                    LIMIT 1
+                )
+                RETURNING id, room_id, analysis_type, full_history, incremental, attempts, max_attempts
+            ''', (worker, now + lease_seconds, now, now)).fetchone()
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Claim analysis job error: {e}")
+            raise
+        
+        if row is None:
+            return None
+        return dict(zip(
+            ['id', 'room_id', 'analysis_type', 'full_history', 'incremental', 'attempts', 'max_attempts'], row
+        ))
+    
+    def extend_analysis_job_lease(self, job_id, worker, lease_seconds=1800):
+        """실행 중인 작업의 할당을 지금부터 lease_seconds 동안으로 연장 (반환값: 할당을 유지하고 있는지)
+        
+        할당이 이미 만료되었거나 다른 워커가 가져간 작업은 연장하지 않고 False를 반환합니다.
+        """
+        conn = self.get_connection()
+        now = time.time()
+        
+        cursor = conn.execute('''
+            UPDATE analysis_jobs SET lease_until = ?
+            WHERE id = ? AND worker = ? AND state = 'running' AND lease_until >= ?
+        ''', (now + lease_seconds, job_id, worker, now))
+        conn.commit()
+        return cursor.rowcount > 0
+    
+    def complete_analysis_job(self, job_id, worker, result, analysis_mode="일괄 분석", last_message_ts=None,
+                              result_id=None, last_message_id=None):
+        """작업 결과를 분석 히스토리에 저장하고 완료 처리 (한 트랜잭션, 반환값: 히스토리 ID)
+        
+        result_id를 주면 새로 저장하지 않고 기존 결과에 연결합니다 (증분 분석할 새 메시지가 없을 때).
+        할당이 만료되었거나 다른 워커가 작업을 다시 가져간 경우에는 저장하지 않고 None을 반환합니다.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # 할당 확인과 완료 처리 사이에 다른 워커가 가져가지 못하도록 쓰기 잠금
+            conn.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT cr.room_name, aj.analysis_type, aj.room_id
+                FROM analysis_jobs aj
+                JOIN chat_rooms cr ON cr.id = aj.room_id
+                WHERE aj.id = ? AND aj.worker = ? AND aj.state = 'running' AND aj.lease_until >= ?
+            ''', (job_id, worker, time.time()))
+            row = cursor.fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            
+            room_name, analysis_type, room_id = row
+            if result_id is None:
+                result_id = self._insert_analysis_result(
+                    cursor, room_name, analysis_type, analysis_mode, "전체", None, result, room_id, last_message_ts,
+                    last_message_id
+                )
+            cursor.execute('''
+                UPDATE analysis_jobs
+                SET state = 'done', result_id = ?, error = NULL, lease_until = NULL, finished_at = ?
+                WHERE id = ?
+            ''', (result_id, time.time(), job_id))
+            conn.commit()
+            return result_id
+        except Exception as e:
+            conn.rollback()
+            print(f"Complete analysis job error: {e}")
+            raise
+    
+    def fail_analysis_job(self, job_id, worker, error, retry=True):
+        """작업 실패 처리 (시도 횟수가 남았고 retry=True이면 다시 대기 상태로, 반환값: 처리 여부)
+        
+        할당이 만료되었거나 다른 워커가 가져간 작업은 변경하지 않습니다.
+        """
+        conn = self.get_connection()
+        now = time.time()
+        
+        cursor = conn.execute('''
+            UPDATE analysis_jobs
+            SET state = CASE WHEN ? AND attempts < max_attempts THEN 'pending' ELSE 'failed' END,
+                error = ?, lease_until = NULL, finished_at = ?
+            WHERE id = ? AND worker = ? AND state = 'running' AND lease_until >= ?
+        ''', (int(retry), str(error), now, job_id, worker, now))
+        conn.commit()
+        return cursor.rowcount > 0
+    
+    def release_analysis_job(self, job_id, worker):
+        """실행 중이던 작업을 시도 횟수를 되돌려 대기 상태로 반환 (워커 종료 시, 할당을 잃은 작업은 그대로 둠)"""
+        conn = self.get_connection()
+        
+        conn.execute('''
+            UPDATE analysis_jobs
+            SET state = 'pending', attempts = attempts - 1, lease_until = NULL
+            WHERE id = ? AND worker = ? AND state = 'running' AND lease_until >= ?
+        ''', (job_id, worker, time.time()))
+        conn.commit()
+    
+    def retry_failed_jobs(self):
+        """실패한 작업을 시도 횟수를 초기화해 다시 대기 상태로 (반환값: 작업 수)"""
+        conn = self.get_connection()
+        
+        cursor = conn.execute('''
+            UPDATE analysis_jobs
+            SET state = 'pending', attempts = 0, error = NULL, finished_at = NULL
+            WHERE state = 'failed'
+        ''')
+        conn.commit()
+        return cursor.rowcount
+    
+    def get_analysis_jobs(self, state=None, limit=100):
+        """분석 작업 목록 조회 (최근 작업 순, 채팅방 이름 포함)"""
+        conn = self.get_connection()
+        
+        sql = '''
+            SELECT aj.id, aj.room_id, cr.room_name, aj.analysis_type, aj.state, aj.attempts, aj.max_attempts,
+                   aj.worker, aj.result_id, aj.error, aj.created_at, aj.started_at, aj.finished_at
+            FROM analysis_jobs aj
+            LEFT JOIN chat_rooms cr ON cr.id = aj.room_id
+        '''
+        params = []
+        if state:
+            sql += ' WHERE aj.state = ?'
+            params.append(state)
+        sql += ' ORDER BY aj.id DESC LIMIT ?'
+        params.append(limit)
+        
+        jobs = pd.read_sql_query(sql, conn, params=params)
+        for column in ['created_at', 'started_at', 'finished_at']:
+            jobs[column] = pd.to_datetime(jobs[column], unit='s')
+        return jobs
+    
+    def get_job_counts(self):
+        """상태별 분석 작업 수"""
+        conn = self.get_connection()
+        
+        rows = conn.execute('SELECT state, COUNT(*) FROM analysis_jobs GROUP BY state').fetchall()
+        counts = {state: 0 for state in ['pending', 'running', 'done', 'failed']}
+        counts.update(dict(rows))
+        return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="카카오톡 분석 데이터베이스 관리 도구")
+    parser.add_argument('--db', default="kakao_analysis.db", help="데이터베이스 파일 경로")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    rebuild_parser = subparsers.add_parser('rebuild-summary', help="채팅방 요약(room_summary) 재구성")
+    rebuild_parser.add_argument('--room-id', type=int, help="특정 채팅방만 재구성")
+    
+    archive_parser = subparsers.add_parser('archive', help="채팅방 메시지를 Parquet 아카이브로 내보내기")
+    archive_parser.add_argument('--room-id', type=int, required=True, help="내보낼 채팅방 ID")
+    archive_parser.add_argument('--archive-dir', default="message_archive", help="아카이브 디렉터리")
+    
+    index_parser = subparsers.add_parser('index', help="채팅방 메시지 검색 인덱스 재구성")
+    index_parser.add_argument('--room-id', type=int, required=True, help="인덱싱할 채팅방 ID")
+    index_parser.add_argument('--index-dir', default="message_index", help="검색 인덱스 디렉터리")
+    
+    enqueue_parser = subparsers.add_parser('enqueue', help="채팅방 × 분석 유형 일괄 분석 작업 추가")
+    enqueue_parser.add_argument('--room-id', type=int, nargs='+', help="분석할 채팅방 ID (생략 시 모든 채팅방)")
+    enqueue_parser.add_argument('--type', dest='analysis_types', nargs='+', default=["종합 분석"],
+                                help="분석 유형 (예: 종합 분석 감정 분석)")
+    enqueue_parser.add_argument('--full-history', action='store_true', help="전체 기록을 구간별 요약 후 종합")
+    enqueue_parser.add_argument('--max-attempts', type=int, default=3, help="작업별 최대 시도 횟수")
+    enqueue_parser.add_argument('--incremental', action='store_true',
+                                help="이전 분석 결과 이후의 새 메시지만 분석해 이전 결과와 합침")
+    
+    jobs_parser = subparsers.add_parser('jobs', help="분석 작업 큐 상태 조회")
+    jobs_parser.add_argument('--state', choices=['pending', 'running', 'done', 'failed'], help="상태 필터")
+    jobs_parser.add_argument('--limit', type=int, default=20, help="표시할 작업 수")
+    jobs_parser.add_argument('--retry-failed', action='store_true', help="실패한 작업을 다시 대기 상태로")
+    
+    args = parser.parse_args()
+    db_manager = DatabaseManager(
+        args.db, archive_dir=getattr(args, 'archive_dir', None), index_dir=getattr(args, 'index_dir', None)
+    )
+    
+    if args.command == 'rebuild-summary':
+        count = db_manager.rebuild_room_summary(args.room_id)
+        print(f"✅ 채팅방 요약 {count}개 재구성 완료")
+    elif args.command == 'archive':
+        count = db_manager.archive_room(args.room_id)
+        print(f"✅ 메시지 {count:,}개 아카이브 완료")
+    elif args.command == 'index':
+        count = db_manager.index_room(args.room_id)
+        print(f"✅ 메시지 {count:,}개 인덱싱 완료")
+    elif args.command == 'enqueue':
+        room_ids = args.room_id or db_manager.get_all_rooms()['id'].tolist()
+        count = db_manager.enqueue_analysis_jobs(
+            room_ids, args.analysis_types, full_history=args.full_history, max_attempts=args.max_attempts,
+            incremental=args.incremental
+        )
+        print(f"✅ 분석 작업 {count:,}개 추가 (채팅방 {len(room_ids):,}개 × 분석 유형 {len(args.analysis_types)}개)")
+    elif args.command == 'jobs':
+        if args.retry_failed:
+            print(f"🔄 실패한 작업 {db_manager.retry_failed_jobs():,}개를 다시 대기 상태로 변경")
+        print(" / ".join(f"{state}: {count:,}" for state, count in db_manager.get_job_counts().items()))
+        jobs = db_manager.get_analysis_jobs(args.state, args.limit)
+        if not jobs.empty:
+            print(jobs[['id', 'room_name', 'analysis_type', 'state', 'attempts', 'result_id', 'error']].to_string(index=False))
@@ -1,17 +1,88 @@
 import openai
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager
+from collections import OrderedDict
+import asyncio
+import hashlib
 import json
 import re
 import os
+import threading
+import time
+from utils.llm_cache import LLMCache
+from utils.llm_telemetry import LLMTelemetry
+from utils.prompt_packer import PromptPacker
+from utils.rate_limiter import (
+    AsyncTokenBucket, backoff_delay, AdaptiveConcurrencyLimiter, CircuitBreaker, CircuitOpenError
+)
+from utils.sentiment_lexicon import SentimentLexicon
+from utils.message_sampler import MessageSampler
+from utils.message_index import VectorIndex
+from utils.request_coalescer import RequestCoalescer, RequestAborted
 
 class GPTAnalyzer:
     """GPT를 이용한 채팅 분석 클래스"""
     
-    def __init__(self, api_key):
-        """OpenAI 클라이언트 초기화"""
+    # 저장된 채팅방 인덱스가 없을 때 쓰는 메모리 검색 인덱스 (데이터 내용 해시 → 인덱스, 최근 것부터 유지)
+    _retrieval_cache = OrderedDict()
+    _retrieval_cache_lock = threading.Lock()
+    RETRIEVAL_CACHE_SIZE = 4
+    
+    # 같은 요청의 동시 호출 병합 (프로세스 안의 모든 인스턴스/스레드가 공유)
+    _coalescer = RequestCoalescer()
+    
+    # API 동시 요청 수 자동 조절과 장애 차단기 (프로세스 안의 모든 인스턴스가 공유)
+    _limiter = AdaptiveConcurrencyLimiter()
+    _breaker = CircuitBreaker()
+    
+    def __init__(self, api_key, use_cache=True, cache_path="llm_cache.db", base_url=None, token_budget=3000,
+                 coalesce=True, max_retries=2):
+        """OpenAI 클라이언트 초기화
+        
+        use_cache=False이면 캐시를 조회하지 않고 항상 API를 호출합니다 (새 응답은 캐시에 저장).
+        cache_path=None이면 응답 캐시와 API 호출 기록(llm_calls)을 사용하지 않습니다.
+        base_url을 지정하면 OpenAI 호환 서버(로컬 테스트 서버 등)로 요청합니다.
+        token_budget은 프롬프트에 담을 대화록의 토큰 예산이며 상세 분석은 1.5배를 사용합니다.
+        coalesce=True이면 같은 요청이 동시에 진행 중일 때 API를 다시 호출하지 않고 그 응답을 함께 받습니다.
+        max_retries는 동기/스트리밍 호출의 429/5xx/연결 오류 재시도 횟수이며, 재시도마다 동시 요청 한도와
+        차단기를 거칩니다 (SDK 자체 재시도는 사용하지 않음).
+        """
         self.model = "gpt-4o-mini"
+        self.token_budget = token_budget
+        self.packer = PromptPacker(token_budget, model=self.model)
+        self.lexicon = SentimentLexicon()
+        self.sampler = MessageSampler()
+        self.api_key = api_key
+        self.base_url = base_url
+        self.use_cache = use_cache
+        self.coalesce = coalesce
+        self.max_retries = max_retries
+        self.last_sentiment_stats = None
+        self.last_stream_result = None
+        self.last_fanout_stats = None
+        
+        # 동일 프롬프트 재호출 방지용 응답 캐시와 전체 기록 분석용 구간 요약 캐시 (장기 보관)
+        self.cache = None
+        self.summary_cache = None
+        self.telemetry = None
+        if cache_path:
+            try:
+                self.cache = LLMCache(cache_path)
+                self.summary_cache = LLMCache(
+                    cache_path, ttl_seconds=365 * 24 * 3600, max_entries=200000,
+                    max_bytes=500 * 1024 * 1024, table="chunk_summaries"
+                )
+            except Exception as e:
+                print(f"⚠️ LLM 응답 캐시를 사용할 수 없습니다: {str(e)}")
+            
+            try:
+                self.telemetry = LLMTelemetry(cache_path)
+            except Exception as e:
+                print(f"⚠️ API 호출 기록을 사용할 수 없습니다: {str(e)}")
         
         # API 키 검증
         if not api_key or not api_key.startswith('sk-'):
@@ -19,7 +90,8 @@ class GPTAnalyzer:
         
         try:
             # OpenAI 1.0+ 버전 방식으로 클라이언트 초기화
-            self.client = OpenAI(api_key=api_key)
+            # 재시도는 _request_completion/_chat_completion_stream에서 한도/차단기를 거쳐 직접 수행
+            self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
             
             print(f"✅ OpenAI API 키 설정 완료 (모델: {self.model})")
             
@@ -27,36 +99,392 @@ class GPTAnalyzer:
             print(f"❌ OpenAI API 키 설정 실패: {str(e)}")
             raise Exception(f"OpenAI API 설정 실패. 원인: {str(e)}")
     
-    def analyze_chat(self, data, analysis_type, target_user="전체", detailed=False, include_context=True):
-        """채팅 데이터를 분석"""
+    def _chat_completion(self, messages, max_tokens, temperature, use_cache=None, analysis_type=None):
+        """Chat Completions API 호출 후 응답 텍스트 반환
         
-        # 데이터 전처리
-        if target_user != "전체":
-            data = data[data['user'] == target_user]
+        모델, 메시지, 샘플링 파라미터가 같은 요청은 캐시된 응답을 반환하고, 같은 요청이 진행 중이면 그 응답을 기다립니다.
+        실제 요청(재시도 포함)마다 지연 시간/토큰 사용량/오류를 analysis_type, 시도 번호와 함께 llm_calls에 기록합니다.
+        """
+        started = time.time()
+        cache_key, cached = self._cache_lookup(messages, max_tokens, temperature, use_cache)
+        if cached is not None:
+            self._record_call(analysis_type, started, cache_hit=True)
+            return cached
         
-        # 메시지가 너무 많으면 최근 메시지로 제한
-        limit = 800 if detailed else 500
-        if len(data) > limit:
-            data = data.tail(limit)
+        coalesce_key = self._coalesce_key(messages, max_tokens, temperature)
+        if coalesce_key is None:
+            return self._request_completion(messages, max_tokens, temperature, cache_key, analysis_type, started)
         
-        # 분석 타입별 프롬프트 생성
-        prompt = self.generate_prompt(data, analysis_type, target_user, include_context, detailed)
+        merged = True
+        
+        def request():
+            nonlocal merged
+            merged = False
+            return self._request_completion(messages, max_tokens, temperature, cache_key, analysis_type, started)
         
         try:
-            max_tokens = 3000 if detailed else 2000
+            content = self._coalescer.run(coalesce_key, request)
+        except Exception as e:
+            if merged:
+                self._record_call(analysis_type, started, coalesced=True, error=e)
+            raise
+        if merged:
+            self._record_call(analysis_type, started, coalesced=True)
+        return content
+    
+    def _request_completion(self, messages, max_tokens, temperature, cache_key, analysis_type, started):
+        """실제 API 호출, 429/5xx/연결 오류는 max_retries번까지 백오프 후 재시도 (_chat_completion 참고)"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._upstream_call():
+                    response = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature
+                    )
+                break
+            except Exception as e:
+                # 실제 요청마다 한 행씩 기록
+                self._record_call(analysis_type, started, attempt=attempt, error=e)
+                wait = self._sync_retry_wait(e, attempt)
+                if wait is None:
+                    raise
+                time.sleep(wait)
+                started = time.time()
+        self._record_call(analysis_type, started, usage=response.usage, attempt=attempt)
+        content = response.choices[0].message.content
+        
+        if cache_key is not None:
+            self.cache.set(cache_key, self.model, content)
+        
+        return content
+    
+    def _chat_completion_stream(self, messages, max_tokens, temperature, use_cache=None, analysis_type=None):
+        """_chat_completion의 스트리밍 버전: 응답 텍스트 조각을 도착하는 대로 yield
+        
+        캐시 적중 시 저장된 응답을 한 번에 yield하며, 응답이 끝까지 수신된 경우에만 캐시에 저장합니다.
+        같은 요청이 진행 중이면 그 응답이 끝난 뒤 한 번에 yield합니다.
+        토큰 사용량은 스트림 마지막의 usage 청크에서 기록합니다.
+        """
+        started = time.time()
+        cache_key, cached = self._cache_lookup(messages, max_tokens, temperature, use_cache)
+        if cached is not None:
+            self._record_call(analysis_type, started, cache_hit=True, streamed=True)
+            yield cached
+            return
+        
+        coalesce_key = self._coalesce_key(messages, max_tokens, temperature)
+        future = None
+        while coalesce_key is not None:
+            future, leader = self._coalescer.join(coalesce_key)
+            if leader:
+                break
             
-            # OpenAI 1.0+ 버전 API 호출 방식
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "당신은 카카오톡 채팅 분석 전문가입니다. 주어진 채팅 데이터를 분석하여 유용한 인사이트를 제공해주세요. 한국어로 자세하고 구체적으로 답변해주세요."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=0.7
-            )
+            try:
+                content = future.result()
+            except RequestAborted:
+                continue
+            except Exception as e:
+                self._record_call(analysis_type, started, streamed=True, coalesced=True, error=e)
+                raise
+            self._record_call(analysis_type, started, streamed=True, coalesced=True)
+            yield content
+            return
+        
+        parts = []
+        usage = None
+        # 끝까지 받지 못하면(소비자가 중간에 멈춘 경우 포함) 기다리던 호출이 다시 요청하도록 알림
+        error = RequestAborted()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    with self._upstream_call(streamed=True):
+                        stream = self.client.chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            stream=True,
+                            stream_options={"include_usage": True}
+                        )
+                        
+                        try:
+                            for chunk in stream:
+                                usage = chunk.usage or usage
+                                if not chunk.choices:
+                                    continue
+                                delta = chunk.choices[0].delta.content
+                                if delta:
+                                    parts.append(delta)
+                                    yield delta
+                        finally:
+                            # 소비자가 중간에 멈춰도 연결을 닫음
+                            stream.close()
+                    break
+                except Exception as e:
+                    self._record_call(analysis_type, started, attempt=attempt, streamed=True, error=e)
+                    # 이미 일부를 내보낸 응답은 이어 받을 수 없으므로 첫 조각 전에만 재시도
+                    wait = None if parts else self._sync_retry_wait(e, attempt)
+                    if wait is None:
+                        raise
+                    time.sleep(wait)
+                    started = time.time()
+            error = None
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if future is not None:
+                self._coalescer.resolve(coalesce_key, future, result="".join(parts), error=error)
+        self._record_call(analysis_type, started, usage=usage, attempt=attempt, streamed=True)
+        
+        if cache_key is not None:
+            self.cache.set(cache_key, self.model, "".join(parts))
+    
+    def _stream_and_structure(self, messages, max_tokens, custom_prompt, data, error_info, analysis_type=None):
+        """응답을 스트리밍하고 완료 후 한 번만 구조화해 self.last_stream_result에 저장"""
+        self.last_stream_result = None
+        parts = []
+        try:
+            for delta in self._chat_completion_stream(messages, max_tokens, temperature=0.7, analysis_type=analysis_type):
+                parts.append(delta)
+                yield delta
             
-            analysis_result = response.choices[0].message.content
+            self.last_stream_result = self.structure_advanced_results("".join(parts), custom_prompt, data)
+            
+        except Exception as e:
+            self.last_stream_result = {
+                "summary": f"분석 중 오류가 발생했습니다: {str(e)}",
+                "error": True,
+                **error_info
+            }
+    
+    async def _chat_completion_async(self, client, messages, max_tokens, temperature, use_cache=None, cache=None,
+                                     analysis_type=None, attempt=0):
+        """_chat_completion의 비동기 버전 (AsyncOpenAI 클라이언트 사용, cache로 사용할 캐시 지정 가능)"""
+        started = time.time()
+        cache = cache or self.cache
+        cache_key, cached = self._cache_lookup(messages, max_tokens, temperature, use_cache, cache)
+        if cached is not None:
+            self._record_call(analysis_type, started, attempt=attempt, cache_hit=True)
+            return cached
+        
+        coalesce_key = self._coalesce_key(messages, max_tokens, temperature)
+        if coalesce_key is None:
+            return await self._request_completion_async(
+                client, messages, max_tokens, temperature, cache, cache_key, analysis_type, attempt, started
+            )
+        
+        merged = True
+        
+        async def request():
+            nonlocal merged
+            merged = False
+            return await self._request_completion_async(
+                client, messages, max_tokens, temperature, cache, cache_key, analysis_type, attempt, started
+            )
+        
+        try:
+            content = await self._coalescer.run_async(coalesce_key, request)
+        except Exception as e:
+            if merged:
+                self._record_call(analysis_type, started, attempt=attempt, coalesced=True, error=e)
+            raise
+        if merged:
+            self._record_call(analysis_type, started, attempt=attempt, coalesced=True)
+        return content
+    
+    async def _request_completion_async(self, client, messages, max_tokens, temperature, cache, cache_key,
+                                        analysis_type, attempt, started):
+        """실제 비동기 API 호출 (_chat_completion_async 참고)"""
+        try:
+            async with self._upstream_call_async():
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
+        except Exception as e:
+            self._record_call(analysis_type, started, attempt=attempt, error=e)
+            raise
+        self._record_call(analysis_type, started, usage=response.usage, attempt=attempt)
+        content = response.choices[0].message.content
+        
+        if cache_key is not None:
+            cache.set(cache_key, self.model, content)
+        
+        return content
+    
+    async def _complete_with_retry(self, client, messages, max_tokens, temperature, bucket, max_retries, stats,
+                                   use_cache=None, cache=None, analysis_type=None):
+        """분당 한도를 지키며 비동기 호출, 429/5xx/연결 오류는 지수 백오프로 재시도 (stats['retries'] 누적)"""
+        for attempt in range(max_retries + 1):
+            try:
+                # 토큰 한도용 추정치: 프롬프트 토큰 수 + 최대 응답 토큰
+                await bucket.acquire(self.packer.count_tokens(messages[-1]["content"]) + max_tokens)
+                return await self._chat_completion_async(
+                    client, messages, max_tokens, temperature, use_cache, cache, analysis_type, attempt
+                )
+            except Exception as e:
+                wait = self._retry_after(e)
+                if wait is None or attempt == max_retries:
+                    raise
+                stats["retries"] += 1
+                await asyncio.sleep(wait or backoff_delay(attempt))
+    
+    def _sync_retry_wait(self, error, attempt):
+        """동기/스트리밍 호출 재시도 전 대기 시간 (재시도하지 않을 오류거나 횟수를 다 쓰면 None)
+        
+        대화형 호출이므로 차단기가 열려 있으면 기다리지 않고 바로 실패합니다.
+        """
+        wait = self._retry_after(error)
+        if wait is None or isinstance(error, CircuitOpenError) or attempt >= self.max_retries:
+            return None
+        return wait or backoff_delay(attempt)
+    
+    def _record_call(self, analysis_type, started, usage=None, attempt=0, cache_hit=False, streamed=False,
+                     coalesced=False, error=None):
+        """API 호출 1회를 llm_calls에 기록 (기록 미사용 시 무시)"""
+        if self.telemetry is None:
+            return
+        self.telemetry.record(
+            analysis_type, self.model, (time.time() - started) * 1000,
+            prompt_tokens=getattr(usage, 'prompt_tokens', 0),
+            completion_tokens=getattr(usage, 'completion_tokens', 0),
+            attempt=attempt, cache_hit=cache_hit, streamed=streamed, coalesced=coalesced,
+            error=type(error).__name__ if error is not None else None
+        )
+    
+    def _coalesce_key(self, messages, max_tokens, temperature):
+        """동시 호출 병합 키 (병합 미사용 시 None, 다른 서버로 보내는 요청은 병합하지 않음)"""
+        if not self.coalesce:
+            return None
+        return LLMCache.make_key(
+            self.model, messages, max_tokens=max_tokens, temperature=temperature, base_url=self.base_url
+        )
+    
+    def get_coalesce_stats(self):
+        """프로세스 시작 후 동시 호출 병합 통계 (리더 요청 수, 병합된 호출 수, 진행 중 요청 수, 병합 비율)"""
+        return self._coalescer.stats()
+    
+    def get_call_summary(self, days=7):
+        """최근 days일 API 호출 요약 (지연 시간 백분위수, 분석 유형별 토큰, 일별 합계; 기록 미사용 시 None)"""
+        return self.telemetry.summary(days) if self.telemetry is not None else None
+    
+    def _run_async(self, coroutine):
+        """동기 코드에서 코루틴 실행 (이벤트 루프가 이미 실행 중이면 별도 스레드의 루프에서 실행)"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+    
+    def _cache_lookup(self, messages, max_tokens, temperature, use_cache=None, cache=None):
+        """요청의 캐시 키와 캐시된 응답 조회 (캐시 미사용/미적중 시 응답은 None)"""
+        cache = cache or self.cache
+        if cache is None:
+            return None, None
+        
+        use_cache = self.use_cache if use_cache is None else use_cache
+        cache_key = cache.make_key(self.model, messages, max_tokens=max_tokens, temperature=temperature)
+        return cache_key, cache.get(cache_key) if use_cache else None
+    
+    @contextmanager
+    def _upstream_call(self, streamed=False):
+        """API 요청 구간: 차단기 확인 후 동시 요청 한도를 확보하고, 끝나면 결과를 한도/차단기에 반영
+        
+        차단기가 열려 있으면 요청하지 않고 CircuitOpenError를 냅니다.
+        스트리밍 응답은 길이에 따라 시간이 달라지므로 응답 시간은 반영하지 않습니다.
+        """
+        self._breaker.before_call()
+        self._limiter.acquire()
+        started = time.monotonic()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._upstream_done(started, error, streamed)
+    
+    @asynccontextmanager
+    async def _upstream_call_async(self):
+        """_upstream_call의 비동기 버전"""
+        self._breaker.before_call()
+        await self._limiter.acquire_async()
+        started = time.monotonic()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._upstream_done(started, error)
+    
+    def _upstream_done(self, started, error=None, streamed=False):
+        # 재시도할 오류(429, 5xx, 연결/타임아웃)만 과부하/장애 신호로 보고, 그 외 오류나 중단은 판단 보류
+        if error is None:
+            success = True
+        elif self._retry_after(error) is not None:
+            success = False
+        else:
+            success = None
+        self._limiter.release(success, None if streamed else time.monotonic() - started)
+        self._breaker.record(success)
+    
+    def get_upstream_stats(self):
+        """프로세스 공유 동시 요청 한도와 차단기 상태"""
+        return {"concurrency": self._limiter.stats(), "circuit": self._breaker.stats()}
+    
+    def _retry_after(self, error):
+        """재시도할 API 오류(429, 5xx, 연결/타임아웃)면 서버가 요청한 대기 시간(초, 없으면 0), 아니면 None
+        
+        차단기가 열려 있어 실패한 요청은 차단기가 시험 요청을 받을 때까지의 시간을 반환합니다.
+        """
+        if isinstance(error, CircuitOpenError):
+            return error.retry_after
+        if isinstance(error, openai.APIStatusError):
+            if error.status_code != 429 and error.status_code < 500:
+                return None
+        elif not isinstance(error, openai.APIConnectionError):
+            return None
+        
+        response = getattr(error, 'response', None)
+        header = response.headers.get('retry-after') if response is not None else None
+        try:
+            return float(header) if header else 0.0
+        except ValueError:
+            return 0.0
+    
+    def get_cache_stats(self):
+        """응답 캐시 적중 통계 조회 (캐시 미사용 시 None)"""
+        return self.cache.stats() if self.cache is not None else None
+    
+    def analyze_chat(self, data, analysis_type, target_user="전체", detailed=False, include_context=True,
+                     full_history=False, sample_size=None):
+        """채팅 데이터를 분석 (full_history=True이면 전체 기록을 구간별 요약 후 종합)
+        
+        sample_size는 분석할 대표 메시지 수이며, 지정하지 않으면 500개(상세 분석은 800개)입니다.
+        """
+        
+        if full_history:
+            return self.analyze_chat_map_reduce(data, analysis_type, target_user, detailed)
+        
+        data, messages, max_tokens = self._prepare_chat_request(
+            data, analysis_type, target_user, detailed, include_context, sample_size
+        )
+        
+        try:
+            # API 호출 (같은 요청은 캐시된 응답 사용)
+            analysis_result = self._chat_completion(
+                messages, max_tokens=max_tokens, temperature=0.7, analysis_type=analysis_type
+            )
             
             # 결과 구조화 (향상된 버전 사용)
             return self.structure_advanced_results(analysis_result, f"{analysis_type} 분석", data)
@@ -68,36 +496,356 @@ class GPTAnalyzer:
                 "analysis_type": analysis_type
             }
     
-    def generate_prompt(self, data, analysis_type, target_user, include_context=True, detailed=False):
-        """분석 타입에 따른 프롬프트 생성"""
+    def analyze_chat_stream(self, data, analysis_type, target_user="전체", detailed=False, include_context=True,
+                            sample_size=None):
+        """analyze_chat의 스트리밍 버전: 분석 텍스트 조각을 도착하는 대로 yield
+        
+        스트림이 끝나면 구조화된 결과(또는 오류 결과)가 self.last_stream_result에 저장됩니다.
+        """
+        data, messages, max_tokens = self._prepare_chat_request(
+            data, analysis_type, target_user, detailed, include_context, sample_size
+        )
+        yield from self._stream_and_structure(
+            messages, max_tokens, f"{analysis_type} 분석", data, {"analysis_type": analysis_type}, analysis_type
+        )
+    
+    def analyze_chat_incremental(self, data, analysis_type, previous=None, target_user="전체", detailed=False,
+                                 include_context=True, room_stats=None):
+        """이전 분석 결과 이후의 새 메시지만 분석해 이전 결과와 합친 분석
+        
+        previous는 DatabaseManager.get_latest_analysis 결과(summary, last_message_ts, last_message_id 등)이며,
+        data 중 last_message_id보다 나중에 저장된 메시지(data에 id 컬럼이 없거나 이전 버전 결과이면
+        last_message_ts보다 늦은 메시지)와 이전 요약만 프롬프트에 담으므로 요청 크기가
+        새 대화량에 비례합니다. previous가 없으면 analyze_chat과 같습니다.
+        room_stats(DatabaseManager.get_room_user_statistics 결과)를 주면 분석 개요의 메시지 수/기간/참여자를
+        채팅방 전체 기준으로 쓰고, 없으면 새 대화 기준임을 표시합니다.
+        결과의 incremental에 새 메시지 수와 합쳐진 결과의 마지막 메시지 시각(epoch 초)/ID를 담습니다.
+        """
+        has_ids = 'id' in data.columns
+        if not previous or previous.get('last_message_ts') is None:
+            result = self.analyze_chat(data, analysis_type, target_user, detailed, include_context)
+            if not result.get('error') and not data.empty:
+                result["incremental"] = {
+                    "previous_id": None,
+                    "new_messages": len(data),
+                    "last_message_ts": int(data['datetime'].max().value // 10**9),
+                    "last_message_id": int(data['id'].max()) if has_ids else None,
+                }
+            return result
         
-        # 데이터 요약
-        if include_context:
-            messages_text = "\n".join([
-                f"[{row['datetime'].strftime('%Y-%m-%d %H:%M')}] {row['user']}: {row['message']}"
-                for _, row in data.iterrows()
-            ])
+        # 같은 분(초)에 나중에 추가된 메시지도 놓치지 않도록 가능하면 메시지 ID로 구분
+        watermark = pd.Timestamp(previous['last_message_ts'], unit='s')
+        if has_ids and previous.get('last_message_id') is not None:
+            data = data[data['id'] > previous['last_message_id']]
         else:
-            messages_text = "\n".join([
-                f"{row['user']}: {row['message']}"
-                for _, row in data.iterrows()
-            ])
+            data = data[data['datetime'] > watermark]
+        if target_user != "전체":
+            data = data[data['user'] == target_user]
+        
+        incremental = {"previous_id": previous.get('id'), "new_messages": len(data),
+                       "last_message_ts": previous['last_message_ts'],
+                       "last_message_id": previous.get('last_message_id')}
+        
+        # 새 메시지가 없으면 API 호출 없이 이전 결과 그대로 반환
+        if data.empty:
+            return {
+                "summary": previous.get('summary', ''),
+                "keywords": previous.get('keywords', []),
+                "insights": previous.get('insights', []),
+                "recommendations": previous.get('recommendations', []),
+                "analysis_type": f"{analysis_type} 분석",
+                "incremental": incremental,
+            }
+        
+        incremental["last_message_ts"] = max(int(data['datetime'].max().value // 10**9), previous['last_message_ts'])
+        if has_ids:
+            incremental["last_message_id"] = int(data['id'].max())
+        sample = self.sampler.sample(data, 800 if detailed else 500)
+        transcript = self.pack_messages(sample, include_context, detailed)
+        messages_text = f"""(이전 분석 결과와 그 이후 새로 추가된 대화입니다. 이전 분석을 바탕으로 새 대화의 변화를 반영해 갱신된 전체 분석을 작성해주세요)
+
+### 이전 분석 결과 ({watermark.strftime('%Y-%m-%d %H:%M')}까지의 대화 기준)
+{previous.get('summary', '')}
+
+### 이후 새 대화 ({data['datetime'].min().strftime('%Y-%m-%d %H:%M')} ~ {data['datetime'].max().strftime('%Y-%m-%d %H:%M')}, 메시지 {len(data):,}개)
+{transcript}
+"""
+        overview = self._room_overview(room_stats, target_user) if room_stats else None
+        if overview is None:
+            overview = self._data_overview(data, label="이전 분석 이후 새 대화 기준")
+        prompt = self.generate_prompt(data, analysis_type, target_user, include_context, detailed, messages_text, overview)
+        
+        try:
+            analysis_result = self._chat_completion(
+                [
+                    {"role": "system", "content": "당신은 카카오톡 채팅 분석 전문가입니다. 주어진 채팅 데이터를 분석하여 유용한 인사이트를 제공해주세요. 한국어로 자세하고 구체적으로 답변해주세요."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=3000 if detailed else 2000, temperature=0.7, analysis_type=f"{analysis_type} (증분)"
+            )
+        except Exception as e:
+            return {
+                "summary": f"분석 중 오류가 발생했습니다: {str(e)}",
+                "error": True,
+                "analysis_type": analysis_type
+            }
+        
+        result = self.structure_advanced_results(analysis_result, f"{analysis_type} 분석", data)
+        result["incremental"] = incremental
+        return result
+    
+    def _prepare_chat_request(self, data, analysis_type, target_user, detailed, include_context, sample_size=None):
+        """analyze_chat용 데이터 필터링과 요청 메시지 구성 (반환값: 데이터, 메시지, 최대 토큰)"""
+        # 데이터 전처리
+        if target_user != "전체":
+            data = data[data['user'] == target_user]
+        
+        # 메시지가 너무 많으면 기간/사용자별 대표 메시지로 제한
+        default_size = 800 if detailed else 500
+        sample_size = sample_size or default_size
+        data = self.sampler.sample(data, sample_size)
+        
+        # 기본보다 많이 고르면 고른 메시지가 모두 대화록에 담기도록 토큰 예산을 늘림
+        token_budget = None
+        if sample_size > default_size:
+            line_costs = self.packer.estimate_tokens(data['message']) + self.packer.LINE_OVERHEAD
+            days = data['datetime'].dt.normalize().nunique()
+            token_budget = max(int(line_costs.sum()) + days * self.packer.HEADER_TOKENS,
+                               self._transcript_budget(detailed))
+        
+        # 분석 타입별 프롬프트 생성
+        prompt = self.generate_prompt(
+            data, analysis_type, target_user, include_context, detailed, token_budget=token_budget
+        )
+        messages = [
+            {"role": "system", "content": "당신은 카카오톡 채팅 분석 전문가입니다. 주어진 채팅 데이터를 분석하여 유용한 인사이트를 제공해주세요. 한국어로 자세하고 구체적으로 답변해주세요."},
+            {"role": "user", "content": prompt}
+        ]
+        return data, messages, 3000 if detailed else 2000
+    
+    def _transcript_budget(self, detailed=False):
+        """프롬프트에 담을 대화록의 기본 토큰 예산 (상세 분석은 1.5배)"""
+        return int(self.token_budget * 1.5) if detailed else self.token_budget
+    
+    def pack_messages(self, data, include_context=True, detailed=False, priority=None, token_budget=None):
+        """토큰 예산 안에서 우선순위가 높은 메시지로 대화록 생성 (약칭 안내 포함)
+        
+        priority를 지정하지 않으면 MessageSampler가 고른 대표 메시지 순서를 사용하고,
+        token_budget을 지정하지 않으면 기본 대화록 예산을 사용합니다.
+        """
+        token_budget = token_budget or self._transcript_budget(detailed)
+        if priority is None:
+            # 예산에 들어갈 수 있는 최대 줄 수만큼만 순위 계산
+            priority = self.sampler.rank(data, token_budget // (self.packer.LINE_OVERHEAD + 1))
+        transcript, legend, _ = self.packer.pack(data, priority, include_context, token_budget)
+        
+        if not legend:
+            return transcript
+        return f"(참여자 약칭: {legend})\n{transcript}"
+    
+    def analyze_chat_map_reduce(self, data, analysis_type, target_user="전체", detailed=False, chunk_tokens=3000,
+                                concurrency=8, requests_per_minute=500, tokens_per_minute=200000, max_retries=5):
+        """전체 채팅 기록을 구간별로 요약(map)한 뒤 요약들을 종합(reduce)해 분석
+        
+        대화 흐름 경계에 맞춘 chunk_tokens 크기 구간을 동시에 요약하고, 구간 요약은 내용 해시로
+        캐시하므로 새 메시지가 추가된 뒤 다시 실행하면 바뀐 구간만 새로 요약합니다.
+        요약이 한 번에 담기지 않으면 여러 단계로 합친 후 분석 유형별 프롬프트로 최종 분석합니다.
+        """
+        if target_user != "전체":
+            data = data[data['user'] == target_user]
+        
+        if data.empty:
+            return {
+                "summary": "분석할 메시지가 없습니다.",
+                "error": True,
+                "analysis_type": analysis_type
+            }
+        
+        try:
+            analysis_result, stats = self._run_async(self._map_reduce_async(
+                data, analysis_type, target_user, detailed, chunk_tokens,
+                concurrency, requests_per_minute, tokens_per_minute, max_retries
+            ))
+        except Exception as e:
+            return {
+                "summary": f"분석 중 오류가 발생했습니다: {str(e)}",
+                "error": True,
+                "analysis_type": analysis_type
+            }
+        
+        result = self.structure_advanced_results(analysis_result, f"{analysis_type} 분석", data)
+        result["map_reduce"] = stats
+        return result
+    
+    async def _map_reduce_async(self, data, analysis_type, target_user, detailed, chunk_tokens,
+                                concurrency, requests_per_minute, tokens_per_minute, max_retries):
+        """구간 요약 → 단계별 병합 → 최종 분석 (결과 텍스트와 통계 반환)"""
+        data = data.sort_values('datetime', kind='stable')
+        chunks = self.packer.split_chunks(data, chunk_tokens)
+        stats = {"chunks": len(chunks), "summarized": 0, "cached": 0, "reduce_levels": 0, "retries": 0}
+        
+        bucket = AsyncTokenBucket(requests_per_minute, tokens_per_minute)
+        semaphore = asyncio.Semaphore(concurrency)
+        client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        
+        async def summarize(prompt):
+            request = [
+                {"role": "system", "content": "당신은 카카오톡 채팅 요약 전문가입니다. 이후 다른 구간과 합쳐 분석할 수 있도록 사실 위주로 한국어로 요약해주세요."},
+                {"role": "user", "content": prompt}
+            ]
+            
+            # 같은 내용의 구간은 이전 요약 재사용
+            started = time.time()
+            _, cached = self._cache_lookup(request, 600, 0.3, True, self.summary_cache)
+            if cached is not None:
+                stats["cached"] += 1
+                self._record_call("구간 요약", started, cache_hit=True)
+                return cached
+            
+            async with semaphore:
+                summary = await self._complete_with_retry(
+                    client, request, 600, 0.3, bucket, max_retries, stats, use_cache=False, cache=self.summary_cache,
+                    analysis_type="구간 요약"
+                )
+            stats["summarized"] += 1
+            return summary
+        
+        async def summarize_chunk(index):
+            chunk = data.loc[index]
+            transcript, legend, _ = self.packer.pack(chunk, chunk.index, True, chunk_tokens * 2)
+            start, end = chunk['datetime'].iloc[0], chunk['datetime'].iloc[-1]
+            summary = await summarize(f"""
+다음은 카카오톡 채팅방의 한 구간({start.strftime('%Y-%m-%d %H:%M')} ~ {end.strftime('%Y-%m-%d %H:%M')}, 메시지 {len(chunk):,}개)입니다.
+(참여자 약칭: {legend})
+
+{transcript}
+
+이 구간을 요약해주세요. 약칭 대신 실제 이름을 사용하세요:
+- 주요 대화 주제와 흐름
+- 참여자별 주요 발언과 태도
+- 분위기와 감정 변화
+- 결정사항, 공지, 중요한 정보
+- 자주 등장한 키워드
+""")
+            return start, end, summary
+        
+        async def merge(group):
+            sections = "\n\n".join(self._format_section(start, end, summary) for start, end, summary in group)
+            summary = await summarize(f"""
+다음은 카카오톡 채팅방의 연속된 구간별 요약입니다:
+
+{sections}
+
+위 요약들을 시간 흐름이 드러나도록 하나의 요약으로 합쳐주세요 (주제, 참여자별 특징, 분위기 변화, 중요한 정보, 키워드).
+""")
+            return group[0][0], group[-1][1], summary
+        
+        try:
+            sections = list(await asyncio.gather(*(summarize_chunk(index) for index in chunks)))
+            
+            # 최종 프롬프트에 담길 때까지 인접 요약을 묶어 단계별로 병합
+            reduce_budget = self._transcript_budget(detailed)
+            while len(sections) > 1 and self._sections_tokens(sections) > reduce_budget:
+                groups = self._group_sections(sections, reduce_budget)
+                sections = list(await asyncio.gather(*(merge(group) for group in groups)))
+                stats["reduce_levels"] += 1
+            
+            messages_text = "(전체 대화 기록을 구간별로 요약한 내용입니다)\n\n" + "\n\n".join(
+                self._format_section(start, end, summary) for start, end, summary in sections
+            )
+            prompt = self.generate_prompt(data, analysis_type, target_user, True, detailed, messages_text)
+            
+            analysis_result = await self._complete_with_retry(
+                client,
+                [
+                    {"role": "system", "content": "당신은 카카오톡 채팅 분석 전문가입니다. 주어진 채팅 데이터를 분석하여 유용한 인사이트를 제공해주세요. 한국어로 자세하고 구체적으로 답변해주세요."},
+                    {"role": "user", "content": prompt}
+                ],
+                3000 if detailed else 2000, 0.7, bucket, max_retries, stats,
+                analysis_type=f"{analysis_type} (전체 기록)"
+            )
+        finally:
+            await client.close()
         
-        # 토큰 제한 조정
-        max_chars = 6000 if detailed else 4000
-        if len(messages_text) > max_chars:
-            messages_text = messages_text[:max_chars] + "\n... (더 많은 메시지가 있습니다)"
+        return analysis_result, stats
+    
+    def _format_section(self, start, end, summary):
+        """구간 요약 한 개를 기간 머리글과 함께 문자열로 변환"""
+        return f"### {start.strftime('%Y-%m-%d %H:%M')} ~ {end.strftime('%Y-%m-%d %H:%M')}\n{summary}"
+    
+    def _sections_tokens(self, sections):
+        """구간 요약 목록의 전체 토큰 수"""
+        return sum(self.packer.count_tokens(self._format_section(*section)) for section in sections)
+    
+    def _group_sections(self, sections, token_budget):
+        """인접한 구간 요약을 토큰 예산 단위로 묶기 (각 묶음은 2개 이상이 되도록)"""
+        groups = [[]]
+        group_tokens = 0
+        for section in sections:
+            tokens = self.packer.count_tokens(self._format_section(*section))
+            if len(groups[-1]) >= 2 and group_tokens + tokens > token_budget:
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(section)
+            group_tokens += tokens
+        
+        # 마지막 묶음이 하나뿐이면 앞 묶음에 합침
+        if len(groups) > 1 and len(groups[-1]) == 1:
+            groups[-2].extend(groups.pop())
+        return groups
+    
+    def _data_overview(self, data, label=None):
+        """프롬프트 분석 개요용 통계 (메시지 수, 참여자 수, 기간, 메시지가 많은 참여자 3명)"""
+        return {
+            "label": label,
+            "message_count": len(data),
+            "participant_count": data['user'].nunique(),
+            "first_message": data['datetime'].min(),
+            "last_message": data['datetime'].max(),
+            "top_users": data['user'].value_counts().head(3).to_dict(),
+        }
+    
+    def _room_overview(self, room_stats, target_user="전체"):
+        """DatabaseManager.get_room_user_statistics 결과로 만든 채팅방 전체 기준 분석 개요 (없으면 None)"""
+        if target_user != "전체":
+            room_stats = {user: stats for user, stats in room_stats.items() if user == target_user}
+        if not room_stats:
+            return None
+        
+        counts = pd.Series({user: stats['message_count'] for user, stats in room_stats.items()})
+        return {
+            "label": "채팅방 전체 기준",
+            "message_count": int(counts.sum()),
+            "participant_count": len(counts),
+            "first_message": pd.Series([stats['first_message'] for stats in room_stats.values()]).min(),
+            "last_message": pd.Series([stats['last_message'] for stats in room_stats.values()]).max(),
+            "top_users": counts.sort_values(ascending=False, kind='stable').head(3).to_dict(),
+        }
+    
+    def generate_prompt(self, data, analysis_type, target_user, include_context=True, detailed=False, messages_text=None,
+                        overview=None, token_budget=None):
+        """분석 타입에 따른 프롬프트 생성
+        
+        messages_text를 주면 대화록 대신 사용하고, overview(_data_overview 형식)를 주면 data 대신
+        그 통계를 분석 개요에 사용합니다. token_budget은 대화록의 토큰 예산입니다 (pack_messages 참고).
+        """
+        
+        # 데이터 요약 (토큰 예산 안에서 대표 메시지 우선)
+        if messages_text is None:
+            messages_text = self.pack_messages(data, include_context, detailed, token_budget=token_budget)
+        if overview is None:
+            overview = self._data_overview(data)
         
         # 사용자별 통계
-        user_stats = data['user'].value_counts().head(3).to_dict()
-        stats_text = "\n".join([f"- {user}: {count}개 메시지" for user, count in user_stats.items()])
+        stats_text = "\n".join([f"- {user}: {count}개 메시지" for user, count in overview['top_users'].items()])
+        label = f" ({overview['label']})" if overview.get('label') else ""
         
         base_info = f"""
-📊 **분석 개요:**
+📊 **분석 개요{label}:**
 - 분석 대상: {target_user}
-- 총 메시지 수: {len(data):,}개
-- 참여자 수: {data['user'].nunique()}명
-- 분석 기간: {data['datetime'].min().strftime('%Y-%m-%d')} ~ {data['datetime'].max().strftime('%Y-%m-%d')}
+- 총 메시지 수: {overview['message_count']:,}개
+- 참여자 수: {overview['participant_count']}명
+- 분석 기간: {overview['first_message'].strftime('%Y-%m-%d')} ~ {overview['last_message'].strftime('%Y-%m-%d')}
 
 👥 **주요 참여자:**
 {stats_text}
@@ -245,18 +993,70 @@ class GPTAnalyzer:
         
         return keywords[:10]  # 상위 10개만 반환
     
-    def analyze_sentiment_batch(self, messages):
-        """메시지 일괄 감정 분석"""
+    def analyze_sentiment_batch(self, messages, batch_size=20, concurrency=8, requests_per_minute=500,
+                                tokens_per_minute=200000, max_retries=5, use_lexicon=True):
+        """메시지 일괄 감정 분석
+        
+        use_lexicon=True이면 감정 사전으로 확실한 메시지(ㅋㅋ, ㅠㅠ, 감사합니다, 짧은 대답 등)를 먼저
+        분류하고 나머지만 API로 보냅니다. batch_size개씩 묶은 요청을 최대 concurrency개까지 동시에 보내고,
+        분당 요청/토큰 한도를 지키며 429/5xx 오류는 지수 백오프로 재시도합니다. 결과는 입력 순서와 같은
+        길이의 '긍정'/'부정'/'중립' 목록이며, 끝내 실패한 배치의 메시지는 '중립'으로 채우고
+        self.last_sentiment_stats에 기록합니다 (사전 분류 비율은 lexicon_ratio).
+        """
+        return self._run_async(self.analyze_sentiment_batch_async(
+            messages, batch_size, concurrency, requests_per_minute, tokens_per_minute, max_retries, use_lexicon
+        ))
+    
+    async def analyze_sentiment_batch_async(self, messages, batch_size=20, concurrency=8, requests_per_minute=500,
+                                            tokens_per_minute=200000, max_retries=5, use_lexicon=True):
+        """analyze_sentiment_batch의 비동기 버전"""
+        messages = list(messages)
+        
+        # 사전으로 분류되지 않은 메시지만 API로 보냄
+        labels = self.lexicon.classify(messages).tolist() if use_lexicon else [None] * len(messages)
+        pending = [i for i, label in enumerate(labels) if label is None]
+        api_messages = [messages[i] for i in pending]
+        
+        batches = [api_messages[i:i + batch_size] for i in range(0, len(api_messages), batch_size)]
+        stats = {
+            "messages": len(messages),
+            "lexicon_labeled": len(messages) - len(pending),
+            "lexicon_ratio": (len(messages) - len(pending)) / len(messages) if messages else 0.0,
+            "batches": len(batches),
+            "retries": 0,
+            "misaligned_responses": 0,
+            "failed_batches": 0,
+        }
         
-        # 메시지를 적절한 크기로 묶어서 분석
-        batch_size = 20
-        results = []
+        bucket = AsyncTokenBucket(requests_per_minute, tokens_per_minute)
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.time()
         
-        for i in range(0, len(messages), batch_size):
-            batch = messages[i:i+batch_size]
-            batch_text = "\n".join([f"{idx}: {msg}" for idx, msg in enumerate(batch)])
-            
-            prompt = f"""
+        # 재시도는 직접 처리하므로 클라이언트 자체 재시도는 끔
+        client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        
+        async def run(batch):
+            async with semaphore:
+                return await self._classify_sentiment_batch(client, batch, bucket, max_retries, stats)
+        
+        try:
+            batch_results = await asyncio.gather(*(run(batch) for batch in batches))
+        finally:
+            await client.close()
+        
+        stats["elapsed"] = time.time() - started
+        self.last_sentiment_stats = stats
+        
+        api_labels = [label for batch_labels in batch_results for label in batch_labels]
+        for i, label in zip(pending, api_labels):
+            labels[i] = label
+        return labels
+    
+    async def _classify_sentiment_batch(self, client, batch, bucket, max_retries, stats):
+        """배치 하나의 감정 분류 (응답 번호가 입력과 맞지 않으면 재요청)"""
+        batch_text = "\n".join([f"{idx}: {msg}" for idx, msg in enumerate(batch)])
+        
+        prompt = f"""
 다음 메시지들의 감정을 분석해서 각각에 대해 '긍정', '부정', '중립' 중 하나로 분류해주세요:
 
 {batch_text}
@@ -267,26 +1067,41 @@ class GPTAnalyzer:
 2: 부정
 ...
 """
-            
+        request = [
+            {"role": "system", "content": "당신은 텍스트 감정 분석 전문가입니다."},
+            {"role": "user", "content": prompt}
+        ]
+        
+        labels = [None] * len(batch)
+        for attempt in range(max_retries + 1):
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "당신은 텍스트 감정 분석 전문가입니다."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=500,
-                    temperature=0.3
+                response_text = await self._complete_with_retry(
+                    client, request, 500, 0.3, bucket, max_retries, stats,
+                    use_cache=None if attempt == 0 else False, analysis_type="감정 분류"
                 )
-                
-                batch_results = self.parse_sentiment_results(response.choices[0].message.content)
-                results.extend(batch_results)
-                
-            except:
-                # 오류 시 중립으로 처리
-                results.extend(['중립'] * len(batch))
+            except Exception as e:
+                print(f"감정 분석 요청 실패: {str(e)}")
+                break
+            
+            labels = self.parse_indexed_sentiments(response_text, len(batch))
+            if None not in labels:
+                return labels
+            stats["misaligned_responses"] += 1
+        
+        # 재시도 후에도 채우지 못한 메시지는 중립으로 처리
+        stats["failed_batches"] += 1
+        return [label or '중립' for label in labels]
+    
+    def parse_indexed_sentiments(self, text, count):
+        """'번호: 감정' 형식의 응답을 입력 순서대로 파싱 (누락된 번호는 None)"""
+        labels = [None] * count
         
-        return results
+        for match in re.finditer(r'^\s*(\d+)\s*[:.)]\s*(긍정|부정|중립)', text or '', re.MULTILINE):
+            idx = int(match.group(1))
+            if idx < count:
+                labels[idx] = match.group(2)
+        
+        return labels
     
     def parse_sentiment_results(self, text):
         """감정 분석 결과 파싱"""
@@ -301,40 +1116,22 @@ class GPTAnalyzer:
         
         return sentiments 
     
-    def analyze_chat_with_custom_prompt(self, data, custom_prompt, target_user="전체", detailed=False, include_context=True):
-        """커스텀 프롬프트로 채팅 데이터 분석"""
+    def analyze_chat_with_custom_prompt(self, data, custom_prompt, target_user="전체", detailed=False, include_context=True,
+                                        room_id=None, db_manager=None):
+        """커스텀 프롬프트로 채팅 데이터 분석
         
-        # 데이터 전처리
-        if target_user != "전체" and target_user != "비교 분석":
-            data = data[data['user'] == target_user]
+        room_id와 db_manager를 주면 관련 메시지를 채팅방의 저장된 검색 인덱스에서 찾습니다.
+        """
         
-        # 메시지가 너무 많으면 샘플링
-        if len(data) > 1000:
-            if detailed:
-                # 상세 분석 시에는 더 많은 데이터 사용
-                data = data.tail(800)
-            else:
-                data = data.tail(500)
-        
-        # 프롬프트 생성
-        full_prompt = self.generate_custom_prompt(data, custom_prompt, include_context, detailed)
+        data, messages, max_tokens = self._prepare_custom_request(
+            data, custom_prompt, target_user, detailed, include_context, room_id, db_manager
+        )
         
         try:
-            # 토큰 수에 따라 모델 선택
-            max_tokens = 3000 if detailed else 2000
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "당신은 카카오톡 채팅 분석 전문가입니다. 주어진 채팅 데이터를 정확하고 통찰력 있게 분석하여 유용한 인사이트를 제공해주세요. 한국어로 자세하고 구체적으로 답변해주세요."},
-                    {"role": "user", "content": full_prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=0.7
+            analysis_result = self._chat_completion(
+                messages, max_tokens=max_tokens, temperature=0.7, analysis_type="커스텀 분석"
             )
             
-            analysis_result = response.choices[0].message.content
-            
             # 결과 구조화 (향상된 버전)
             return self.structure_advanced_results(analysis_result, custom_prompt, data)
             
@@ -345,8 +1142,102 @@ class GPTAnalyzer:
                 "analysis_mode": "커스텀 분석"
             }
     
-    def generate_custom_prompt(self, data, custom_prompt, include_context=True, detailed=False):
-        """커스텀 프롬프트 생성"""
+    def analyze_chat_with_custom_prompt_stream(self, data, custom_prompt, target_user="전체", detailed=False,
+                                               include_context=True, room_id=None, db_manager=None):
+        """analyze_chat_with_custom_prompt의 스트리밍 버전 (완료 후 결과는 self.last_stream_result)"""
+        data, messages, max_tokens = self._prepare_custom_request(
+            data, custom_prompt, target_user, detailed, include_context, room_id, db_manager
+        )
+        yield from self._stream_and_structure(
+            messages, max_tokens, custom_prompt, data, {"analysis_mode": "커스텀 분석"}, "커스텀 분석"
+        )
+    
+    def _prepare_custom_request(self, data, custom_prompt, target_user, detailed, include_context,
+                                room_id=None, db_manager=None):
+        """커스텀 분석용 데이터 필터링과 요청 메시지 구성 (반환값: 데이터, 메시지, 최대 토큰)"""
+        # 데이터 전처리
+        if target_user != "전체" and target_user != "비교 분석":
+            data = data[data['user'] == target_user]
+        
+        # 메시지가 너무 많으면 질문과 관련된 메시지를 전체 기록에서 검색해 우선 포함하고,
+        # 나머지는 기간/사용자별 대표 메시지로 채움 (상세 분석 시에는 더 많은 데이터 사용)
+        priority = None
+        if len(data) > 1000:
+            limit = 800 if detailed else 500
+            relevant = self.retrieve_relevant(data, custom_prompt, limit // 2, room_id, db_manager)
+            representative = self.sampler.rank(data.drop(relevant), limit - len(relevant))
+            priority = relevant.append(representative)
+            data = data.loc[priority].sort_values('datetime', kind='stable')
+        
+        # 프롬프트 생성
+        full_prompt = self.generate_custom_prompt(data, custom_prompt, include_context, detailed, priority)
+        messages = [
+            {"role": "system", "content": "당신은 카카오톡 채팅 분석 전문가입니다. 주어진 채팅 데이터를 정확하고 통찰력 있게 분석하여 유용한 인사이트를 제공해주세요. 한국어로 자세하고 구체적으로 답변해주세요."},
+            {"role": "user", "content": full_prompt}
+        ]
+        return data, messages, 3000 if detailed else 2000
+    
+    def retrieve_relevant(self, data, query, k=250, room_id=None, db_manager=None):
+        """질의와 내용이 비슷한 메시지 k개의 인덱스 (관련도 순, 문자 n-gram TF-IDF 검색)
+        
+        db_manager에 검색 인덱스가 있으면 채팅방(room_id)의 저장된 인덱스에서 찾아 data의 행과
+        (시각, 사용자, 메시지)로 맞추고, 맞는 행이 없으면 data로 메모리 인덱스를 만들어 검색합니다.
+        """
+        if room_id is not None and db_manager is not None and db_manager.index is not None:
+            relevant = self._retrieve_from_room(data, query, k, room_id, db_manager)
+            if len(relevant):
+                return relevant
+        
+        positions, _ = self._get_retrieval_index(data).search(query, k)
+        return data.index[positions]
+    
+    def _retrieve_from_room(self, data, query, k, room_id, db_manager):
+        """채팅방의 저장된 검색 인덱스 결과 중 data에 있는 메시지의 인덱스 (최대 k개, 관련도 순)"""
+        # data가 기간/사용자로 걸러졌을 수 있으므로 넉넉히 조회
+        found = db_manager.retrieve_messages(room_id, query, k * 4)
+        if found.empty:
+            return data.index[:0]
+        
+        keys = ['datetime', 'user', 'message']
+        rows = pd.DataFrame({
+            'row': data.index,
+            'datetime': data['datetime'].to_numpy(dtype='datetime64[ns]'),
+            'user': data['user'].astype(object).to_numpy(),
+            'message': data['message'].astype(object).to_numpy(),
+        })
+        found = found[keys].assign(
+            rank=np.arange(len(found)),
+            datetime=found['datetime'].to_numpy(dtype='datetime64[ns]'),
+            user=found['user'].astype(object),
+            message=found['message'].astype(object),
+        )
+        matched = found.merge(rows, on=keys).sort_values('rank', kind='stable').drop_duplicates('row')
+        return pd.Index(matched['row'].to_numpy()[:k])
+    
+    def _get_retrieval_index(self, data):
+        """data 메시지의 메모리 검색 인덱스 (내용이 같은 데이터면 이전에 만든 인덱스 재사용)"""
+        columns = [col for col in ['datetime', 'user', 'message'] if col in data.columns]
+        digest = hashlib.blake2b(
+            pd.util.hash_pandas_object(data[columns], index=False).to_numpy().tobytes(), digest_size=16
+        ).hexdigest()
+        
+        with GPTAnalyzer._retrieval_cache_lock:
+            index = GPTAnalyzer._retrieval_cache.get(digest)
+            if index is not None:
+                GPTAnalyzer._retrieval_cache.move_to_end(digest)
+                return index
+        
+        index = VectorIndex()
+        index.add(np.arange(len(data)), data['message'])
+        
+        with GPTAnalyzer._retrieval_cache_lock:
+            GPTAnalyzer._retrieval_cache[digest] = index
+            while len(GPTAnalyzer._retrieval_cache) > self.RETRIEVAL_CACHE_SIZE:
+                GPTAnalyzer._retrieval_cache.popitem(last=False)
+        return index
+    
+    def generate_custom_prompt(self, data, custom_prompt, include_context=True, detailed=False, priority=None):
+        """커스텀 프롬프트 생성 (priority는 대화록에 먼저 담을 메시지 인덱스 순서)"""
         
         # 데이터 요약 정보
         total_messages = len(data)
@@ -357,24 +1248,8 @@ class GPTAnalyzer:
         user_stats = data['user'].value_counts().head(5).to_dict()
         stats_text = "\n".join([f"- {user}: {count}개 메시지" for user, count in user_stats.items()])
         
-        # 메시지 텍스트 준비
-        if include_context:
-            # 시간 순서와 대화 맥락 포함
-            messages_text = "\n".join([
-                f"[{row['datetime'].strftime('%m-%d %H:%M')}] {row['user']}: {row['message']}"
-                for _, row in data.iterrows()
-            ])
-        else:
-            # 단순 메시지만
-            messages_text = "\n".join([
-                f"{row['user']}: {row['message']}"
-                for _, row in data.iterrows()
-            ])
-        
-        # 토큰 제한 (detailed 모드에 따라 조정)
-        max_chars = 6000 if detailed else 4000
-        if len(messages_text) > max_chars:
-            messages_text = messages_text[:max_chars] + "\n... (메시지가 더 있습니다)"
+        # 메시지 텍스트 준비 (include_context면 날짜/시각 포함, 토큰 예산은 detailed 모드에 따라 조정)
+        messages_text = self.pack_messages(data, include_context, detailed, priority)
         
         base_info = f"""
 📊 **데이터 개요:**
@@ -537,17 +1412,15 @@ class GPTAnalyzer:
 """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            analysis_result = self._chat_completion(
                 messages=[
                     {"role": "system", "content": "당신은 주제별 채팅 분석 전문가입니다. 특정 주제에 대한 대화 내용을 심층 분석해주세요."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=2500,
-                temperature=0.7
+                temperature=0.7,
+                analysis_type=analysis_type
             )
-            
-            analysis_result = response.choices[0].message.content
             return self.structure_advanced_results(analysis_result, f"{topic} 분석", topic_data)
             
         except Exception as e:
@@ -562,13 +1435,91 @@ class GPTAnalyzer:
         user_data = data[data['user'] == user]
         
         if len(user_data) == 0:
-            return {
-                "summary": f"'{user}' 사용자의 메시지를 찾을 수 없습니다.",
-                "keywords": [],
-                "insights": [],
-                "analysis_type": f"{user} 분석"
-            }
+            return self._missing_user_result(user)
+        
+        try:
+            analysis_result = self._chat_completion(
+                messages=self._user_profile_request(user, user_data),
+                max_tokens=2500,
+                temperature=0.7,
+                analysis_type=analysis_type
+            )
+            return self.structure_advanced_results(analysis_result, f"{user} 분석", user_data)
+            
+        except Exception as e:
+            return self._user_error_result(user, e)
+    
+    def analyze_users(self, data, users, analysis_type="사용자 분석", concurrency=8, requests_per_minute=500,
+                      tokens_per_minute=200000, max_retries=5):
+        """여러 사용자를 동시에 분석 (반환값: 사용자별 analyze_user 결과 딕셔너리)
+        
+        데이터는 groupby로 한 번만 나누고, 사용자별 요청을 최대 concurrency개까지 동시에 보냅니다.
+        분당 한도와 재시도는 감정 일괄 분석과 같은 방식이며, 통계는 self.last_fanout_stats에 기록합니다.
+        """
+        return self._run_async(self.analyze_users_async(
+            data, users, analysis_type, concurrency, requests_per_minute, tokens_per_minute, max_retries
+        ))
+    
+    async def analyze_users_async(self, data, users, analysis_type="사용자 분석", concurrency=8,
+                                  requests_per_minute=500, tokens_per_minute=200000, max_retries=5):
+        """analyze_users의 비동기 버전"""
+        users = list(dict.fromkeys(users))
+        user_groups = {
+            user: group
+            for user, group in data[data['user'].isin(users)].groupby('user', sort=False, observed=True)
+        }
+        stats = {"users": len(users), "retries": 0, "failed": 0}
+        
+        bucket = AsyncTokenBucket(requests_per_minute, tokens_per_minute)
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.time()
         
+        # 재시도는 직접 처리하므로 클라이언트 자체 재시도는 끔
+        client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        
+        async def profile(user):
+            user_data = user_groups.get(user)
+            if user_data is None:
+                return self._missing_user_result(user)
+            
+            try:
+                async with semaphore:
+                    analysis_result = await self._complete_with_retry(
+                        client, self._user_profile_request(user, user_data), 2500, 0.7, bucket, max_retries, stats,
+                        analysis_type=analysis_type
+                    )
+                return self.structure_advanced_results(analysis_result, f"{user} 분석", user_data)
+            except Exception as e:
+                stats["failed"] += 1
+                return self._user_error_result(user, e)
+        
+        try:
+            results = await asyncio.gather(*(profile(user) for user in users))
+        finally:
+            await client.close()
+        
+        stats["elapsed"] = time.time() - started
+        self.last_fanout_stats = stats
+        
+        return dict(zip(users, results))
+    
+    def _missing_user_result(self, user):
+        return {
+            "summary": f"'{user}' 사용자의 메시지를 찾을 수 없습니다.",
+            "keywords": [],
+            "insights": [],
+            "analysis_type": f"{user} 분석"
+        }
+    
+    def _user_error_result(self, user, error):
+        return {
+            "summary": f"'{user}' 분석 중 오류가 발생했습니다: {str(error)}",
+            "error": True,
+            "analysis_type": f"{user} 분석"
+        }
+    
+    def _user_profile_request(self, user, user_data):
+        """사용자 분석 요청 메시지 구성"""
         # 사용자 통계
         total_messages = len(user_data)
         time_range = f"{user_data['datetime'].min().strftime('%Y-%m-%d')} ~ {user_data['datetime'].max().strftime('%Y-%m-%d')}"
@@ -594,30 +1545,17 @@ class GPTAnalyzer:
 
 한국어로 구체적으로 분석해주세요.
 """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "당신은 사용자 행동 분석 전문가입니다. 개인의 채팅 패턴과 특성을 분석해주세요."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2500,
-                temperature=0.7
-            )
-            
-            analysis_result = response.choices[0].message.content
-            return self.structure_advanced_results(analysis_result, f"{user} 분석", user_data)
-            
-        except Exception as e:
-            return {
-                "summary": f"'{user}' 분석 중 오류가 발생했습니다: {str(e)}",
-                "error": True,
-                "analysis_type": f"{user} 분석"
-            }
+        return [
+            {"role": "system", "content": "당신은 사용자 행동 분석 전문가입니다. 개인의 채팅 패턴과 특성을 분석해주세요."},
+            {"role": "user", "content": prompt}
+        ]
     
-    def compare_users(self, data, users, analysis_type="비교 분석"):
-        """여러 사용자 비교 분석"""
+    def compare_users(self, data, users, analysis_type="비교 분석", fan_out=False, concurrency=8):
+        """여러 사용자 비교 분석
+        
+        fan_out=True이면 사용자별 상세 프로필을 analyze_users로 동시에 만든 뒤,
+        프로필들을 비교하는 최종 요청을 보냅니다 (결과의 user_profiles에 사용자별 결과 포함).
+        """
         if len(users) < 2:
             return {
                 "summary": "비교 분석을 위해서는 최소 2명의 사용자가 필요합니다.",
@@ -626,13 +1564,15 @@ class GPTAnalyzer:
                 "analysis_type": "비교 분석"
             }
         
-        # 각 사용자별 데이터 수집
+        # 각 사용자별 데이터 수집 (groupby로 한 번에 분할)
+        compare_data = data[data['user'].isin(users)]
+        user_groups = dict(list(compare_data.groupby('user', sort=False, observed=True)))
         user_stats = {}
         user_messages = {}
         
         for user in users:
-            user_data = data[data['user'] == user]
-            if len(user_data) > 0:
+            user_data = user_groups.get(user)
+            if user_data is not None:
                 user_stats[user] = {
                     "message_count": len(user_data),
                     "avg_length": user_data['message'].str.len().mean(),
@@ -646,12 +1586,22 @@ class GPTAnalyzer:
             for user, stats in user_stats.items()
         ])
         
-        # 메시지 샘플 생성
-        messages_text = ""
-        for user, messages in user_messages.items():
-            messages_text += f"\n### {user}의 최근 메시지:\n"
-            messages_text += "\n".join([f"- {row['message']}" for _, row in messages.iterrows()])
-            messages_text += "\n"
+        profiles = None
+        if fan_out:
+            # 사용자별 상세 프로필을 동시에 생성해 메시지 샘플 대신 사용
+            profiles = self.analyze_users(compare_data, list(user_stats), concurrency=concurrency)
+            samples_title = "사용자별 프로필 분석"
+            messages_text = ""
+            for user, profile in profiles.items():
+                messages_text += f"\n### {user}의 프로필:\n{profile['summary']}\n"
+        else:
+            # 메시지 샘플 생성
+            samples_title = "메시지 샘플"
+            messages_text = ""
+            for user, messages in user_messages.items():
+                messages_text += f"\n### {user}의 최근 메시지:\n"
+                messages_text += "\n".join([f"- {row['message']}" for _, row in messages.iterrows()])
+                messages_text += "\n"
         
         prompt = f"""
 다음 사용자들을 비교 분석해주세요: {', '.join(users)}
@@ -659,7 +1609,7 @@ class GPTAnalyzer:
 📊 기본 통계:
 {stats_text}
 
-📝 메시지 샘플:
+📝 {samples_title}:
 {messages_text}
 
 다음을 비교 분석해주세요:
@@ -673,22 +1623,20 @@ class GPTAnalyzer:
 """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            analysis_result = self._chat_completion(
                 messages=[
                     {"role": "system", "content": "당신은 사용자 비교 분석 전문가입니다. 여러 사용자의 채팅 패턴을 비교하여 각자의 특징과 차이점을 분석해주세요."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=3000,
-                temperature=0.7
+                temperature=0.7,
+                analysis_type=analysis_type
             )
             
-            analysis_result = response.choices[0].message.content
-            
-            # 비교 분석용 데이터 결합
-            compare_data = pd.concat([data[data['user'] == user] for user in users if user in data['user'].values])
-            
-            return self.structure_advanced_results(analysis_result, f"{', '.join(users)} 비교 분석", compare_data)
+            result = self.structure_advanced_results(analysis_result, f"{', '.join(users)} 비교 분석", compare_data)
+            if profiles is not None:
+                result["user_profiles"] = profiles
+            return result
             
         except Exception as e:
             return {
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+from utils.database_manager import ConnectionPool
+
+class LLMCache:
+    """LLM 응답 캐시 (SQLite, 내용 주소 기반)
+
+    키는 모델 + 메시지(시스템/사용자 프롬프트) + 샘플링 파라미터의 SHA-256 해시이며,
+    TTL이 지난 항목과 개수/용량 한도를 넘는 오래 안 쓴 항목(LRU)은 저장 evict_interval번마다 정리됩니다.
+    한도를 넘으면 한도의 EVICT_TARGET 비율까지 줄여 정리가 매번 반복되지 않게 합니다.
+    table을 달리하면 같은 파일 안에서 TTL/한도가 다른 별도 캐시로 사용할 수 있습니다.
+    """
+
+    # 한도 초과 시 줄일 목표 (한도 대비 비율)
+    EVICT_TARGET = 0.9
+
+    def __init__(self, db_path="llm_cache.db", ttl_seconds=7 * 24 * 3600, max_entries=5000,
+                 max_bytes=50 * 1024 * 1024, table="llm_cache", evict_interval=100):
+        self.db_path = db_path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_interval = max(1, evict_interval)
+        self._writes = 0
+        self.pool = ConnectionPool.for_path(db_path)
+        self.init_database()
+
+    def init_database(self):
+        """캐시 테이블 생성"""
+        conn = self.pool.get()
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        ''')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{self.table}_last_accessed ON {self.table} (last_accessed)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{self.table}_created_at ON {self.table} (created_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.commit()
+
+    @staticmethod
+    def make_key(model, messages, **params):
+        """모델, 메시지, 샘플링 파라미터로 캐시 키 생성"""
+        content = json.dumps(
+            {'model': model, 'messages': messages, 'params': params},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """캐시된 응답 조회 (없거나 만료되면 None)"""
+        conn = self.pool.get()
+        now = time.time()
+
+        try:
+            row = conn.execute(
+                f'SELECT response, created_at FROM {self.table} WHERE cache_key = ?', (key,)
+            ).fetchone()
+
+            if row is not None and now - row[1] <= self.ttl_seconds:
+                conn.execute(f'''
+                    UPDATE {self.table} SET hit_count = hit_count + 1, last_accessed = ?
+                    WHERE cache_key = ?
+                ''', (now, key))
+                self._increment(conn, 'hits')
+                conn.commit()
+                return row[0]
+
+            if row is not None:
+                conn.execute(f'DELETE FROM {self.table} WHERE cache_key = ?', (key,))
+            self._increment(conn, 'misses')
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"LLM cache read error: {e}")
+
+        return None
+
+    def set(self, key, model, response):
+        """응답 저장 후 만료/한도 초과 항목 정리"""
+        if response is None:
+            return
+
+        conn = self.pool.get()
+        now = time.time()
+
+        try:
+            conn.execute(f'''
+                INSERT OR REPLACE INTO {self.table}
+                (cache_key, model, response, size, hit_count, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, 0, ?, ?)
+            ''', (key, model, response, len(response.encode('utf-8')), now, now))
+            # 프로세스의 첫 저장과 이후 evict_interval번마다 정리
+            if self._writes % self.evict_interval == 0:
+                self._evict(conn, now)
+            self._writes += 1
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"LLM cache write error: {e}")
+
+    def _evict(self, conn, now):
+        """TTL 만료 항목과 개수/용량 한도를 넘는 LRU 항목 삭제 (커밋하지 않음)"""
+        cursor = conn.execute(f'DELETE FROM {self.table} WHERE created_at < ?', (now - self.ttl_seconds,))
+        evicted = max(cursor.rowcount, 0)
+
+        # 한도 안이면 정렬이 필요한 LRU 정리 생략
+        entries, size = conn.execute(f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}').fetchone()
+        if entries > self.max_entries or size > self.max_bytes:
+            # 최근 사용 순으로 누적 용량/순위를 계산해 목표치 밖의 항목 삭제
+            cursor = conn.execute(f'''
+                DELETE FROM {self.table} WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key,
+                               SUM(size) OVER (ORDER BY last_accessed DESC, cache_key) AS running_size,
+                               ROW_NUMBER() OVER (ORDER BY last_accessed DESC, cache_key) AS rank
+                        FROM {self.table}
+                    )
+                    WHERE running_size > ? OR rank > ?
+                )
+            ''', (int(self.max_bytes * self.EVICT_TARGET), int(self.max_entries * self.EVICT_TARGET)))
+            evicted += cursor.rowcount
+
+        if evicted > 0:
+            self._increment(conn, 'evictions', evicted)
+
+    def _increment(self, conn, name, amount=1):
+        """통계 카운터 증가 (커밋하지 않음)"""
+        conn.execute('''
+            INSERT INTO llm_cache_stats (name, value) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+        ''', (f"{self.table}.{name}", amount))
+
+    def stats(self):
+        """캐시 적중 통계 조회"""
+        conn = self.pool.get()
+        counters = {
+            name.split('.', 1)[1]: value
+            for name, value in conn.execute(
+                'SELECT name, value FROM llm_cache_stats WHERE name LIKE ?', (f"{self.table}.%",)
+            ).fetchall()
+        }
+        entries, size = conn.execute(f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}').fetchone()
+
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'size_bytes': size
+        }
+
+    def clear(self):
+        """캐시 항목과 통계 초기화"""
+        conn = self.pool.get()
+        conn.execute(f'DELETE FROM {self.table}')
+        conn.execute('DELETE FROM llm_cache_stats WHERE name LIKE ?', (f"{self.table}.%",))
+        conn.commit()
@@ -0,0 +1,148 @@
+import sqlite3
+import time
+import pandas as pd
+
+from utils.database_manager import ConnectionPool
+
+class LLMTelemetry:
+    """LLM API 호출 기록 (SQLite llm_calls 테이블)
+
+    호출(재시도 포함 시도 1회)마다 지연 시간, 토큰 사용량, 재시도 번호, 캐시 적중/동시 호출 병합 여부,
+    오류 클래스를 분석 유형과 함께 저장하고, 지연 시간 백분위수/분석 유형별 토큰/일별 합계 요약을 제공합니다.
+    """
+
+    # 모델별 100만 토큰당 가격 (USD, 입력/출력) - 비용 추정용
+    PRICES = {
+        "gpt-4o-mini": (0.15, 0.60),
+        "gpt-4o": (2.50, 10.00),
+    }
+
+    def __init__(self, db_path="llm_cache.db"):
+        self.db_path = db_path
+        self.pool = ConnectionPool.for_path(db_path)
+        self.init_database()
+
+    def init_database(self):
+        """호출 기록 테이블 생성"""
+        conn = self.pool.get()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                analysis_type TEXT,
+                model TEXT,
+                latency_ms REAL,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                attempt INTEGER NOT NULL DEFAULT 0,
+                cache_hit INTEGER NOT NULL DEFAULT 0,
+                streamed INTEGER NOT NULL DEFAULT 0,
+                coalesced INTEGER NOT NULL DEFAULT 0,
+                error TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_created_at ON llm_calls (created_at)')
+
+        # 병합 여부 컬럼이 없던 기존 테이블 마이그레이션
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(llm_calls)")]
+        if 'coalesced' not in columns:
+            conn.execute('ALTER TABLE llm_calls ADD COLUMN coalesced INTEGER NOT NULL DEFAULT 0')
+        conn.commit()
+
+    def record(self, analysis_type, model, latency_ms, prompt_tokens=0, completion_tokens=0, attempt=0,
+               cache_hit=False, streamed=False, coalesced=False, error=None):
+        """호출 1회 기록 (기록 실패는 분석을 막지 않도록 출력만 함)
+
+        coalesced=True는 진행 중이던 같은 요청의 응답을 함께 받은 호출(API 호출 없음)입니다.
+        """
+        conn = self.pool.get()
+        try:
+            conn.execute('''
+                INSERT INTO llm_calls
+                (created_at, analysis_type, model, latency_ms, prompt_tokens, completion_tokens,
+                 attempt, cache_hit, streamed, coalesced, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (time.time(), analysis_type, model, latency_ms, prompt_tokens or 0, completion_tokens or 0,
+                  attempt, int(cache_hit), int(streamed), int(coalesced), error))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"LLM telemetry write error: {e}")
+
+    def load_calls(self, days=7):
+        """최근 days일 호출 기록 DataFrame"""
+        conn = self.pool.get()
+        calls = pd.read_sql_query(
+            'SELECT * FROM llm_calls WHERE created_at >= ? ORDER BY created_at',
+            conn, params=(time.time() - days * 24 * 3600,)
+        )
+        # 기록이 없을 때도 숫자 컬럼 타입 유지
+        return calls.astype({
+            'created_at': float, 'latency_ms': float, 'prompt_tokens': int, 'completion_tokens': int,
+            'attempt': int, 'cache_hit': int, 'streamed': int, 'coalesced': int,
+        })
+
+    def summary(self, days=7):
+        """최근 days일 호출 요약
+
+        지연 시간 백분위수는 캐시 적중과 병합된 호출을 제외한 API 호출 기준이며, 반환값은
+        totals(전체 합계), by_type(분석 유형별 DataFrame), daily(일별 DataFrame)를 담은 딕셔너리입니다.
+        """
+        calls = self.load_calls(days)
+        calls['cost_usd'] = self._estimate_cost(calls)
+        calls['error_call'] = calls['error'].notna()
+        calls['api_call'] = (calls['cache_hit'] == 0) & (calls['coalesced'] == 0)
+        api = calls[calls['api_call']]
+
+        totals = {
+            "calls": len(calls),
+            "api_calls": len(api),
+            "cache_hits": int(calls['cache_hit'].sum()),
+            "coalesced": int(calls['coalesced'].sum()),
+            "errors": int(calls['error_call'].sum()),
+            "retries": int((calls['attempt'] > 0).sum()),
+            "prompt_tokens": int(calls['prompt_tokens'].sum()),
+            "completion_tokens": int(calls['completion_tokens'].sum()),
+            "cost_usd": float(calls['cost_usd'].sum()),
+            "latency_p50_ms": float(api['latency_ms'].quantile(0.5)) if len(api) else 0.0,
+            "latency_p95_ms": float(api['latency_ms'].quantile(0.95)) if len(api) else 0.0,
+            "errors_by_class": api['error'].value_counts().to_dict(),
+        }
+
+        by_type = calls.groupby(calls['analysis_type'].fillna('기타')).agg(
+            calls=('id', 'count'),
+            cache_hits=('cache_hit', 'sum'),
+            coalesced=('coalesced', 'sum'),
+            errors=('error_call', 'sum'),
+            prompt_tokens=('prompt_tokens', 'sum'),
+            completion_tokens=('completion_tokens', 'sum'),
+            cost_usd=('cost_usd', 'sum'),
+        )
+        latency = api.groupby(api['analysis_type'].fillna('기타'))['latency_ms']
+        by_type['latency_p50_ms'] = latency.quantile(0.5)
+        by_type['latency_p95_ms'] = latency.quantile(0.95)
+
+        calls['date'] = pd.to_datetime(calls['created_at'], unit='s').dt.date
+        daily = calls.groupby('date').agg(
+            calls=('id', 'count'),
+            api_calls=('api_call', 'sum'),
+            errors=('error_call', 'sum'),
+            prompt_tokens=('prompt_tokens', 'sum'),
+            completion_tokens=('completion_tokens', 'sum'),
+            cost_usd=('cost_usd', 'sum'),
+        )
+
+        return {"totals": totals, "by_type": by_type.reset_index(), "daily": daily.reset_index()}
+
+    def clear(self):
+        """호출 기록 삭제"""
+        conn = self.pool.get()
+        conn.execute('DELETE FROM llm_calls')
+        conn.commit()
+
+    def _estimate_cost(self, calls):
+        """호출별 추정 비용 (가격표에 없는 모델은 0)"""
+        prices = calls['model'].map(self.PRICES)
+        input_price = prices.map(lambda price: price[0] if isinstance(price, tuple) else 0.0)
+        output_price = prices.map(lambda price: price[1] if isinstance(price, tuple) else 0.0)
+        return (calls['prompt_tokens'] * input_price + calls['completion_tokens'] * output_price) / 1_000_000
@@ -0,0 +1,154 @@
+import os
+import shutil
+import uuid
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # 선택 의존성: pyarrow가 없으면 아카이브 비활성화
+    pa = None
+    pc = None
+    ds = None
+    pq = None
+
+class MessageArchive:
+    """채팅방 메시지의 월 단위 Parquet 컬럼형 아카이브
+
+    archive_dir/room_{room_id}/month=YYYY-MM/part-*.parquet 구조로 저장하며,
+    타임스탬프는 epoch 초(int64), 사용자는 사전(dictionary) 인코딩 문자열로 저장합니다.
+    """
+
+    COLUMNS = ['datetime', 'user', 'message', 'message_length']
+
+    def __init__(self, archive_dir="message_archive"):
+        if pa is None:
+            raise ImportError("메시지 아카이브를 사용하려면 pyarrow 패키지가 필요합니다. (pip install pyarrow)")
+        self.archive_dir = archive_dir
+        self.schema = pa.schema([
+            ('ts', pa.int64()),
+            ('user', pa.dictionary(pa.int32(), pa.string())),
+            ('message', pa.string()),
+            ('message_length', pa.int32()),
+        ])
+
+    @staticmethod
+    def is_available():
+        """pyarrow 설치 여부"""
+        return pa is not None
+
+    def room_path(self, room_id):
+        """채팅방 아카이브 경로"""
+        return os.path.join(self.archive_dir, f"room_{room_id}")
+
+    def append(self, room_id, chat_data):
+        """메시지를 월별 파티션에 추가 저장"""
+        if chat_data.empty:
+            return 0
+
+        datetimes = pd.to_datetime(chat_data['datetime'])
+        ts = datetimes.values.astype('datetime64[s]').astype('int64')
+        months = datetimes.dt.strftime('%Y-%m')
+        if 'message_length' in chat_data.columns:
+            lengths = chat_data['message_length'].astype('int32')
+        else:
+            lengths = chat_data['message'].fillna('').astype(str).str.len().astype('int32')
+
+        frame = pd.DataFrame({
+            'ts': ts,
+            'user': chat_data['user'].astype(str).values,
+            'message': chat_data['message'].values,
+            'message_length': lengths.values,
+            'month': months.values,
+        })
+
+        written = 0
+        for month, part in frame.groupby('month', sort=True):
+            month_dir = os.path.join(self.room_path(room_id), f"month={month}")
+            os.makedirs(month_dir, exist_ok=True)
+
+            table = pa.Table.from_pandas(
+                part.drop(columns=['month']).sort_values('ts'),
+                schema=self.schema,
+                preserve_index=False
+            )
+            pq.write_table(table, os.path.join(month_dir, f"part-{uuid.uuid4().hex}.parquet"))
+            written += len(part)
+
+        return written
+
+    def load(self, room_id, start_date=None, end_date=None, columns=None, users=None):
+        """기간/컬럼/사용자 조건에 맞는 파티션과 컬럼만 읽어 DataFrame 반환
+
+        start_date, end_date는 포함 범위이며 datetime 컬럼은 datetime64, user 컬럼은 category 타입입니다.
+        """
+        columns = columns or self.COLUMNS
+        room_path = self.room_path(room_id)
+        if not os.path.exists(room_path):
+            return pd.DataFrame(columns=columns)
+
+        dataset = ds.dataset(room_path, format='parquet', partitioning='hive', schema=self._dataset_schema())
+
+        # 월 파티션 가지치기 + 타임스탬프 범위 필터
+        conditions = []
+        if start_date is not None:
+            start = pd.Timestamp(start_date)
+            conditions.append(ds.field('month') >= start.strftime('%Y-%m'))
+            conditions.append(ds.field('ts') >= int(start.value // 10**9))
+        if end_date is not None:
+            end = pd.Timestamp(end_date)
+            conditions.append(ds.field('month') <= end.strftime('%Y-%m'))
+            conditions.append(ds.field('ts') <= int(end.value // 10**9))
+        if users:
+            conditions.append(ds.field('user').isin(list(users)))
+
+        filter_expr = None
+        for condition in conditions:
+            filter_expr = condition if filter_expr is None else filter_expr & condition
+
+        read_columns = ['ts' if col == 'datetime' else col for col in columns]
+        if 'ts' not in read_columns:
+            read_columns.append('ts')
+
+        table = dataset.to_table(columns=read_columns, filter=filter_expr)
+        table = table.take(pc.sort_indices(table, sort_keys=[('ts', 'ascending')]))
+        df = table.to_pandas()
+
+        if 'datetime' in columns:
+            df['datetime'] = pd.to_datetime(df['ts'], unit='s')
+
+        return df[columns].reset_index(drop=True)
+
+    def compact(self, room_id):
+        """월 파티션별로 작은 part 파일들을 하나로 병합"""
+        room_path = self.room_path(room_id)
+        if not os.path.exists(room_path):
+            return 0
+
+        compacted = 0
+        for month_dir in sorted(os.listdir(room_path)):
+            path = os.path.join(room_path, month_dir)
+            parts = [f for f in os.listdir(path) if f.endswith('.parquet')]
+            if len(parts) <= 1:
+                continue
+
+            table = pq.read_table(path, schema=self.schema)
+            table = table.take(pc.sort_indices(table, sort_keys=[('ts', 'ascending')]))
+            pq.write_table(table, os.path.join(path, f"part-{uuid.uuid4().hex}.parquet"))
+            for part in parts:
+                os.remove(os.path.join(path, part))
+            compacted += 1
+
+        return compacted
+
+    def delete_room(self, room_id):
+        """채팅방 아카이브 삭제"""
+        room_path = self.room_path(room_id)
+        if os.path.exists(room_path):
+            shutil.rmtree(room_path)
+
+    def _dataset_schema(self):
+        """파티션 컬럼(month)을 포함한 데이터셋 스키마"""
+        return self.schema.append(pa.field('month', pa.string()))
@@ -0,0 +1,199 @@
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+
+class VectorIndex:
+    """문자 n-gram 해싱 TF-IDF 벡터 기반 메시지 검색 인덱스 (메모리)
+
+    메시지마다 2~3글자 n-gram을 n_features 차원으로 해싱해 로그 TF 가중치(문서별 L2 정규화)를 저장하고,
+    IDF는 검색 시점에 계산하므로 메시지를 추가해도 기존 벡터를 다시 계산할 필요가 없습니다.
+    특성(feature)별 역색인으로 저장해 질의에 포함된 n-gram의 문서만 점수를 계산합니다.
+    """
+
+    def __init__(self, n_features=2 ** 18, ngram_range=(2, 3)):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.docs = np.zeros(0, dtype=np.int32)
+        self.features = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self._postings = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def vectorize(self, texts, batch_size=100000):
+        """문자열 목록을 희소 벡터로 변환 (반환값: 문서 번호, 특성 번호, 가중치 배열)"""
+        texts = pd.Series(texts, dtype=object).fillna('').astype(str)
+        docs, features, weights = [], [], []
+        for start in range(0, len(texts), batch_size):
+            d, f, w = self._vectorize_batch(texts.iloc[start:start + batch_size])
+            docs.append(d + start)
+            features.append(f)
+            weights.append(w)
+
+        if not docs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        return np.concatenate(docs), np.concatenate(features), np.concatenate(weights)
+
+    def _vectorize_batch(self, texts):
+        normalized = texts.str.lower().str.replace(r'\s+', ' ', regex=True).str.strip()
+        lengths = normalized.str.len().to_numpy(dtype=np.int64)
+
+        # 전체 문자열을 코드포인트 배열 하나로 이어 붙여 n-gram 해시를 한 번에 계산
+        codes = np.frombuffer(''.join(normalized).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        doc_of = np.repeat(np.arange(len(lengths)), lengths)
+        position = np.arange(len(codes)) - np.repeat(starts, lengths)
+        remaining = np.repeat(lengths, lengths) - position
+
+        keys = []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            valid = np.flatnonzero(remaining >= n)
+            hashed = np.full(len(valid), n, dtype=np.uint64)
+            for offset in range(n):
+                hashed = hashed * np.uint64(1000003) + codes[valid + offset]
+            keys.append(doc_of[valid].astype(np.uint64) * np.uint64(self.n_features)
+                        + hashed % np.uint64(self.n_features))
+
+        # (문서, 특성)별 등장 횟수 → 1 + log(횟수), 문서별 L2 정규화
+        keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+        docs = (keys // np.uint64(self.n_features)).astype(np.int32)
+        features = (keys % np.uint64(self.n_features)).astype(np.int32)
+        weights = 1 + np.log(counts)
+        norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=len(lengths)))
+        return docs, features, (weights / norms[docs]).astype(np.float32)
+
+    def add(self, ids, texts):
+        """메시지 ID와 본문 추가"""
+        docs, features, weights = self.vectorize(texts)
+        self.add_vectors(np.asarray(ids, dtype=np.int64), docs, features, weights)
+
+    def add_vectors(self, ids, docs, features, weights):
+        """vectorize 결과를 그대로 추가 (문서 번호는 ids의 위치)"""
+        self.docs = np.concatenate([self.docs, docs.astype(np.int32) + len(self.ids)])
+        self.features = np.concatenate([self.features, features.astype(np.int32)])
+        self.weights = np.concatenate([self.weights, weights.astype(np.float32)])
+        self.ids = np.concatenate([self.ids, ids])
+        self._postings = None
+
+    def search(self, query, k=50):
+        """질의와 가장 비슷한 메시지 k개 (반환값: ID 배열, 점수 배열, 점수 내림차순)"""
+        if len(self.ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        order, pointers, document_frequency = self._get_postings()
+        _, query_features, query_weights = self.vectorize([query])
+        if len(query_features) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        # 문서 벡터에는 IDF가 없으므로 질의 쪽에 IDF 제곱을 곱해 TF-IDF 내적과 같은 순위를 만듦
+        idf = np.log((len(self.ids) + 1) / (document_frequency[query_features] + 1)) + 1
+
+        # 질의 특성의 역색인 구간만 모아 문서별 점수 합산
+        starts, ends = pointers[query_features], pointers[query_features + 1]
+        lengths = ends - starts
+        positions = order[np.repeat(ends - lengths.cumsum(), lengths) + np.arange(lengths.sum())]
+        scores = np.bincount(
+            self.docs[positions],
+            weights=self.weights[positions] * np.repeat(query_weights * idf ** 2, lengths),
+            minlength=len(self.ids)
+        )
+
+        k = min(k, int((scores > 0).sum()))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return self.ids[top], scores[top]
+
+    def _get_postings(self):
+        """특성별 역색인 (정렬 순서, 특성별 시작 위치, 문서 빈도)"""
+        if self._postings is None:
+            order = np.argsort(self.features, kind='stable')
+            pointers = np.searchsorted(self.features[order], np.arange(self.n_features + 1))
+            self._postings = (order, pointers, np.diff(pointers))
+        return self._postings
+
+class MessageIndex:
+    """채팅방별 검색 인덱스 저장소
+
+    index_dir/room_{room_id}/seg-*.npz 구조로, 메시지 저장 시 새 메시지의 벡터만 세그먼트로 추가합니다.
+    불러온 인덱스는 세그먼트 목록이 바뀔 때까지 메모리에 보관합니다.
+    """
+
+    def __init__(self, index_dir="message_index", n_features=2 ** 18, ngram_range=(2, 3)):
+        self.index_dir = index_dir
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self._loaded = {}
+
+    def room_path(self, room_id):
+        """채팅방 인덱스 경로"""
+        return os.path.join(self.index_dir, f"room_{room_id}")
+
+    def append(self, room_id, ids, texts):
+        """메시지 ID/본문의 벡터를 새 세그먼트로 저장"""
+        if len(ids) == 0:
+            return 0
+
+        index = VectorIndex(self.n_features, self.ngram_range)
+        docs, features, weights = index.vectorize(texts)
+
+        room_path = self.room_path(room_id)
+        os.makedirs(room_path, exist_ok=True)
+        np.savez(
+            os.path.join(room_path, f"seg-{uuid.uuid4().hex}.npz"),
+            ids=np.asarray(ids, dtype=np.int64), docs=docs, features=features, weights=weights
+        )
+        return len(ids)
+
+    def load(self, room_id):
+        """채팅방의 모든 세그먼트를 합친 VectorIndex (세그먼트가 없으면 빈 인덱스)"""
+        segments = self._segments(room_id)
+        cached = self._loaded.get(room_id)
+        if cached is not None and cached[0] == segments:
+            return cached[1]
+
+        index = VectorIndex(self.n_features, self.ngram_range)
+        for segment in segments:
+            with np.load(os.path.join(self.room_path(room_id), segment)) as arrays:
+                index.add_vectors(arrays['ids'], arrays['docs'], arrays['features'], arrays['weights'])
+
+        self._loaded[room_id] = (segments, index)
+        return index
+
+    def search(self, room_id, query, k=50):
+        """채팅방에서 질의와 비슷한 메시지 ID/점수 검색"""
+        return self.load(room_id).search(query, k)
+
+    def compact(self, room_id):
+        """세그먼트들을 하나로 병합"""
+        segments = self._segments(room_id)
+        if len(segments) <= 1:
+            return 0
+
+        index = self.load(room_id)
+        room_path = self.room_path(room_id)
+        np.savez(
+            os.path.join(room_path, f"seg-{uuid.uuid4().hex}.npz"),
+            ids=index.ids, docs=index.docs, features=index.features, weights=index.weights
+        )
+        for segment in segments:
+            os.remove(os.path.join(room_path, segment))
+        return len(segments)
+
+    def delete_room(self, room_id):
+        """채팅방 인덱스 삭제"""
+        self._loaded.pop(room_id, None)
+        room_path = self.room_path(room_id)
+        if os.path.exists(room_path):
+            shutil.rmtree(room_path)
+
+    def _segments(self, room_id):
+        room_path = self.room_path(room_id)
+        if not os.path.exists(room_path):
+            return ()
+        return tuple(sorted(f for f in os.listdir(room_path) if f.endswith('.npz')))
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+class MessageSampler:
+    """LLM 프롬프트용 대표 메시지 샘플링
+
+    최근 메시지만 고르는 대신 기간(시간 구간)과 사용자별로 층을 나눠 고르게 뽑고,
+    거의 같은 메시지는 하나만 남기며, 길이/대화 밀집도/주제 키워드가 두드러진 메시지를 우선합니다.
+    비용이 큰 텍스트 처리는 층별 상위 후보에만 적용하므로 대용량 채팅방에서도 빠르게 동작합니다.
+    """
+
+    def __init__(self, time_buckets=24, candidate_factor=4, burst_window_minutes=5, seed=0):
+        """time_buckets는 전체 기간을 나눌 구간 수, candidate_factor는 층별 할당량 대비 후보 배수"""
+        self.time_buckets = time_buckets
+        self.candidate_factor = candidate_factor
+        self.burst_window = np.timedelta64(burst_window_minutes, 'm')
+        self.seed = seed
+
+    def rank(self, data, n):
+        """대표성이 높은 순서로 최대 n개 메시지의 인덱스 반환
+
+        앞에서부터 잘라 써도 기간/사용자가 고르게 섞이도록 층별 순위가 같은 메시지끼리 묶어 정렬합니다.
+        """
+        if data.empty or n <= 0:
+            return data.index[:0]
+
+        datetimes = data['datetime'].to_numpy(dtype='datetime64[ns]')
+        strata = self._strata(data, datetimes)
+        quotas = self._quotas(strata, n)
+
+        # 1단계: 길이와 대화 밀집도로 층별 후보만 추림 (벡터 연산)
+        if 'message_length' in data.columns:
+            lengths = data['message_length'].fillna(0).to_numpy(dtype=float)
+        else:
+            lengths = data['message'].fillna('').astype(str).str.len().to_numpy(dtype=float)
+        order = np.argsort(datetimes, kind='stable')
+        sorted_times = datetimes[order]
+        burst = np.empty(len(data))
+        burst[order] = (
+            np.searchsorted(sorted_times, sorted_times + self.burst_window, side='right')
+            - np.searchsorted(sorted_times, sorted_times - self.burst_window, side='left')
+        )
+        jitter = np.random.default_rng(self.seed).random(len(data)) * 0.01
+        score = np.log1p(lengths) + 0.5 * np.log1p(burst) + jitter
+
+        within = self._rank_within(strata, score)
+
+        # 2단계: 후보끼리 거의 같은 메시지 제거 (중복이 많아 n개가 안 되면 후보 범위를 넓힘)
+        factor = self.candidate_factor
+        while True:
+            candidates = np.flatnonzero(within < quotas[strata] * factor)
+            texts = data['message'].iloc[candidates].fillna('').astype(str)
+            keys = texts.str.lower().str.replace(r'[^0-9a-z가-힣]+', '', regex=True).str.slice(0, 40)
+            keep = ~self._duplicated_by_score(keys.to_numpy(), score[candidates])
+            if keep.sum() >= n or len(candidates) == len(data):
+                break
+            factor *= 4
+
+        # 주제 키워드 점수 반영
+        candidates = candidates[keep]
+        score = score[candidates] + self._keyword_salience(texts[keep])
+
+        # 3단계: 층별 할당량만큼 선택하고, 후보가 모자란 층의 몫은 남은 후보 중 점수 순으로 채움
+        candidate_strata = strata[candidates]
+        within = self._rank_within(candidate_strata, score)
+        selected = within < quotas[candidate_strata]
+        remaining = n - selected.sum()
+        if remaining > 0:
+            extra = np.flatnonzero(~selected)
+            selected[extra[np.argsort(-score[extra], kind='stable')[:remaining]]] = True
+
+        chosen = np.flatnonzero(selected)
+        priority = chosen[np.lexsort((-score[chosen], within[chosen]))][:n]
+        return data.index[candidates[priority]]
+
+    def sample(self, data, n):
+        """대표 메시지 n개를 시간순으로 반환 (메시지가 n개 이하이면 그대로 반환)"""
+        if len(data) <= n:
+            return data
+        return data.loc[self.rank(data, n)].sort_values('datetime', kind='stable')
+
+    def _strata(self, data, datetimes):
+        """시간 구간 × 사용자 층 번호"""
+        times = datetimes.astype('int64')
+        span = max(times.max() - times.min(), 1)
+        buckets = np.minimum((times - times.min()) * self.time_buckets // span, self.time_buckets - 1)
+        users = pd.factorize(data['user'])[0]
+        return pd.factorize(buckets * (users.max() + 2) + users)[0]
+
+    def _quotas(self, strata, n):
+        """층 크기의 제곱근에 비례한 층별 할당량 (작은 층도 대표되도록)"""
+        sizes = np.bincount(strata)
+        weights = np.sqrt(sizes)
+        quotas = np.floor(weights / weights.sum() * n).astype(int)
+        return np.minimum(np.maximum(quotas, 1), sizes)
+
+    def _rank_within(self, strata, score):
+        """층 안에서의 점수 순위 (0부터)"""
+        # 점수 내림차순 정렬 후 층 번호로 안정 정렬 (lexsort보다 빠름)
+        by_score = np.argsort(-score)
+        order = by_score[np.argsort(strata[by_score], kind='stable')]
+        sorted_strata = strata[order]
+        starts = np.flatnonzero(np.r_[True, sorted_strata[1:] != sorted_strata[:-1]])
+        ranks = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        within = np.empty(len(order), dtype=int)
+        within[order] = ranks
+        return within
+
+    def _duplicated_by_score(self, keys, score):
+        """정규화된 내용이 같은 메시지 중 점수가 가장 높은 것 외에는 True"""
+        order = np.argsort(-score, kind='stable')
+        duplicated = np.empty(len(keys), dtype=bool)
+        duplicated[order] = pd.Series(keys[order]).duplicated().to_numpy()
+        return duplicated
+
+    def _keyword_salience(self, texts):
+        """후보 메시지들 사이에서 자주 반복되는 단어(대화 주제)를 많이 포함할수록 높은 점수"""
+        if texts.empty:
+            return np.zeros(0)
+
+        texts = texts.reset_index(drop=True)
+        words = texts.str.lower().str.findall(r'[0-9a-z가-힣]{2,}')
+        exploded = words.explode().dropna()
+        if exploded.empty:
+            return np.zeros(len(texts))
+
+        # 한 번만 나온 단어와 대부분의 메시지에 나오는 단어(인사, 호응)는 주제로 보지 않음
+        pairs = pd.DataFrame({'doc': exploded.index, 'word': exploded.to_numpy()}).drop_duplicates()
+        document_frequency = pairs['word'].value_counts()
+        topical = document_frequency[(document_frequency >= 2) & (document_frequency <= len(texts) * 0.2)]
+        weights = exploded.map(np.log1p(topical)).fillna(0)
+        salience = weights.groupby(level=0).sum().reindex(texts.index, fill_value=0)
+        return np.log1p(salience.to_numpy())
@@ -0,0 +1,168 @@
+import string
+import numpy as np
+import pandas as pd
+
+try:
+    import tiktoken
+except ImportError:  # 선택 의존성: 없으면 글자 종류별 추정치 사용
+    tiktoken = None
+
+class PromptPacker:
+    """토큰 예산 안에서 채팅 메시지를 골라 압축된 대화록으로 변환
+
+    메시지별 토큰 수를 원문 기준으로 미리 계산해 우선순위 순으로 예산을 채우고,
+    선택된 메시지만 대화록 문자열로 만듭니다. 대화록은 사용자 약칭(A, B, ...)과
+    날짜 머리글 + 시:분 형식을 사용해 같은 토큰으로 더 많은 메시지를 담습니다.
+    """
+
+    # 약칭/시각/구분자 등 메시지 한 줄의 고정 비용 (토큰)
+    LINE_OVERHEAD = 4
+    # 날짜 머리글 한 줄의 비용 (토큰)
+    HEADER_TOKENS = 8
+
+    def __init__(self, token_budget=3000, model="gpt-4o-mini"):
+        self.token_budget = token_budget
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+
+    def estimate_tokens(self, texts):
+        """문자열 Series의 항목별 토큰 수 (tiktoken이 없으면 글자 종류별 추정)"""
+        texts = texts.fillna('').astype(str)
+
+        if self.encoding is not None:
+            counts = [len(tokens) for tokens in self.encoding.encode_batch(texts.tolist())]
+            return pd.Series(counts, index=texts.index)
+
+        # 한글 음절은 약 0.8토큰, 자모(ㅋㅋ, ㅠㅠ)는 0.5토큰, 영문/숫자는 4글자당 1토큰,
+        # 그 외 기호/이모지는 글자당 1토큰으로 보수적으로 추정
+        hangul = texts.str.count('[가-힣]')
+        jamo = texts.str.count('[ㄱ-ㅎㅏ-ㅣ]')
+        ascii_chars = texts.str.count(f'[{string.ascii_letters}{string.digits}]')
+        spaces = texts.str.count(r'\s')
+        other = texts.str.len() - hangul - jamo - ascii_chars - spaces
+        estimate = hangul * 0.8 + jamo * 0.5 + ascii_chars / 4 + other + 1
+        return estimate.round().astype(int)
+
+    def count_tokens(self, text):
+        """문자열 하나의 토큰 수"""
+        return int(self.estimate_tokens(pd.Series([text])).iloc[0])
+
+    def pack(self, data, priority=None, include_context=True, token_budget=None):
+        """우선순위가 높은 메시지부터 토큰 예산을 채운 대화록 생성
+
+        priority는 data의 인덱스를 우선순위 순으로 나열한 것이며, 지정하지 않으면 최신 메시지가 우선입니다.
+        선택된 메시지는 시간순으로 출력됩니다. 반환값은 (대화록, 약칭 안내, 통계) 튜플입니다.
+        """
+        token_budget = token_budget or self.token_budget
+        if data.empty:
+            return "", "", {"total_messages": 0, "packed_messages": 0, "estimated_tokens": 0}
+
+        if priority is None:
+            priority = data.index[::-1]
+
+        # 메시지 한 줄은 최소 LINE_OVERHEAD + 1 토큰이므로 예산에 들어갈 수 있는 후보만 계산
+        candidates = priority[:token_budget // (self.LINE_OVERHEAD + 1)]
+
+        # 원문 기준 토큰 수로 우선순위 순 누적합을 계산해 예산 안의 메시지만 선택
+        costs = self.estimate_tokens(data['message'].loc[candidates]) + self.LINE_OVERHEAD
+        selected = costs.index[costs.cumsum() <= token_budget]
+        packed = data.loc[selected].sort_values('datetime', kind='stable')
+
+        # 날짜 머리글 비용만큼 초과하면 우선순위가 낮은 메시지부터 제외
+        if include_context:
+            rank = pd.Series(range(len(selected)), index=selected)
+            while not packed.empty:
+                days = packed['datetime'].dt.normalize().nunique()
+                if costs.loc[packed.index].sum() + days * self.HEADER_TOKENS <= token_budget:
+                    break
+                packed = packed.drop(rank.loc[packed.index].idxmax())
+
+        aliases = self._aliases(packed['user'])
+        legend = ", ".join(f"{alias}={user}" for user, alias in aliases.items())
+
+        users = packed['user'].map(aliases)
+        messages = packed['message'].fillna('').astype(str)
+        if include_context:
+            lines = []
+            current_day = None
+            for dt, user, message in zip(packed['datetime'], users, messages):
+                day = dt.strftime('%Y-%m-%d')
+                if day != current_day:
+                    lines.append(f"## {day}")
+                    current_day = day
+                lines.append(f"{dt.strftime('%H:%M')} {user}: {message}")
+        else:
+            lines = [f"{user}: {message}" for user, message in zip(users, messages)]
+
+        omitted = len(data) - len(packed)
+        if omitted > 0:
+            lines.insert(0, f"(토큰 예산으로 이전/우선순위 낮은 메시지 {omitted:,}개 생략)")
+
+        stats = {
+            "total_messages": len(data),
+            "packed_messages": len(packed),
+            "estimated_tokens": int(costs.loc[packed.index].sum()),
+        }
+        return "\n".join(lines), legend, stats
+
+    def split_chunks(self, data, token_budget=None, gap_minutes=60):
+        """시간순 메시지를 토큰 예산 이하의 청크로 분할 (반환값: 청크별 인덱스 목록)
+
+        날짜가 바뀌거나 gap_minutes 이상 대화가 끊긴 지점을 대화 단위 경계로 보고, 경계 사이 구간을
+        앞에서부터 예산까지 이어 붙입니다. 앞쪽 청크는 뒤에 메시지가 추가되어도 바뀌지 않으며,
+        예산보다 긴 구간만 메시지 단위로 나눕니다.
+        """
+        token_budget = token_budget or self.token_budget
+        if data.empty:
+            return []
+
+        data = data.sort_values('datetime', kind='stable')
+        costs = (self.estimate_tokens(data['message']) + self.LINE_OVERHEAD).to_numpy()
+
+        datetimes = data['datetime']
+        days = datetimes.dt.normalize()
+        boundary = (datetimes.diff() > pd.Timedelta(minutes=gap_minutes)) | (days != days.shift())
+        starts = np.flatnonzero(boundary.to_numpy())
+        ends = np.append(starts[1:], len(data))
+        segment_costs = np.add.reduceat(costs, starts)
+
+        ranges = []
+        chunk_start, chunk_cost = None, 0
+        for start, end, cost in zip(starts, ends, segment_costs):
+            if chunk_start is not None and chunk_cost + cost > token_budget:
+                ranges.append((chunk_start, start))
+                chunk_start, chunk_cost = None, 0
+
+            if cost <= token_budget:
+                if chunk_start is None:
+                    chunk_start = start
+                chunk_cost += cost
+                continue
+
+            # 예산보다 긴 구간은 메시지 단위로 분할
+            part_start, part_cost = start, 0
+            for row in range(start, end):
+                if row > part_start and part_cost + costs[row] > token_budget:
+                    ranges.append((part_start, row))
+                    part_start, part_cost = row, 0
+                part_cost += costs[row]
+            ranges.append((part_start, end))
+
+        if chunk_start is not None:
+            ranges.append((chunk_start, len(data)))
+
+        return [data.index[start:end] for start, end in ranges]
+
+    def _aliases(self, users):
+        """메시지 수가 많은 순으로 사용자 약칭 부여 (A~Z, 이후 A1, B1, ...)"""
+        letters = string.ascii_uppercase
+        aliases = {}
+        counts = users.value_counts()
+        for i, user in enumerate(counts.index[counts > 0]):
+            suffix = str(i // len(letters)) if i >= len(letters) else ''
+            aliases[user] = f"{letters[i % len(letters)]}{suffix}"
+        return aliases
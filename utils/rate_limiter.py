@@ -0,0 +1,211 @@
+import asyncio
+import random
+import threading
+import time
+
+class AsyncTokenBucket:
+    """분당 요청 수(RPM)와 토큰 수(TPM)를 함께 제한하는 asyncio용 토큰 버킷
+
+    버킷은 1분치 한도만큼 채워진 상태로 시작하고 경과 시간에 비례해 다시 채워집니다.
+    대기 중인 호출은 도착 순서대로 처리됩니다.
+    """
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=200000):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens=0):
+        """요청 1건과 tokens만큼의 한도를 확보할 때까지 대기"""
+        # 한 요청이 분당 토큰 한도보다 크면 버킷이 가득 찰 때까지만 기다림
+        tokens = min(tokens, self.tokens_per_minute)
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+
+                wait = max(
+                    (1 - self._requests) * 60 / self.requests_per_minute,
+                    (tokens - self._tokens) * 60 / self.tokens_per_minute,
+                )
+                await asyncio.sleep(max(wait, 0.01))
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """지수 백오프 + full jitter 대기 시간 (attempt는 0부터)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class AdaptiveConcurrencyLimiter:
+    """API 동시 요청 수를 AIMD(가산 증가/곱셈 감소)로 조절하는 제한기 (스레드 안전, 동기/비동기 공용)
+
+    요청이 성공할 때마다 한도를 1/한도씩 늘려(한도만큼 성공하면 +1) 서서히 높이고, 429/5xx/타임아웃이나
+    latency_target초보다 느린 응답이 오면 한도를 backoff_ratio배로 줄입니다. 한 번 줄인 뒤 cooldown초 안에
+    끝난 요청의 실패는 같은 과부하로 보고 다시 줄이지 않습니다.
+    """
+
+    def __init__(self, initial_limit=8, min_limit=1, max_limit=64, latency_target=60.0, backoff_ratio=0.5,
+                 cooldown=5.0):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.cooldown = cooldown
+        self.inflight = 0
+        self.max_inflight = 0
+        self.successes = 0
+        self.overloads = 0
+        self.decreases = 0
+        self._last_decrease = float('-inf')
+        self._condition = threading.Condition()
+
+    def _try_acquire(self):
+        # 호출자가 잠금을 가진 상태에서만 호출
+        if self.inflight >= max(int(self.limit), self.min_limit):
+            return False
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        return True
+
+    def acquire(self):
+        """동시 요청 자리가 날 때까지 대기 (동기)"""
+        with self._condition:
+            self._condition.wait_for(self._try_acquire)
+
+    async def acquire_async(self, poll_interval=0.05):
+        """acquire의 비동기 버전 (이벤트 루프를 막지 않도록 짧게 나눠 대기)"""
+        while True:
+            with self._condition:
+                if self._try_acquire():
+                    return
+            await asyncio.sleep(poll_interval)
+
+    def release(self, success=None, latency=None):
+        """요청 종료 반영 (success: True 성공, False 과부하 신호, None 한도 조절 없음, latency: 응답 시간 초)"""
+        with self._condition:
+            self.inflight -= 1
+            if success and self.latency_target and latency is not None and latency > self.latency_target:
+                success = False
+
+            if success:
+                self.successes += 1
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif success is False:
+                self.overloads += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                    self._last_decrease = now
+                    self.decreases += 1
+            self._condition.notify_all()
+
+    def stats(self):
+        """현재 한도/진행 중 요청 수와 누적 성공/과부하/감소 횟수"""
+        with self._condition:
+            return {
+                "limit": round(self.limit, 2),
+                "inflight": self.inflight,
+                "max_inflight": self.max_inflight,
+                "successes": self.successes,
+                "overloads": self.overloads,
+                "decreases": self.decreases,
+            }
+
+class CircuitOpenError(Exception):
+    """차단기가 열려 있어 API를 호출하지 않고 바로 실패한 요청 (retry_after초 후 다시 시도 가능)"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"OpenAI API 오류가 계속되어 요청을 잠시 중단했습니다 ({retry_after:.0f}초 후 다시 시도)")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """API 장애 시 요청을 바로 실패시키는 차단기 (스레드 안전)
+
+    연속 실패가 failure_threshold번 쌓이면 열림(open) 상태가 되어 reset_timeout초 동안 CircuitOpenError를
+    냅니다. 그 뒤 반열림(half-open) 상태에서 시험 요청 하나만 보내 성공하면 닫히고, 실패하면 대기 시간을
+    두 배(최대 max_reset_timeout)로 늘려 다시 열립니다.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, max_reset_timeout=120.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """요청 전 확인 (열림 상태이거나 반열림 상태에서 시험 요청이 진행 중이면 CircuitOpenError)"""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self._timeout - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(remaining)
+                self.state = self.HALF_OPEN
+                self._probing = False
+
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(1.0)
+                self._probing = True
+
+    def record(self, success):
+        """요청 결과 반영 (success: True 성공, False 장애 신호, None 판단 보류)"""
+        with self._lock:
+            if success is None:
+                if self.state == self.HALF_OPEN:
+                    self._probing = False
+                return
+
+            if success:
+                self.failures = 0
+                if self.state != self.CLOSED:
+                    self.state = self.CLOSED
+                    self._timeout = self.reset_timeout
+                    self._probing = False
+                return
+
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self._open(min(self._timeout * 2, self.max_reset_timeout))
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self._open(self.reset_timeout)
+
+    def _open(self, timeout):
+        self.state = self.OPEN
+        self._timeout = timeout
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self.opened += 1
+
+    def stats(self):
+        """현재 상태와 연속 실패/열림/차단 횟수"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
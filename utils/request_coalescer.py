@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+class RequestAborted(Exception):
+    """공유 중인 요청을 처음 보낸 호출이 응답을 끝까지 받지 못하고 멈춤 (기다리던 호출은 다시 요청)"""
+
+class RequestCoalescer:
+    """같은 요청이 동시에 여러 번 들어오면 API 호출 하나의 결과를 함께 기다리게 하는 병합기 (스레드 안전)
+
+    처음 들어온 호출(리더)만 실제로 요청하고, 같은 키로 진행 중인 요청이 있는 동안 들어온 호출은
+    리더의 Future를 기다립니다. 동기 코드는 Future.result()로, asyncio 코드는 asyncio.wrap_future로
+    기다리므로 서로 다른 스레드/이벤트 루프 사이에서도 병합됩니다. 리더의 오류도 그대로 공유됩니다.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.merged = 0
+
+    def join(self, key):
+        """키의 진행 중 요청에 참여 (반환값: (Future, 리더 여부), 리더는 반드시 resolve를 호출해야 함)"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.merged += 1
+                return future, False
+
+            future = Future()
+            self._inflight[key] = future
+            self.leaders += 1
+            return future, True
+
+    def resolve(self, key, future, result=None, error=None):
+        """리더의 결과(또는 오류)를 기다리던 호출들에 전달하고 진행 중 목록에서 제거"""
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run(self, key, fn):
+        """동기 호출 병합: 리더면 fn()을 실행하고, 아니면 리더의 결과를 기다림
+
+        리더가 중간에 멈추면(RequestAborted) 기다리던 호출 중 하나가 새 리더가 되어 다시 요청합니다.
+        """
+        while True:
+            future, leader = self.join(key)
+            if not leader:
+                try:
+                    return future.result()
+                except RequestAborted:
+                    continue
+
+            try:
+                result = fn()
+            except BaseException as e:
+                self.resolve(key, future, error=e if isinstance(e, Exception) else RequestAborted())
+                raise
+            self.resolve(key, future, result=result)
+            return result
+
+    async def run_async(self, key, fn):
+        """run의 비동기 버전 (fn은 코루틴 함수)"""
+        while True:
+            future, leader = self.join(key)
+            if not leader:
+                try:
+                    # 기다리던 쪽이 취소되어도 공유 Future는 취소되지 않도록 shield
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except RequestAborted:
+                    continue
+
+            try:
+                result = await fn()
+            except BaseException as e:
+                self.resolve(key, future, error=e if isinstance(e, Exception) else RequestAborted())
+                raise
+            self.resolve(key, future, result=result)
+            return result
+
+    def stats(self):
+        """프로세스 시작 후 병합 통계 (리더 요청 수, 병합된 호출 수, 현재 진행 중 요청 수)"""
+        with self._lock:
+            inflight = len(self._inflight)
+        total = self.leaders + self.merged
+        return {
+            "leaders": self.leaders,
+            "merged": self.merged,
+            "inflight": inflight,
+            "merge_ratio": self.merged / total if total else 0.0,
+        }
@@ -0,0 +1,111 @@
+import re
+import pandas as pd
+
+class SentimentLexicon:
+    """감정 사전과 이모티콘/자모 규칙으로 확실한 메시지만 미리 분류하는 로컬 감정 분류기
+
+    ㅋㅋ, ㅠㅠ, "감사합니다", "ㅇㅇ"처럼 사전 표현이 메시지 대부분을 차지하고 긍정/부정 신호가
+    한쪽으로만 나타나는 경우에만 라벨을 붙이고, 나머지(부정어 포함, 신호 혼재, 사전 밖 내용이
+    많은 메시지)는 None으로 남겨 LLM이 분류하도록 합니다.
+    """
+
+    # 긍정 표현 (어간 위주, 활용형까지 포함되도록 앞부분만 지정)
+    POSITIVE_WORDS = [
+        '감사', '고마', '고맙', '땡큐', '축하', '좋아', '좋네', '좋다', '좋은', '좋겠', '좋았', '최고',
+        '대박', '사랑', '행복', '기뻐', '기쁘', '멋지', '멋져', '멋있', '짱', '굿', '훌륭', '잘했',
+        '수고', '화이팅', '파이팅', '힘내', '귀엽', '귀여', '예쁘', '예뻐', '이쁘', '이뻐', '웃기', '웃겨',
+        '재밌', '재미있', '신나', '설레', '반가', '반갑', '다행', '완벽', '오예', '나이스',
+        'good', 'nice', 'great', 'thanks', 'thank', 'love', 'lol',
+    ]
+
+    # 부정 표현
+    NEGATIVE_WORDS = [
+        '싫', '짜증', '화나', '화가', '빡치', '빡쳐', '슬프', '슬퍼', '우울', '힘들', '힘드', '피곤',
+        '지친', '지쳤', '아프', '아파', '최악', '실망', '걱정', '불안', '무섭', '무서', '답답', '속상',
+        '억울', '망했', '망함', '귀찮', '괴롭', '외롭', '서운', '별로', '노답', '에휴', '하아',
+        'sad', 'hate', 'bad',
+    ]
+
+    # 긍정/부정 이모티콘과 자모 표현
+    POSITIVE_EMOTICONS = [
+        r'[ㅋㅎ]{2,}', r'\^\^', r'\^_\^', r':\)', r':D', '[♡♥❤💕😀😁😂😃😄😆😊😍🥰🤣👍🎉]',
+    ]
+    NEGATIVE_EMOTICONS = [
+        r'[ㅠㅜ]+', r'ㅡㅡ', r';;+', r'T_T', r'ㅗ', '[😢😭😡😤😞😩👎💔]',
+    ]
+
+    # 부정어: 포함되면 사전 신호를 뒤집을 수 있으므로 LLM에 맡김 ("안녕"의 '안'은 제외)
+    NEGATION_PATTERN = r'않|없|아니|말고|(?<![가-힣])(?:안|못)(?!녕)'
+
+    # 감정이 없는 짧은 응답/시스템 메시지 (메시지 전체가 일치해야 함)
+    NEUTRAL_PATTERN = (
+        r'(?:ㅇㅇ|ㅇㅋ|ㅇ|네+|넵|넹|예|응|웅|ok|okay|오키|오케이|알겠(?:어|습니다)?|확인|'
+        r'사진(?: \d+장)?|동영상|이모티콘|파일|삭제된 메시지입니다)[\s.!~?]*'
+    )
+
+    def __init__(self, max_residual=10):
+        """max_residual은 사전 표현을 제외하고 남은 글자 수의 상한 (넘으면 LLM에 맡김)"""
+        self.max_residual = max_residual
+        self.positive_pattern = '|'.join(
+            [self._word_pattern(word) for word in self.POSITIVE_WORDS] + self.POSITIVE_EMOTICONS
+        )
+        self.negative_pattern = '|'.join(
+            [self._word_pattern(word) for word in self.NEGATIVE_WORDS] + self.NEGATIVE_EMOTICONS
+        )
+        self.signal_pattern = f'{self.positive_pattern}|{self.negative_pattern}'
+
+    @staticmethod
+    def _word_pattern(word):
+        """사전 표현의 정규식 (영어 단어는 단어 단위로만 일치: 'bad'가 'badminton'에 걸리지 않도록)
+
+        한글 어간은 활용형까지 포함되도록 그대로 두고, 영어 단어는 앞뒤가 영문자가 아닐 때만 일치시킵니다.
+        (\\b는 한글도 단어 문자로 보므로 "good이에요"처럼 한글이 바로 붙은 경우를 놓침)
+        """
+        if word.isascii():
+            return rf'(?<![a-z]){re.escape(word)}(?![a-z])'
+        return re.escape(word)
+
+    def classify(self, messages):
+        """메시지별 '긍정'/'부정'/'중립' 라벨 (확실하지 않으면 None)
+
+        messages는 Series 또는 리스트이며, 반환값은 같은 순서/인덱스의 Series입니다.
+        """
+        if not isinstance(messages, pd.Series):
+            messages = pd.Series(list(messages), dtype=object)
+        texts = messages.fillna('').astype(str).str.strip().str.lower()
+
+        # 채팅에는 같은 메시지(ㅋㅋ, 네, 사진 등)가 많으므로 고유 메시지만 분류한 뒤 펼침
+        codes, uniques = pd.factorize(texts)
+        unique_labels = self._classify_unique(pd.Series(uniques, dtype=object))
+        unique_labels = unique_labels.astype(object).where(unique_labels.notna(), None)
+        return pd.Series(unique_labels.to_numpy()[codes], index=texts.index, dtype=object)
+
+    def _classify_unique(self, lowered):
+        """소문자로 정리된 메시지 Series 분류 (classify 참고)"""
+
+        positive = lowered.str.count(self.positive_pattern)
+        negative = lowered.str.count(self.negative_pattern)
+        negated = lowered.str.contains(self.NEGATION_PATTERN, regex=True)
+
+        # 사전 표현, 공백, 기호를 지운 뒤 남은 글자 수가 적어야 사전 신호가 메시지를 대표한다고 봄
+        residual = (
+            lowered.str.replace(self.signal_pattern, '', regex=True)
+                   .str.replace(r'[^0-9a-z가-힣ㄱ-ㅎㅏ-ㅣ]+', '', regex=True)
+                   .str.len()
+        )
+        confident = (residual <= self.max_residual) & ~negated
+
+        labels = pd.Series(None, index=lowered.index, dtype=object)
+        labels[confident & (positive > 0) & (negative == 0)] = '긍정'
+        labels[confident & (negative > 0) & (positive == 0)] = '부정'
+
+        # 짧은 대답, 사진/이모티콘 같은 시스템 메시지, 기호만 있는 메시지는 중립
+        neutral = lowered.str.fullmatch(self.NEUTRAL_PATTERN) | ((residual == 0) & (positive == 0) & (negative == 0))
+        labels[neutral & labels.isna()] = '중립'
+
+        return labels
+
+    def coverage(self, messages):
+        """사전으로 분류되는 메시지 비율 (LLM 호출에서 제외되는 비율)"""
+        labels = self.classify(messages)
+        return float(labels.notna().mean()) if len(labels) else 0.0